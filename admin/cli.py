@@ -4,6 +4,8 @@ import argparse
 from pathlib import Path
 from typing import Iterable
 
+from core.credit_ledger import CreditKind
+
 from . import DEFAULT_DB_PATH
 from .db import AdminDatabase
 
@@ -33,6 +35,25 @@ class AdminCLI:
         affected = self._db.reset_credits(user_ids, image=image, video=video)
         print(f"Updated credits for {affected} user(s)")
 
+    def grant(self, user_ids: Iterable[int], image: int | None, video: int | None, reason: str) -> None:
+        for user_id in user_ids:
+            for kind, amount in ((CreditKind.IMAGE, image), (CreditKind.VIDEO, video)):
+                if not amount:
+                    continue
+                balance = self._db.grant_credits(user_id, kind, amount, reason=reason)
+                if balance is None:
+                    print(f"Skipped {kind.value} grant for user {user_id}")
+                else:
+                    print(f"user_id={user_id} {kind.value} credits now {balance}")
+
+    def history(self, user_id: int, *, limit: int) -> None:
+        entries = self._db.credit_history(user_id, limit=limit)
+        if not entries:
+            print(f"No credit history for user {user_id}")
+            return
+        for entry in entries:
+            print(f"{entry.created_at} {entry.kind.value:<5} {entry.delta:+d} {entry.reason}")
+
     def delete(self, user_ids: Iterable[int]) -> None:
         affected = self._db.delete_users(user_ids)
         print(f"Deleted {affected} user(s)")
@@ -57,6 +78,16 @@ def build_parser() -> argparse.ArgumentParser:
     reset_parser.add_argument("--image", type=int, default=None)
     reset_parser.add_argument("--video", type=int, default=None)
 
+    grant_parser = subparsers.add_parser("grant", help="Add credits to users")
+    grant_parser.add_argument("user_ids", nargs="+", type=int)
+    grant_parser.add_argument("--image", type=int, default=None)
+    grant_parser.add_argument("--video", type=int, default=None)
+    grant_parser.add_argument("--reason", default="admin_grant")
+
+    history_parser = subparsers.add_parser("history", help="Show a user's credit history")
+    history_parser.add_argument("user_id", type=int)
+    history_parser.add_argument("--limit", type=int, default=20)
+
     delete_parser = subparsers.add_parser("delete", help="Delete users")
     delete_parser.add_argument("user_ids", nargs="+", type=int)
 
@@ -75,6 +106,12 @@ def main(argv: list[str] | None = None) -> None:
         if args.image is None and args.video is None:
             parser.error("reset-credits requires --image and/or --video")
         cli.reset(args.user_ids, args.image, args.video)
+    elif args.command == "grant":
+        if args.image is None and args.video is None:
+            parser.error("grant requires --image and/or --video")
+        cli.grant(args.user_ids, args.image, args.video, args.reason)
+    elif args.command == "history":
+        cli.history(args.user_id, limit=args.limit)
     elif args.command == "delete":
         cli.delete(args.user_ids)
     else:  # pragma: no cover
@@ -8,8 +8,13 @@ import streamlit as st
 
 try:
     from . import DEFAULT_DB_PATH
+    from .db import AdminDatabase
 except ImportError:  # When run as a script (e.g., `streamlit run admin/dashboard.py`)
-    DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "bot_database.db"
+    import sys
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from admin import DEFAULT_DB_PATH
+    from admin.db import AdminDatabase
 
 
 @st.cache_data(show_spinner=False)
@@ -73,17 +78,41 @@ def main() -> None:
         if not selected_ids:
             st.warning("Select at least one user")
         else:
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    f"UPDATE users SET image_credits=?, video_credits=? WHERE user_id IN ({','.join(['?']*len(selected_ids))})",
-                    (new_image, new_video, *selected_ids),
-                )
-                conn.commit()
+            AdminDatabase(db_path).reset_credits(
+                selected_ids, image=int(new_image), video=int(new_video)
+            )
             load_users.clear()
             st.success(f"Updated {len(selected_ids)} user(s)")
             st.rerun()
 
+    st.markdown("---")
+    st.subheader("Credit History")
+
+    history_user = st.selectbox(
+        "User ID",
+        options=users_df["user_id"].tolist(),
+        index=None,
+    )
+    if history_user is not None:
+        entries = AdminDatabase(db_path).credit_history(int(history_user), limit=100)
+        if entries:
+            st.dataframe(
+                pd.DataFrame(
+                    [
+                        {
+                            "created_at": e.created_at,
+                            "kind": e.kind.value,
+                            "delta": e.delta,
+                            "reason": e.reason,
+                        }
+                        for e in entries
+                    ]
+                ),
+                use_container_width=True,
+            )
+        else:
+            st.info("No credit history for this user")
+
 
 if __name__ == "__main__":
     main()
@@ -5,6 +5,15 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable, Iterator
 
+from core.credit_ledger import (
+    CreditKind,
+    LedgerEntry,
+    apply_credit_delta,
+    ensure_ledger_schema,
+    fetch_history,
+    set_balances,
+)
+
 
 @dataclass
 class UserRecord:
@@ -56,34 +65,47 @@ class AdminDatabase:
                 )
 
     def reset_credits(self, user_ids: Iterable[int], *, image: int | None = None, video: int | None = None) -> int:
-        """Reset credits for given users. Returns number of affected rows."""
+        """Reset credits for given users, logging each change. Returns number of affected rows."""
 
         if image is None and video is None:
             return 0
 
-        updates = []
-        params: list[int | str] = []
-        if image is not None:
-            updates.append("image_credits = ?")
-            params.append(image)
-        if video is not None:
-            updates.append("video_credits = ?")
-            params.append(video)
-
         id_list = list(user_ids)
         if not id_list:
             return 0
 
-        placeholders = ",".join("?" for _ in id_list)
-        params.extend(id_list)
-
-        query = f"UPDATE users SET {', '.join(updates)} WHERE user_id IN ({placeholders})"
-
+        affected = 0
         with self._connect() as conn:
             cursor = conn.cursor()
-            cursor.execute(query, params)
+            ensure_ledger_schema(cursor)
+            for kind, value in ((CreditKind.IMAGE, image), (CreditKind.VIDEO, video)):
+                if value is not None:
+                    affected = set_balances(cursor, id_list, kind, value, "admin_reset")
             conn.commit()
-            return cursor.rowcount
+            return affected
+
+    def grant_credits(
+        self,
+        user_id: int,
+        kind: CreditKind,
+        amount: int,
+        *,
+        reason: str = "admin_grant",
+        idempotency_key: str | None = None,
+    ) -> int | None:
+        """Add credits to a user. Returns the new balance, or None if skipped."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            ensure_ledger_schema(cursor)
+            balance = apply_credit_delta(cursor, user_id, kind, amount, reason, idempotency_key)
+            conn.commit()
+            return balance
+
+    def credit_history(self, user_id: int, *, limit: int = 50) -> list[LedgerEntry]:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            ensure_ledger_schema(cursor)
+            return fetch_history(cursor, user_id, limit=limit)
 
     def delete_users(self, user_ids: Iterable[int]) -> int:
         ids = list(user_ids)
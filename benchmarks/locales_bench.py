@@ -0,0 +1,88 @@
+"""Startup cost of the translation catalog as languages are added.
+
+Only the English bundle is read at import; other bundles are compiled on first
+use. This compares that startup work with loading every bundle eagerly, for a
+locales directory holding 2, 10 and 50 languages (synthetic copies of am.json).
+It also times a cold ``import tg_bot.translations`` in a fresh interpreter.
+
+Run from the repo root: python -m benchmarks.locales_bench
+"""
+
+from __future__ import annotations
+
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from tg_bot import translations
+from tg_bot.translations import LOCALES_DIR, _compile
+
+LANGUAGE_COUNTS = (2, 10, 50)
+REPEAT = 5
+
+_IMPORT_SNIPPET = (
+    "import time, tg_bot.user_settings;"
+    "t = time.perf_counter(); import tg_bot.translations;"
+    "print(time.perf_counter() - t)"
+)
+
+
+def _cold_import_ms() -> float:
+    samples = []
+    for _ in range(REPEAT):
+        out = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET], capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(out) * 1e3)
+    return statistics.median(samples)
+
+
+def _write_locales(directory: Path, count: int) -> None:
+    english = (LOCALES_DIR / "en.json").read_text(encoding="utf-8")
+    amharic = json.loads((LOCALES_DIR / "am.json").read_text(encoding="utf-8"))
+    (directory / "en.json").write_text(english, encoding="utf-8")
+    (directory / "am.json").write_text(json.dumps(amharic, ensure_ascii=False), encoding="utf-8")
+    for n in range(count - 2):
+        bundle = {key: f"{text} [{n}]" for key, text in amharic.items()}
+        (directory / f"x{n}.json").write_text(json.dumps(bundle, ensure_ascii=False), encoding="utf-8")
+
+
+def _eager_load(directory: Path) -> None:
+    for path in directory.glob("*.json"):
+        with open(path, encoding="utf-8") as f:
+            [_compile(text) for text in json.load(f).values()]
+
+
+def _best_ms(fn) -> float:
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e3)
+    return min(samples)
+
+
+def main() -> None:
+    print(f"cold import of tg_bot.translations: {_cold_import_ms():.2f} ms")
+    print(f"{'languages':<12}{'lazy startup ms':>18}{'eager load ms':>16}")
+    original_dir = translations.LOCALES_DIR
+    try:
+        for count in LANGUAGE_COUNTS:
+            with tempfile.TemporaryDirectory() as tmp:
+                directory = Path(tmp)
+                _write_locales(directory, count)
+                translations.LOCALES_DIR = directory
+                lazy = _best_ms(translations.compile_catalog)
+                eager = _best_ms(lambda: _eager_load(directory))
+            print(f"{count:<12}{lazy:>18.3f}{eager:>16.3f}")
+    finally:
+        translations.LOCALES_DIR = original_dir
+        translations.compile_catalog()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Per-call cost of get_translation: legacy nested-dict + str.format vs the compiled catalog.
+
+Run from the repo root: python -m benchmarks.translations_bench
+"""
+
+from __future__ import annotations
+
+import timeit
+
+from tg_bot.translations import get_translation, load_bundle, message_id, translate
+from tg_bot.user_settings import Language
+
+BUTTONS = ["🖼 Create Image", "🎥 Create Video", "💰 Balance", "❓ Help", "⚙️ Settings", "➕ Top Up"]
+NUMBER = 200_000
+
+
+# The old in-module literal: key -> {language: text}
+translations = {
+    key: {language: text for language in Language if (text := load_bundle(language).get(key))}
+    for key in load_bundle(Language.ENGLISH)
+}
+
+
+def legacy_get_translation(text_key: str, language: Language, **kwargs) -> str:
+    translation_template = translations.get(text_key, {}).get(language, text_key)
+    return translation_template.format(**kwargs)
+
+
+def _per_call_ns(stmt, calls_per_stmt: int = 1) -> float:
+    best = min(timeit.repeat(stmt, number=NUMBER, repeat=5))
+    return best / (NUMBER * calls_per_stmt) * 1e9
+
+
+def main() -> None:
+    language = Language.AMHARIC
+    button_ids = [message_id(key) for key in BUTTONS]
+    credit_id = message_id("image_credit_deducted")
+    cases = {
+        "plain string": (
+            lambda: legacy_get_translation("help_message", language),
+            lambda: get_translation("help_message", language),
+            lambda: translate(message_id("help_message"), language),
+        ),
+        "template": (
+            lambda: legacy_get_translation("image_credit_deducted", language, remaining=7),
+            lambda: get_translation("image_credit_deducted", language, remaining=7),
+            lambda: translate(credit_id, language, remaining=7),
+        ),
+        "6 main buttons": (
+            lambda: [legacy_get_translation(key, language) for key in BUTTONS],
+            lambda: [get_translation(key, language) for key in BUTTONS],
+            lambda: [translate(msg_id, language) for msg_id in button_ids],
+        ),
+    }
+    print(f"{'case':<16}{'legacy ns':>12}{'compiled ns':>14}{'by id ns':>12}")
+    for name, (legacy, compiled, by_id) in cases.items():
+        calls = 6 if name == "6 main buttons" else 1
+        print(
+            f"{name:<16}{_per_call_ns(legacy, calls):>12.1f}"
+            f"{_per_call_ns(compiled, calls):>14.1f}{_per_call_ns(by_id, calls):>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
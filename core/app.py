@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from typing import Final
 
@@ -16,7 +17,7 @@ from telegram.ext import (
 from telegram.request import HTTPXRequest
 
 from core import AppConfig, configure_logging, load_config
-from core.database import bot_db
+from core.database import async_bot_db, bot_db
 from tg_bot.keyboards import (
 	MAIN_BUTTONS,
 	main_menu_keyboard,
@@ -25,6 +26,7 @@ from tg_bot.keyboards import (
 	language_keyboard,
 	settings_keyboard,
 	welcome_language_keyboard,
+	button_for_text,
 	BTN_IMAGE,
 	BTN_VIDEO,
 	BTN_BALANCE,
@@ -40,9 +42,6 @@ from tg_bot.keyboards import (
 	CB_SETTINGS_MAIN,
 	CB_BACK_TO_SETTINGS,
 	CB_WELCOME_LANGUAGE,
-	CB_PRESET_PAGE,
-	CB_PRESET_SELECT,
-	CB_PRESET_RETRY,
 	CB_NAV_VIDEO,
 	CB_NAV_IMAGE,
 	CB_NAV_PRESETS,
@@ -54,39 +53,62 @@ from tg_bot.user_settings import (
 	Language,
 	detect_language_from_telegram,
 	has_video_credits,
+	memoize_per_update,
 )
 from tg_bot.translations import get_translation
-from tg_bot.handlers.image_handler import begin_prompt, handle_prompt_text, handle_image_choice_callback, handle_image_upload_for_image_gen
+from tg_bot.conversation import ConversationState, conversations
+from tg_bot.handlers.image_handler import begin_prompt, handle_prompt_text, handle_image_upload_for_image_gen
 from services.gemini_image import GeminiImageService
 from services.gemini_video import GeminiVideoService
-from tg_bot.handlers.video_handler import begin_video_generation, handle_image_upload, handle_video_prompt_text, handle_video_choice_callback
-from tg_bot.handlers.prompt_handler import (
-	show_presets,
-	handle_preset_page_callback,
-	handle_preset_select_callback,
-	handle_preset_retry_callback,
-)
+from tg_bot.handlers.video_handler import begin_video_generation, handle_image_upload, handle_video_prompt_text
+from tg_bot.handlers.prompt_handler import show_presets
+from tg_bot.router import callback_router
+from tg_bot import video_jobs
+from tg_bot.generation_cache import generation_cache, generation_flights
+from services.client_pool import ClientPool
+from services.rate_limit import gemini_rate_limiter
+from services.resilience import gemini_resilience
+from services.scheduler import generation_scheduler
 from tg_bot.handlers.balance_handler import show_balance
 
 
 log = logging.getLogger(__name__)
 
-
-def init_db() -> None:
-	"""Initialize the SQLite database and create the users table if it doesn't exist."""
+RESERVATION_SWEEP_INTERVAL: Final[float] = 60.0
+LEDGER_COMPACTION_INTERVAL: Final[float] = 24 * 60 * 60
+LEDGER_RETENTION_DAYS: Final[int] = 90
+VIDEO_JOB_RETENTION_DAYS: Final[int] = 7
+CONVERSATION_SWEEP_INTERVAL: Final[float] = 60.0
+GENERATION_CACHE_SWEEP_INTERVAL: Final[float] = 60 * 60
+
+# Which handler receives free text / photos in each conversation state
+TEXT_STATE_HANDLERS = {
+	ConversationState.IMAGE_PROMPT: handle_prompt_text,
+	ConversationState.VIDEO_PROMPT: handle_video_prompt_text,
+}
+PHOTO_STATE_HANDLERS = {
+	ConversationState.IMAGE_UPLOAD: handle_image_upload_for_image_gen,
+	ConversationState.VIDEO_UPLOAD: handle_image_upload,
+}
+
+
+def init_db(cfg: AppConfig) -> None:
+	"""Configure the connection pool and create the users table if it doesn't exist."""
+	bot_db.configure(cfg)
 	bot_db.initialize_database()
 
 
 BTN_IMAGE, BTN_VIDEO, BTN_BALANCE, BTN_HELP, BTN_SETTINGS, BTN_TOP_UP = MAIN_BUTTONS
 
 # mention the users name here
+@memoize_per_update
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 	user = update.effective_user
 	if not user:
 		return
 
 	# Handle user data in database
-	existing_user_data = bot_db.get_user_preferences(user.id)
+	existing_user_data = await async_bot_db.get_user_preferences(user.id)
 	is_new_user = existing_user_data is None
 
 	chat_id = update.effective_chat.id if update.effective_chat else user.id
@@ -103,7 +125,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 			image_ratio_pref = AspectRatio.RATIO_9_16
 			video_ratio_pref = VideoAspectRatio.RATIO_9_16
 
-			bot_db.create_user(
+			await async_bot_db.create_user(
 				user_id=user.id,
 				first_name=user.first_name,
 				username=user.username,
@@ -112,22 +134,23 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 				image_ratio=image_ratio_pref.value,
 				video_ratio=video_ratio_pref.value,
 			)
+			# Drop the cached "no such user" from lookups made before the row existed
+			user_settings.forget_missing(user.id)
+			existing_user_data = (language_pref.value, image_ratio_pref.value, video_ratio_pref.value)
 		else:
-			bot_db.update_user_basic_info(
+			await async_bot_db.update_user_basic_info(
 				user_id=user.id,
 				first_name=user.first_name,
 				username=user.username,
 				chat_id=chat_id,
+				wait=False,
 			)
 	except Exception as e:
 		log.error("Database error for user %s: %s", user.id, e)
 		is_new_user = False
 
-	# Sync in-memory preferences from DB
-	try:
-		user_settings.sync_from_db(user.id)
-	except Exception as exc:  # pragma: no cover - defensive
-		log.debug("Failed to sync preferences for user %s: %s", user.id, exc)
+	# Sync in-memory preferences from the row we already have
+	user_settings.apply_preferences(user.id, existing_user_data)
 
 	# Check if this is a new user
 	if is_new_user:
@@ -146,15 +169,19 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 		# Also surface preset suggestions right after welcome
 		await show_presets(update, context)
 
+@memoize_per_update
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 	user_id = update.effective_user.id if update.effective_user else 0
+	await user_settings.preload(user_id)
 	language = user_settings.get_language(user_id)
 	help_message = get_translation("help_message", language)
 	await update.effective_message.reply_text(help_message)
 
 
+@memoize_per_update
 async def settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 	user_id = update.effective_user.id if update.effective_user else 0
+	await user_settings.preload(user_id)
 	language = user_settings.get_language(user_id)
 	settings_message = get_translation("settings_message", language)
 	await update.effective_message.reply_text(
@@ -163,61 +190,212 @@ async def settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 	)
 
 
+@memoize_per_update
 async def balance_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 	await show_balance(update, context)
 
 
+async def _on_image_button(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, language: Language) -> None:
+	await begin_prompt(update, context)
+
+
+async def _on_video_button(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, language: Language) -> None:
+	if not await has_video_credits(user_id):
+		await update.effective_message.reply_text(
+			get_translation("insufficient_video_credits", language)
+		)
+		return
+	await begin_video_generation(update, context)
+
+
+async def _on_balance_button(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, language: Language) -> None:
+	await show_balance(update, context)
+
+
+async def _on_help_button(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, language: Language) -> None:
+	help_message = get_translation("help_message", language)
+	await update.effective_message.reply_text(help_message)
+
+
+async def _on_settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, language: Language) -> None:
+	settings_message = get_translation("settings_message", language)
+	await update.effective_message.reply_text(
+		settings_message,
+		reply_markup=settings_keyboard(user_id)
+	)
+
+
+async def _on_top_up_button(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, language: Language) -> None:
+	coming_soon_message = get_translation("coming_soon", language)
+	await update.effective_message.reply_text(coming_soon_message)
+
+
+BUTTON_HANDLERS = {
+	BTN_IMAGE: _on_image_button,
+	BTN_VIDEO: _on_video_button,
+	BTN_BALANCE: _on_balance_button,
+	BTN_HELP: _on_help_button,
+	BTN_SETTINGS: _on_settings_button,
+	BTN_TOP_UP: _on_top_up_button,
+}
+
+
 async def handle_text_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE, cfg: AppConfig) -> None:
 	text = (update.effective_message.text or "").strip()
 	user_id = update.effective_user.id if update.effective_user else 0
-	language = user_settings.get_language(user_id)
 
-	# Get translated button texts
-	btn_image_text = get_translation(BTN_IMAGE, language)
-	btn_video_text = get_translation(BTN_VIDEO, language)
-	btn_balance_text = get_translation(BTN_BALANCE, language)
-	btn_help_text = get_translation(BTN_HELP, language)
-	btn_settings_text = get_translation(BTN_SETTINGS, language)
-	btn_top_up_text = get_translation(BTN_TOP_UP, language)
-	
-	if text == btn_image_text:
-		await begin_prompt(update, context)
+	# Main-menu labels in every language resolve with one lookup
+	button = button_for_text(text)
+	if button is not None:
+		language = user_settings.get_language(user_id)
+		await BUTTON_HANDLERS[button](update, context, user_id, language)
 		return
-	if text == btn_video_text:
-		if not has_video_credits(user_id):
-			await update.effective_message.reply_text(
-				get_translation("insufficient_video_credits", language)
-			)
-			return
-		await begin_video_generation(update, context)
-		return
-	if text == btn_balance_text:
-		await show_balance(update, context)
-		return
-	if text == btn_help_text:
-		help_message = get_translation("help_message", language)
-		await update.effective_message.reply_text(help_message)
-		return
-	if text == btn_settings_text:
-		settings_message = get_translation("settings_message", language)
-		await update.effective_message.reply_text(
-			settings_message,
+	# Otherwise the text belongs to whichever flow the user is in
+	handler = TEXT_STATE_HANDLERS.get(conversations.state(user_id))
+	if handler:
+		await handler(update, context, cfg.gemini_api_key)
+
+
+def _callback_user(update: Update) -> tuple[int, Language]:
+	user_id = update.effective_user.id if update.effective_user else 0
+	return user_id, user_settings.get_language(user_id)
+
+
+@callback_router.route(CB_PREFIX_IMAGE_RATIO)
+async def _on_image_ratio(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	query = update.callback_query
+	user_id, language = _callback_user(update)
+	try:
+		ratio = AspectRatio[args[0]]
+		user_settings.set_ratio(user_id, ratio)
+		await query.answer(get_translation("aspect_ratio_set_message", language))
+		confirmation_message = get_translation("aspect_ratio_set_confirmation", language, ratio_value=ratio.value)
+		await query.edit_message_text(
+			confirmation_message,
 			reply_markup=settings_keyboard(user_id)
 		)
+	except (KeyError, IndexError):
+		await query.answer(get_translation("unknown_ratio_message", language), show_alert=True)
+
+
+@callback_router.route(CB_PREFIX_VIDEO_RATIO)
+async def _on_video_ratio(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	query = update.callback_query
+	user_id, language = _callback_user(update)
+	try:
+		ratio = VideoAspectRatio[args[0]]
+		user_settings.set_video_ratio(user_id, ratio)
+		await query.answer(get_translation("video_ratio_set_message", language))
+		confirmation_message = get_translation("video_ratio_set_confirmation", language, ratio_value=ratio.value)
+		await query.edit_message_text(
+			confirmation_message,
+			reply_markup=settings_keyboard(user_id)
+		)
+	except (KeyError, IndexError):
+		await query.answer(get_translation("unknown_ratio_message", language), show_alert=True)
+
+
+@callback_router.route(CB_PREFIX_LANGUAGE)
+async def _on_language(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	query = update.callback_query
+	user_id, language = _callback_user(update)
+	try:
+		new_language = Language[args[0]]
+		user_settings.set_language(user_id, new_language)
+		await query.answer(get_translation("language_set_message", new_language))
+
+		# Also update the main menu to reflect the language change
+		confirmation_message = get_translation("language_set_confirmation", new_language, language_value=new_language.value)
+		await context.bot.send_message(
+			chat_id=user_id,
+			text=confirmation_message.split('\n')[0],  # Send only the first line as a follow-up
+			reply_markup=main_menu_keyboard(user_id)
+		)
+		await query.edit_message_text(
+			confirmation_message,
+			reply_markup=settings_keyboard(user_id)
+		)
+	except (KeyError, IndexError):
+		await query.answer(get_translation("unknown_language_message", language), show_alert=True)
+
+
+@callback_router.route(CB_WELCOME_LANGUAGE)
+async def _on_welcome_language(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	# Welcome language selection for new users: CB_WELCOME_LANGUAGE:ENGLISH/AMHARIC
+	query = update.callback_query
+	user_id, _ = _callback_user(update)
+	try:
+		selected_language = Language[args[0]]
+		user_settings.set_language(user_id, selected_language)
+
+		# Send welcome message with the selected language and show main menu
+		user = query.from_user
+		welcome_message = get_translation("welcome", selected_language, user_name=user.first_name if user else 'User')
+		await query.edit_message_text(welcome_message)
+
+		# Send main menu as a new message
+		await context.bot.send_message(
+			chat_id=user_id,
+			text=get_translation("choose_action", selected_language),
+			reply_markup=main_menu_keyboard(user_id)
+		)
+		# Immediately show preset suggestions
+		await show_presets(update, context)
+	except (KeyError, IndexError):
+		await query.answer("Unknown language", show_alert=True)
+
+
+@callback_router.route(CB_SETTINGS_IMAGE_RATIO)
+async def _on_settings_image_ratio(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	user_id, language = _callback_user(update)
+	message = get_translation("choose_image_aspect_ratio_message", language)
+	await update.callback_query.edit_message_text(message, reply_markup=image_aspect_ratio_keyboard(user_id))
+
+
+@callback_router.route(CB_SETTINGS_VIDEO_RATIO)
+async def _on_settings_video_ratio(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	user_id, language = _callback_user(update)
+	message = get_translation("choose_video_aspect_ratio_message", language)
+	await update.callback_query.edit_message_text(message, reply_markup=video_aspect_ratio_keyboard(user_id))
+
+
+@callback_router.route(CB_SETTINGS_LANGUAGE)
+async def _on_settings_language(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	user_id, language = _callback_user(update)
+	message = get_translation("choose_language_message", language)
+	await update.callback_query.edit_message_text(message, reply_markup=language_keyboard(user_id))
+
+
+@callback_router.route(CB_BACK_TO_SETTINGS)
+async def _on_back_to_settings(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	user_id, language = _callback_user(update)
+	message = get_translation("settings_title", language)
+	await update.callback_query.edit_message_text(message, reply_markup=settings_keyboard(user_id))
+
+
+@callback_router.route(CB_NAV_VIDEO)
+async def _on_nav_video(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	user_id, language = _callback_user(update)
+	if not await has_video_credits(user_id):
+		await context.bot.send_message(
+			chat_id=user_id,
+			text=get_translation("insufficient_video_credits", language),
+		)
 		return
-	if text == btn_top_up_text:
-		coming_soon_message = get_translation("coming_soon", language)
-		await update.effective_message.reply_text(coming_soon_message)
-		return
-	# Check if user is awaiting video prompt
-	if user_settings.is_awaiting_video_prompt(user_id):
-		await handle_video_prompt_text(update, context, cfg.gemini_api_key)
-		return
+	await begin_video_generation(update, context)
 
-	# Fallback: if awaiting image prompt, treat as prompt text
-	await handle_prompt_text(update, context, cfg.gemini_api_key)
 
+@callback_router.route(CB_NAV_IMAGE)
+async def _on_nav_image(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	await begin_prompt(update, context)
 
+
+@callback_router.route(CB_NAV_PRESETS)
+async def _on_nav_presets(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+	await show_presets(update, context)
+
+
+@memoize_per_update
 async def handle_callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 	query = update.callback_query
 	if not query:
@@ -227,136 +405,26 @@ async def handle_callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 	if not user:
 		return
 
-	data = query.data or ""
-	user_id = update.effective_user.id if update.effective_user else 0
-	language = user_settings.get_language(user_id)
-
-	if data.startswith(CB_PREFIX_IMAGE_RATIO):
-		name = data.split(":", 2)[2]
-		try:
-			ratio = AspectRatio[name]
-			user_settings.set_ratio(user_id, ratio)
-			await query.answer(get_translation("aspect_ratio_set_message", language))
-			confirmation_message = get_translation("aspect_ratio_set_confirmation", language, ratio_value=ratio.value)
-			await query.edit_message_text(
-				confirmation_message,
-				reply_markup=settings_keyboard(user_id)
-			)
-		except KeyError:
-			await query.answer(get_translation("unknown_ratio_message", language), show_alert=True)
-	elif data.startswith(CB_PREFIX_VIDEO_RATIO):
-		name = data.split(":", 2)[2]
-		try:
-			ratio = VideoAspectRatio[name]
-			user_settings.set_video_ratio(user_id, ratio)
-			await query.answer(get_translation("video_ratio_set_message", language))
-			confirmation_message = get_translation("video_ratio_set_confirmation", language, ratio_value=ratio.value)
-			await query.edit_message_text(
-				confirmation_message,
-				reply_markup=settings_keyboard(user_id)
-			)
-		except KeyError:
-			await query.answer(get_translation("unknown_ratio_message", language), show_alert=True)
-	elif data.startswith(CB_PREFIX_LANGUAGE):
-		name = data.split(":", 1)[1]
-		try:
-			new_language = Language[name]
-			user_settings.set_language(user_id, new_language)
-			await query.answer(get_translation("language_set_message", new_language))
-			
-			# Also update the main menu to reflect the language change
-			confirmation_message = get_translation("language_set_confirmation", new_language, language_value=new_language.value)
-			await context.bot.send_message(
-				chat_id=user_id,
-				text=confirmation_message.split('\n')[0],  # Send only the first line as a follow-up
-				reply_markup=main_menu_keyboard(user_id)
-			)
-			await query.edit_message_text(
-				confirmation_message,
-				reply_markup=settings_keyboard(user_id)
-			)
-		except KeyError:
-			await query.answer(get_translation("unknown_language_message", language), show_alert=True)
-	elif data.startswith(CB_WELCOME_LANGUAGE):
-		# Handle welcome language selection for new users
-		name = data.split(":", 2)[2]  # CB_WELCOME_LANGUAGE:language:ENGLISH/AMHARIC
-		try:
-			selected_language = Language[name]
-			user_settings.set_language(user_id, selected_language)
-			
-			# Send welcome message with the selected language and show main menu
-			user = query.from_user
-			welcome_message = get_translation("welcome", selected_language, user_name=user.first_name if user else 'User')
-			await query.edit_message_text(welcome_message)
-			
-			# Send main menu as a new message
-			await context.bot.send_message(
-				chat_id=user_id,
-				text=get_translation("choose_action", selected_language),
-				reply_markup=main_menu_keyboard(user_id)
-			)
-			# Immediately show preset suggestions
-			await show_presets(update, context)
-		except KeyError:
-			await query.answer("Unknown language", show_alert=True)
-	elif data == CB_SETTINGS_IMAGE_RATIO:
-		message = get_translation("choose_image_aspect_ratio_message", language)
-		await query.edit_message_text(message, reply_markup=image_aspect_ratio_keyboard(user_id))
-	elif data == CB_SETTINGS_VIDEO_RATIO:
-		message = get_translation("choose_video_aspect_ratio_message", language)
-		await query.edit_message_text(message, reply_markup=video_aspect_ratio_keyboard(user_id))
-	elif data == CB_SETTINGS_LANGUAGE:
-		message = get_translation("choose_language_message", language)
-		await query.edit_message_text(message, reply_markup=language_keyboard(user_id))
-	elif data == CB_BACK_TO_SETTINGS:
-		message = get_translation("settings_title", language)
-		await query.edit_message_text(message, reply_markup=settings_keyboard(user_id))
-	elif data.startswith("video_choice:"):
-		await handle_video_choice_callback(update, context)
-	elif data.startswith("image_choice:"):
-		await handle_image_choice_callback(update, context)
-	elif data.startswith(CB_PRESET_PAGE):
-		await handle_preset_page_callback(update, context)
-	elif data.startswith(CB_PRESET_SELECT):
-		cfg = context.application.bot_data.get("cfg") if context.application else None
-		api_key = cfg.gemini_api_key if cfg else None
-		await handle_preset_select_callback(update, context, api_key=api_key)
-	elif data.startswith(CB_PRESET_RETRY):
-		cfg = context.application.bot_data.get("cfg") if context.application else None
-		api_key = cfg.gemini_api_key if cfg else None
-		await handle_preset_retry_callback(update, context, api_key=api_key)
-	elif data == CB_NAV_VIDEO:
-		if not has_video_credits(user_id):
-			await context.bot.send_message(
-				chat_id=user_id,
-				text=get_translation("insufficient_video_credits", language),
-			)
-			return
-		await begin_video_generation(update, context)
-	elif data == CB_NAV_IMAGE:
-		await begin_prompt(update, context)
-	elif data == CB_NAV_PRESETS:
-		await show_presets(update, context)
+	await user_settings.preload(user.id)
+	await conversations.preload(user.id)
+	# Image/video choice and preset routes are registered by their handler modules
+	await callback_router.dispatch(update, context, query.data or "")
 
 
+@memoize_per_update
 async def handle_all_messages(update: Update, context: ContextTypes.DEFAULT_TYPE, cfg: AppConfig) -> None:
 	"""Handle all types of messages including text and photos."""
 	user = update.effective_user
 	if not user:
 		return
+	await user_settings.preload(user.id)
+	await conversations.preload(user.id)
 
 	# Handle photo uploads
 	if update.effective_message.photo:
-		user_id = update.effective_user.id if update.effective_user else 0
-
-		# Check if waiting for image upload for video generation
-		if user_settings.is_awaiting_image_upload(user_id):
-			await handle_image_upload(update, context)
-			return
-
-		# Check if waiting for image upload for image-to-image generation
-		if user_settings.is_awaiting_image_upload_for_image_gen(user_id):
-			await handle_image_upload_for_image_gen(update, context)
+		handler = PHOTO_STATE_HANDLERS.get(conversations.state(user.id))
+		if handler:
+			await handler(update, context)
 			return
 
 	# Handle text messages
@@ -364,7 +432,69 @@ async def handle_all_messages(update: Update, context: ContextTypes.DEFAULT_TYPE
 		await handle_text_buttons(update, context, cfg)
 
 
+async def expire_reservations_periodically() -> None:
+	"""Refund credits held by generations that never settled (e.g. the process died mid-call)."""
+	while True:
+		try:
+			await async_bot_db.expire_credit_reservations()
+		except Exception as exc:
+			log.warning("Credit reservation sweep failed: %s", exc)
+		await asyncio.sleep(RESERVATION_SWEEP_INTERVAL)
+
+
+async def compact_ledger_periodically() -> None:
+	"""Fold old credit ledger entries into per-user totals and drop old finished video jobs."""
+	while True:
+		try:
+			await async_bot_db.compact_credit_ledger(LEDGER_RETENTION_DAYS)
+		except Exception as exc:
+			log.warning("Credit ledger compaction failed: %s", exc)
+		try:
+			await async_bot_db.prune_video_jobs(VIDEO_JOB_RETENTION_DAYS)
+		except Exception as exc:
+			log.warning("Video job pruning failed: %s", exc)
+		await asyncio.sleep(LEDGER_COMPACTION_INTERVAL)
+
+
+async def expire_conversations_periodically() -> None:
+	"""Drop abandoned generation flows and delete the images they uploaded."""
+	while True:
+		try:
+			expired = conversations.expire()
+			if expired:
+				log.info("Expired %d idle conversation(s)", expired)
+			await conversations.prune_persisted()
+		except Exception as exc:
+			log.warning("Conversation sweep failed: %s", exc)
+		await asyncio.sleep(CONVERSATION_SWEEP_INTERVAL)
+
+
+async def prune_generation_cache_periodically() -> None:
+	"""Drop expired cached generations and evict the least recently used beyond the cap."""
+	while True:
+		try:
+			removed = await generation_cache.prune()
+			if removed:
+				log.info("Pruned %d cached generation(s)", removed)
+		except Exception as exc:
+			log.warning("Generation cache pruning failed: %s", exc)
+		await asyncio.sleep(GENERATION_CACHE_SWEEP_INTERVAL)
+
+
 async def post_init(application: Application) -> None:
+	application.create_task(expire_reservations_periodically())
+	application.create_task(compact_ledger_periodically())
+	application.create_task(expire_conversations_periodically())
+	if generation_cache.enabled:
+		application.create_task(prune_generation_cache_periodically())
+	try:
+		await conversations.restore_index()
+	except Exception as exc:
+		log.warning("Failed to load persisted conversations: %s", exc)
+	try:
+		await video_jobs.resume_video_jobs(application.bot, application.bot_data["gemini_video_service"])
+	except Exception as exc:
+		log.warning("Failed to resume video jobs: %s", exc)
 	try:
 		await application.bot.set_my_commands([
 			BotCommand("start", "Open AuraLabs menu"),
@@ -377,6 +507,60 @@ async def post_init(application: Application) -> None:
 		log.warning("Failed to register bot commands: %s", exc)
 
 
+async def post_shutdown(application: Application) -> None:
+	# Persist in-flight conversations and drain queued writes before exit
+	conversations.flush()
+	video_service: GeminiVideoService | None = application.bot_data.get("gemini_video_service")
+	# Unfinished video jobs stay persisted and resume on the next start
+	await video_jobs.shutdown()
+	if video_service is not None:
+		log.info("Video poller: %s", video_service.poller.stats())
+		await video_service.poller.close()
+	cache_stats = generation_cache.stats()
+	log.info(
+		"Generation cache: %d hits, %d misses (%.0f%% hit rate), %d stored",
+		cache_stats.hits, cache_stats.misses, cache_stats.hit_rate * 100, cache_stats.stores,
+	)
+	flight_stats = generation_flights.stats()
+	log.info(
+		"Generation coalescing: %d requests, %d Gemini calls, %d saved",
+		flight_stats.calls, flight_stats.executions, flight_stats.coalesced,
+	)
+	for model, queue_stats in generation_scheduler.stats().items():
+		log.info(
+			"Generation queue %s: %d granted, %d waited (mean %.0f ms, max %.1f s), peak depth %d",
+			model, queue_stats.granted, queue_stats.waited, queue_stats.mean_wait_ms,
+			queue_stats.max_wait_seconds, queue_stats.max_queued,
+		)
+	for model, breaker_stats in gemini_resilience.stats().items():
+		log.info(
+			"Gemini %s: %d calls, %d retries, %d failures, %d rejected while open, breaker opened %d times (%s)",
+			model, breaker_stats.calls, breaker_stats.retries, breaker_stats.failures,
+			breaker_stats.rejected, breaker_stats.opened, breaker_stats.state.value,
+		)
+	for model, bucket_stats in gemini_rate_limiter.stats().items():
+		log.info(
+			"Gemini %s quota (%d/min): %d requests, %d waited (mean %.0f ms), %d refused",
+			model, bucket_stats.requests_per_minute, bucket_stats.acquired, bucket_stats.waited,
+			bucket_stats.mean_wait_ms, bucket_stats.rejected,
+		)
+	gemini_pool: ClientPool | None = application.bot_data.get("gemini_pool")
+	if gemini_pool is not None:
+		for key_id, key_stats in gemini_pool.stats().items():
+			log.info(
+				"Gemini key %s: %d requests, %d errors, ejected %d times",
+				key_id, key_stats.requests, key_stats.errors, key_stats.ejections,
+			)
+	for prefix, stats in callback_router.stats().items():
+		if stats.calls:
+			log.info(
+				"Callback route %s: %d calls, %d errors, mean %.1f ms, max %.1f ms",
+				prefix, stats.calls, stats.errors, stats.mean_ms, stats.max_seconds * 1e3,
+			)
+	async_bot_db.shutdown()
+	bot_db.close()
+
+
 def build_app(cfg: AppConfig) -> Application:
 	# Configure request with longer timeouts for AI operations
 	request = HTTPXRequest(
@@ -392,11 +576,15 @@ def build_app(cfg: AppConfig) -> Application:
 		.token(cfg.telegram_bot_token)
 		.request(request)
 		.post_init(post_init)
+		.post_shutdown(post_shutdown)
 		.build()
 	)
 	# Application-scoped services for reuse
-	app.bot_data["gemini_service"] = GeminiImageService(api_key=cfg.gemini_api_key)
-	app.bot_data["gemini_video_service"] = GeminiVideoService(api_key=cfg.gemini_api_key)
+	# One client per key, shared so load is balanced across both services
+	gemini_pool = ClientPool(cfg.gemini_api_keys or (cfg.gemini_api_key,))
+	app.bot_data["gemini_pool"] = gemini_pool
+	app.bot_data["gemini_service"] = GeminiImageService(pool=gemini_pool)
+	app.bot_data["gemini_video_service"] = GeminiVideoService(pool=gemini_pool)
 	app.bot_data["cfg"] = cfg
 
 	app.add_handler(CommandHandler("start", start))
@@ -416,7 +604,11 @@ def run() -> None:
 	configure_logging()
 	cfg = load_config()
 	log.info("Starting AuraLabs bot")
-	init_db()
+	init_db(cfg)
+	user_settings.configure(cfg)
+	generation_cache.configure(cfg)
+	generation_scheduler.configure(cfg)
+	gemini_rate_limiter.configure(cfg)
 	app = build_app(cfg)
 	app.run_polling(close_loop=False)
 
@@ -0,0 +1,215 @@
+"""Append-only credit ledger shared by the bot and the admin tools.
+
+Balances stay materialized in ``users.image_credits``/``users.video_credits`` so
+reads are a single primary-key lookup. Every change to them is paired with a
+ledger row written on the same cursor, so both land in one transaction and
+``SUM(delta)`` per user and kind always equals the stored balance.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from enum import Enum
+from typing import Iterable
+
+
+class CreditKind(str, Enum):
+    IMAGE = "image"
+    VIDEO = "video"
+
+    @property
+    def column(self) -> str:
+        return f"{self.value}_credits"
+
+
+@dataclass(frozen=True)
+class LedgerEntry:
+    entry_id: int
+    user_id: int
+    kind: CreditKind
+    delta: int
+    reason: str
+    idempotency_key: str | None
+    created_at: str
+
+
+LEDGER_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS credit_ledger (
+        entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        delta INTEGER NOT NULL,
+        reason TEXT NOT NULL,
+        idempotency_key TEXT UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_credit_ledger_user ON credit_ledger (user_id, entry_id)",
+    "CREATE INDEX IF NOT EXISTS idx_credit_ledger_created_at ON credit_ledger (created_at)",
+)
+
+
+def ensure_ledger_schema(cursor: sqlite3.Cursor) -> None:
+    """Create the ledger if missing, seeding it with each user's current balance."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'credit_ledger'")
+    if cursor.fetchone():
+        return
+    for statement in LEDGER_DDL:
+        cursor.execute(statement)
+    for kind in CreditKind:
+        cursor.execute(
+            f"""
+            INSERT INTO credit_ledger (user_id, kind, delta, reason)
+            SELECT user_id, ?, {kind.column}, 'opening_balance'
+            FROM users
+            WHERE COALESCE({kind.column}, 0) != 0
+            """,
+            (kind.value,),
+        )
+
+
+def record_entry(
+    cursor: sqlite3.Cursor,
+    user_id: int,
+    kind: CreditKind,
+    delta: int,
+    reason: str,
+    idempotency_key: str | None = None,
+) -> bool:
+    """Append a ledger row. Returns False if ``idempotency_key`` was already recorded."""
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO credit_ledger (user_id, kind, delta, reason, idempotency_key)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (user_id, kind.value, delta, reason, idempotency_key),
+    )
+    return cursor.rowcount > 0
+
+
+def apply_credit_delta(
+    cursor: sqlite3.Cursor,
+    user_id: int,
+    kind: CreditKind,
+    delta: int,
+    reason: str,
+    idempotency_key: str | None = None,
+) -> int | None:
+    """Adjust a balance and log it. Returns the new balance, or None if skipped.
+
+    The change is skipped when the user doesn't exist, when it would take the
+    balance below zero, or when ``idempotency_key`` has been applied before.
+    """
+    if idempotency_key is not None:
+        cursor.execute("SELECT 1 FROM credit_ledger WHERE idempotency_key = ?", (idempotency_key,))
+        if cursor.fetchone():
+            return None
+    column = kind.column
+    cursor.execute(
+        f"""
+        UPDATE users SET {column} = COALESCE({column}, 0) + ?
+        WHERE user_id = ? AND COALESCE({column}, 0) + ? >= 0
+        RETURNING {column}
+        """,
+        (delta, user_id, delta),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    record_entry(cursor, user_id, kind, delta, reason, idempotency_key)
+    return row[0]
+
+
+def set_balances(
+    cursor: sqlite3.Cursor,
+    user_ids: Iterable[int],
+    kind: CreditKind,
+    value: int,
+    reason: str,
+) -> int:
+    """Overwrite balances, logging the difference for each user. Returns rows updated."""
+    ids = list(user_ids)
+    if not ids:
+        return 0
+    column = kind.column
+    placeholders = ",".join("?" for _ in ids)
+    cursor.execute(
+        f"""
+        INSERT INTO credit_ledger (user_id, kind, delta, reason)
+        SELECT user_id, ?, ? - COALESCE({column}, 0), ?
+        FROM users
+        WHERE user_id IN ({placeholders}) AND COALESCE({column}, 0) != ?
+        """,
+        (kind.value, value, reason, *ids, value),
+    )
+    cursor.execute(
+        f"UPDATE users SET {column} = ? WHERE user_id IN ({placeholders})",
+        (value, *ids),
+    )
+    return cursor.rowcount
+
+
+def fetch_history(
+    cursor: sqlite3.Cursor,
+    user_id: int,
+    *,
+    limit: int = 50,
+    before_id: int | None = None,
+) -> list[LedgerEntry]:
+    """Newest-first ledger entries for a user, paginated by ``before_id``."""
+    cursor.execute(
+        """
+        SELECT entry_id, user_id, kind, delta, reason, idempotency_key, created_at
+        FROM credit_ledger
+        WHERE user_id = ? AND entry_id < ?
+        ORDER BY entry_id DESC
+        LIMIT ?
+        """,
+        (user_id, before_id if before_id is not None else 2**63 - 1, limit),
+    )
+    return [
+        LedgerEntry(
+            entry_id=row[0],
+            user_id=row[1],
+            kind=CreditKind(row[2]),
+            delta=row[3],
+            reason=row[4],
+            idempotency_key=row[5],
+            created_at=row[6],
+        )
+        for row in cursor.fetchall()
+    ]
+
+
+def compact_ledger(cursor: sqlite3.Cursor, older_than_days: int) -> int:
+    """Fold entries older than the cutoff into one row per user and kind.
+
+    The newest old entry of each group is kept and rewritten to carry the group
+    total, so balances still reconcile and history order is preserved.
+    Idempotency keys of folded entries are dropped. Returns rows removed.
+    """
+    cursor.execute(
+        """
+        SELECT user_id, kind, MAX(entry_id), SUM(delta)
+        FROM credit_ledger
+        WHERE created_at < datetime('now', ?)
+        GROUP BY user_id, kind
+        HAVING COUNT(*) > 1
+        """,
+        (f"{-int(older_than_days):+d} days",),
+    )
+    groups = cursor.fetchall()
+    removed = 0
+    for user_id, kind, keep_id, total in groups:
+        cursor.execute(
+            "DELETE FROM credit_ledger WHERE user_id = ? AND kind = ? AND entry_id < ?",
+            (user_id, kind, keep_id),
+        )
+        removed += cursor.rowcount
+        cursor.execute(
+            "UPDATE credit_ledger SET delta = ?, reason = 'compacted', idempotency_key = NULL WHERE entry_id = ?",
+            (total, keep_id),
+        )
+    return removed
@@ -1,70 +1,328 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import logging
+import queue
 import sqlite3
-from typing import Final
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Callable, Final, Iterator, Optional, TypeVar
+
+from core.credit_ledger import (
+    CreditKind,
+    LedgerEntry,
+    apply_credit_delta,
+    compact_ledger,
+    fetch_history,
+    record_entry,
+)
+from core.db_pool import ConnectionPool, PoolSettings, PoolStats
+from core.migrations import LATEST_VERSION, migrate
+
+if TYPE_CHECKING:
+    from core.utils.config import AppConfig
 
 log = logging.getLogger(__name__)
 
 DB_PATH: Final[str] = "bot_database.db"
 
+T = TypeVar("T")
+
+# (user_id, state, text_only, image_path, updated_at)
+ConversationRow = tuple[int, str, bool, Optional[str], float]
+
+
+# How long a reservation may stay open before it is refunded by the expiry sweep.
+# Generous enough to cover the slowest generation (video polling caps at 30 minutes).
+RESERVATION_TTL_SECONDS: Final[dict[CreditKind, float]] = {
+    CreditKind.IMAGE: 10 * 60,
+    CreditKind.VIDEO: 60 * 60,
+}
+
+
+class RollbackWrite(Exception):
+    """Raised by a queued write to undo its own changes while still returning ``result``."""
+
+    def __init__(self, result: Any = None) -> None:
+        super().__init__()
+        self.result = result
+
+
+@dataclass(frozen=True)
+class WriteQueueStats:
+    batches: int
+    # Writes that committed; rolled back, failed and cancelled ones are not counted
+    writes: int
+    # Writes that rolled their own savepoint back (RollbackWrite), e.g. a skipped reservation
+    rolled_back: int
+    failed: int
+    largest_batch: int
+    pending: int
+
+
+class WriteQueue:
+    """Single writer thread that drains queued mutations and group-commits them.
+
+    Each write is a callable receiving a cursor. The writer collects up to
+    ``max_batch_size`` writes, waiting at most ``max_latency_ms`` after the first
+    one, runs each inside its own SAVEPOINT and commits the batch with one
+    fsync. A failing write is rolled back alone and its future gets the error;
+    the rest of the batch still commits. Futures resolve only after the commit.
+    """
+
+    _STOP = object()
+
+    def __init__(self, pool: ConnectionPool, max_batch_size: int = 64, max_latency_ms: float = 5.0) -> None:
+        self._pool = pool
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_latency = max(0.0, max_latency_ms) / 1000
+        self._queue: queue.SimpleQueue[Any] = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._batches = 0
+        self._writes = 0
+        self._rolled_back = 0
+        self._failed = 0
+        self._largest_batch = 0
+
+    def submit(self, op: Callable[[sqlite3.Cursor], T]) -> Future[T]:
+        """Queue a write; the returned future resolves once its batch has committed."""
+        future: Future[T] = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="bot-db-writer", daemon=True)
+                self._thread.start()
+            self._queue.put((op, future))
+        return future
+
+    def stats(self) -> WriteQueueStats:
+        with self._lock:
+            return WriteQueueStats(
+                batches=self._batches,
+                writes=self._writes,
+                rolled_back=self._rolled_back,
+                failed=self._failed,
+                largest_batch=self._largest_batch,
+                pending=self._queue.qsize(),
+            )
+
+    def close(self) -> None:
+        """Commit everything already queued and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+            if thread is not None:
+                self._queue.put(self._STOP)
+        if thread is not None:
+            thread.join()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: list[tuple[Callable[[sqlite3.Cursor], Any], Future[Any]]]) -> None:
+        done: list[tuple[Future[Any], Any]] = []
+        rolled_back = 0
+        failed = 0
+        try:
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    for op, future in batch:
+                        if not future.set_running_or_notify_cancel():
+                            continue
+                        cursor.execute("SAVEPOINT queued_write")
+                        try:
+                            result = op(cursor)
+                        except RollbackWrite as rollback:
+                            cursor.execute("ROLLBACK TO queued_write")
+                            result = rollback.result
+                            rolled_back += 1
+                        except BaseException as exc:
+                            cursor.execute("ROLLBACK TO queued_write")
+                            cursor.execute("RELEASE queued_write")
+                            future.set_exception(exc)
+                            failed += 1
+                            continue
+                        cursor.execute("RELEASE queued_write")
+                        done.append((future, result))
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+        except BaseException as exc:
+            log.error("Database write batch of %d failed: %s", len(batch), exc)
+            for _, future in batch:
+                if not future.done():
+                    if future.running():
+                        future.set_exception(exc)
+                    elif future.set_running_or_notify_cancel():
+                        future.set_exception(exc)
+            with self._lock:
+                self._batches += 1
+                self._failed += len(batch)
+            return
+        for future, result in done:
+            future.set_result(result)
+        with self._lock:
+            self._batches += 1
+            self._writes += len(done) - rolled_back
+            self._rolled_back += rolled_back
+            self._failed += failed
+            self._largest_batch = max(self._largest_batch, len(batch))
+
+
+@dataclass(frozen=True)
+class CreditReservation:
+    reservation_id: int
+    user_id: int
+    kind: CreditKind
+    remaining: int
+
+
+class VideoJobStatus(str, Enum):
+    SUBMITTING = "submitting"  # credit held, generate_videos call in flight
+    RUNNING = "running"  # operation submitted, waiting for it to finish
+    DELIVERING = "delivering"  # finished; being downloaded and sent
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
+
+ACTIVE_VIDEO_JOB_STATUSES: Final[tuple[VideoJobStatus, ...]] = (
+    VideoJobStatus.SUBMITTING,
+    VideoJobStatus.RUNNING,
+    VideoJobStatus.DELIVERING,
+)
+_ACTIVE_VIDEO_JOBS_SQL = ", ".join(f"'{status.value}'" for status in ACTIVE_VIDEO_JOB_STATUSES)
+
+
+@dataclass(frozen=True)
+class VideoJob:
+    job_id: int
+    user_id: int
+    chat_id: int
+    prompt: str
+    language: str
+    reservation_id: int | None
+    operation_name: str | None
+    status: VideoJobStatus
+    attempts: int
+    created_at: float
+    updated_at: float
+    # Which Gemini key submitted the operation; see services.client_pool
+    api_key_id: str | None = None
+
+
+_VIDEO_JOB_COLUMNS = (
+    "job_id, user_id, chat_id, prompt, language, reservation_id, "
+    "operation_name, status, attempts, created_at, updated_at, api_key_id"
+)
+
+
+def _video_job(row: tuple) -> VideoJob:
+    return VideoJob(*row[:7], VideoJobStatus(row[7]), *row[8:])
+
+
+def _log_write_failure(future: Future[Any], action: str) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        log.error(f"Database error {action}: {future.exception()}")
+
 
 class BotDatabase:
     """Database layer for bot operations, separating SQL statements from business logic."""
 
-    def __init__(self, db_path: str = DB_PATH) -> None:
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        pool_settings: PoolSettings | None = None,
+        write_batch_size: int = 64,
+        write_max_latency_ms: float = 5.0,
+    ) -> None:
         self.db_path = db_path
+        self._pool = ConnectionPool(db_path, pool_settings)
+        self._writes = WriteQueue(self._pool, write_batch_size, write_max_latency_ms)
+
+    def configure(self, cfg: AppConfig) -> None:
+        """Rebuild the connection pool and write queue from application config."""
+        self.close()
+        self.db_path = cfg.db_path
+        self._pool = ConnectionPool(cfg.db_path, PoolSettings.from_config(cfg))
+        self._writes = WriteQueue(self._pool, cfg.db_write_batch_size, cfg.db_write_max_latency_ms)
+
+    def close(self) -> None:
+        """Flush queued writes and close all pooled connections."""
+        self._writes.close()
+        self._pool.close()
+
+    def submit_write(self, op: Callable[[sqlite3.Cursor], T]) -> Future[T]:
+        """Queue a write for the next group commit without waiting for it."""
+        return self._writes.submit(op)
+
+    def _write(self, op: Callable[[sqlite3.Cursor], T]) -> T:
+        """Queue a write and block until its batch has committed."""
+        return self._writes.submit(op).result()
+
+    def _write_or_queue(self, op: Callable[[sqlite3.Cursor], Any], wait: bool, action: str) -> Future[Any] | None:
+        if not wait:
+            future = self._writes.submit(op)
+            future.add_done_callback(lambda f: _log_write_failure(f, action))
+            return future
+        try:
+            self._write(op)
+        except sqlite3.Error as e:
+            log.error(f"Database error {action}: {e}")
+            raise
+
+    def write_stats(self) -> WriteQueueStats:
+        """Snapshot of group-commit activity (batches, writes, largest batch, backlog)."""
+        return self._writes.stats()
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """Get a database connection."""
-        return sqlite3.connect(self.db_path)
+    @property
+    def pool_size(self) -> int:
+        return self._pool.settings.pool_size
+
+    def pool_stats(self) -> PoolStats:
+        """Snapshot of connection pool usage (checkouts, waits, timeouts)."""
+        return self._pool.stats()
+
+    @contextmanager
+    def _get_connection(self) -> Iterator[sqlite3.Connection]:
+        """Check out a pooled connection wrapped in a transaction."""
+        with self._pool.connection() as conn, conn:
+            yield conn
 
     def initialize_database(self) -> None:
-        """Initialize the SQLite database and create the users table if it doesn't exist."""
+        """Bring the schema up to date by applying any pending migrations."""
         try:
             with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS users (
-                        user_id INTEGER PRIMARY KEY,
-                        first_name TEXT,
-                        username TEXT,
-                        chat_id INTEGER,
-                        image_credits INTEGER DEFAULT 0,
-                        video_credits INTEGER DEFAULT 0,
-                        language TEXT DEFAULT 'English',
-                        image_aspect_ratio TEXT DEFAULT '9:16',
-                        video_aspect_ratio TEXT DEFAULT '9:16',
-                        current_plan TEXT DEFAULT 'None',
-                        plan_expiry_date TIMESTAMP,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-
-                # Check for existing columns and add missing ones
-                cursor.execute("PRAGMA table_info(users)")
-                existing_columns = {row[1] for row in cursor.fetchall()}
-
-                if "language" not in existing_columns:
-                    cursor.execute("ALTER TABLE users ADD COLUMN language TEXT DEFAULT 'English'")
-                if "image_aspect_ratio" not in existing_columns:
-                    cursor.execute("ALTER TABLE users ADD COLUMN image_aspect_ratio TEXT DEFAULT '9:16'")
-                if "video_aspect_ratio" not in existing_columns:
-                    cursor.execute("ALTER TABLE users ADD COLUMN video_aspect_ratio TEXT DEFAULT '9:16'")
-
-                # Handle migration from old 'aspect_ratio' column to separate image/video columns
-                if "aspect_ratio" in existing_columns:
-                    cursor.execute(
-                        "UPDATE users SET image_aspect_ratio = COALESCE(aspect_ratio, '9:16') WHERE image_aspect_ratio IS NULL OR image_aspect_ratio = ''"
-                    )
-                    cursor.execute(
-                        "UPDATE users SET video_aspect_ratio = CASE WHEN video_aspect_ratio IS NULL OR video_aspect_ratio = '' THEN '9:16' ELSE video_aspect_ratio END"
-                    )
-                    cursor.execute("ALTER TABLE users DROP COLUMN aspect_ratio")
-
-                conn.commit()
-                log.info("Database initialized successfully")
-
+                applied = migrate(conn)
+            if applied:
+                log.info("Database migrated to schema version %d", LATEST_VERSION)
+            log.info("Database initialized successfully")
         except sqlite3.Error as e:
             log.error(f"Failed to initialize database: {e}")
             raise
@@ -100,106 +358,716 @@ class BotDatabase:
         initial_video_credits: int = 5,
     ) -> None:
         """Create a new user record."""
+
+        def op(cursor: sqlite3.Cursor) -> None:
+            cursor.execute(
+                """
+                INSERT INTO users (
+                    user_id,
+                    first_name,
+                    username,
+                    chat_id,
+                    image_credits,
+                    video_credits,
+                    language,
+                    image_aspect_ratio,
+                    video_aspect_ratio
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    user_id,
+                    first_name,
+                    username,
+                    chat_id,
+                    initial_image_credits,
+                    initial_video_credits,
+                    language,
+                    image_ratio,
+                    video_ratio,
+                ),
+            )
+            if initial_image_credits:
+                record_entry(cursor, user_id, CreditKind.IMAGE, initial_image_credits, "signup_grant")
+            if initial_video_credits:
+                record_entry(cursor, user_id, CreditKind.VIDEO, initial_video_credits, "signup_grant")
+
+        try:
+            self._write(op)
+            log.info("Added new user %s to database with initial credits", user_id)
+        except sqlite3.Error as e:
+            log.error(f"Database error creating user {user_id}: {e}")
+            raise
+
+    def update_user_basic_info(
+        self,
+        user_id: int,
+        first_name: str | None,
+        username: str | None,
+        chat_id: int,
+        wait: bool = True,
+    ) -> None:
+        """Update user's basic information. With ``wait=False`` the write is queued and not awaited."""
+
+        def op(cursor: sqlite3.Cursor) -> None:
+            cursor.execute(
+                """
+                UPDATE users
+                SET first_name = ?, username = ?, chat_id = ?
+                WHERE user_id = ?
+                """,
+                (first_name, username, chat_id, user_id),
+            )
+
+        self._write_or_queue(op, wait, f"updating user {user_id}")
+
+    def update_user_aspect_ratios(
+        self, user_id: int, image_ratio: str | None, video_ratio: str | None, wait: bool = True
+    ) -> None:
+        """Update user's aspect ratio preferences; a ratio passed as None is left unchanged.
+
+        With ``wait=False`` the write is queued and not awaited.
+        """
+
+        def op(cursor: sqlite3.Cursor) -> None:
+            cursor.execute(
+                """
+                UPDATE users SET
+                    image_aspect_ratio = COALESCE(?, image_aspect_ratio),
+                    video_aspect_ratio = COALESCE(?, video_aspect_ratio)
+                WHERE user_id = ?
+                """,
+                (image_ratio, video_ratio, user_id),
+            )
+
+        self._write_or_queue(op, wait, f"updating aspect ratios for user {user_id}")
+
+    def update_user_language(self, user_id: int, language: str, wait: bool = True) -> None:
+        """Update user's language preference. With ``wait=False`` the write is queued and not awaited."""
+
+        def op(cursor: sqlite3.Cursor) -> None:
+            cursor.execute(
+                "UPDATE users SET language = ? WHERE user_id = ?",
+                (language, user_id),
+            )
+
+        self._write_or_queue(op, wait, f"updating language for user {user_id}")
+
+    def get_user_credits(self, user_id: int) -> tuple[int, int]:
+        """Get user's image and video credits. Returns (image_credits, video_credits)."""
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    """
-                    INSERT INTO users (
-                        user_id,
-                        first_name,
-                        username,
-                        chat_id,
-                        image_credits,
-                        video_credits,
-                        language,
-                        image_aspect_ratio,
-                        video_aspect_ratio
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        user_id,
-                        first_name,
-                        username,
-                        chat_id,
-                        initial_image_credits,
-                        initial_video_credits,
-                        language,
-                        image_ratio,
-                        video_ratio,
-                    ),
+                    "SELECT image_credits, video_credits FROM users WHERE user_id = ?",
+                    (user_id,),
                 )
-                conn.commit()
-                log.info("Added new user %s to database with initial credits", user_id)
+                row = cursor.fetchone()
+                if row:
+                    return row[0] or 0, row[1] or 0
+                return 0, 0
         except sqlite3.Error as e:
-            log.error(f"Database error creating user {user_id}: {e}")
+            log.error(f"Database error getting credits for user {user_id}: {e}")
+            return 0, 0
+
+    def _deduct_credit(self, user_id: int, kind: CreditKind) -> bool:
+        try:
+            remaining = self._write(lambda cursor: apply_credit_delta(cursor, user_id, kind, -1, "deduct"))
+            return remaining is not None
+        except sqlite3.Error as e:
+            log.error(f"Database error deducting {kind.value} credit for user {user_id}: {e}")
+            return False
+
+    def deduct_image_credit(self, user_id: int) -> bool:
+        """Deduct 1 image credit from user. Returns True if successful."""
+        return self._deduct_credit(user_id, CreditKind.IMAGE)
+
+    def deduct_video_credit(self, user_id: int) -> bool:
+        """Deduct 1 video credit from user. Returns True if successful."""
+        return self._deduct_credit(user_id, CreditKind.VIDEO)
+
+    def grant_credits(
+        self,
+        user_id: int,
+        kind: CreditKind,
+        amount: int,
+        reason: str,
+        idempotency_key: str | None = None,
+    ) -> int | None:
+        """Add (or with a negative amount, remove) credits and log it in the ledger.
+
+        Returns the new balance, or None if the user doesn't exist, the balance
+        would go negative, or ``idempotency_key`` was already applied.
+        """
+        try:
+            return self._write(
+                lambda cursor: apply_credit_delta(cursor, user_id, kind, amount, reason, idempotency_key)
+            )
+        except sqlite3.Error as e:
+            log.error(f"Database error granting {kind.value} credits to user {user_id}: {e}")
             raise
 
-    def update_user_basic_info(self, user_id: int, first_name: str | None, username: str | None, chat_id: int) -> None:
-        """Update user's basic information."""
+    def get_credit_history(self, user_id: int, limit: int = 50, before_id: int | None = None) -> list[LedgerEntry]:
+        """Newest-first ledger entries for a user; pass the last entry_id as ``before_id`` to page."""
         try:
             with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
+                return fetch_history(conn.cursor(), user_id, limit=limit, before_id=before_id)
+        except sqlite3.Error as e:
+            log.error(f"Database error reading credit history for user {user_id}: {e}")
+            return []
+
+    def compact_credit_ledger(self, older_than_days: int = 90) -> int:
+        """Fold old ledger entries into one row per user and kind. Returns rows removed."""
+        try:
+            removed = self._write(lambda cursor: compact_ledger(cursor, older_than_days))
+            if removed:
+                log.info("Compacted %d credit ledger entries", removed)
+            return removed
+        except sqlite3.Error as e:
+            log.error(f"Database error compacting credit ledger: {e}")
+            return 0
+
+    def reserve_credit(self, user_id: int, kind: CreditKind, ttl_seconds: float | None = None) -> CreditReservation | None:
+        """Atomically take one credit on hold. Returns None if the user has none left.
+
+        The balance is decremented by a single conditional UPDATE, so concurrent
+        requests can never spend more credits than the user has. The hold must be
+        committed or refunded; otherwise it is refunded once it expires.
+        """
+        if ttl_seconds is None:
+            ttl_seconds = RESERVATION_TTL_SECONDS[kind]
+
+        def op(cursor: sqlite3.Cursor) -> CreditReservation:
+            cursor.execute(
+                "INSERT INTO credit_reservations (user_id, kind, expires_at) VALUES (?, ?, ?)",
+                (user_id, kind.value, time.time() + ttl_seconds),
+            )
+            reservation_id = cursor.lastrowid
+            remaining = apply_credit_delta(
+                cursor, user_id, kind, -1, "reservation_hold", f"reservation:{reservation_id}"
+            )
+            if remaining is None:
+                raise RollbackWrite(None)
+            return CreditReservation(
+                reservation_id=reservation_id,
+                user_id=user_id,
+                kind=kind,
+                remaining=remaining,
+            )
+
+        try:
+            return self._write(op)
+        except sqlite3.Error as e:
+            log.error(f"Database error reserving {kind.value} credit for user {user_id}: {e}")
+            return None
+
+    def commit_credit_reservation(self, reservation_id: int) -> bool:
+        """Make a reservation permanent. Returns False if it was already settled or expired."""
+
+        def op(cursor: sqlite3.Cursor) -> bool:
+            cursor.execute(
+                "DELETE FROM credit_reservations WHERE reservation_id = ?",
+                (reservation_id,),
+            )
+            return cursor.rowcount > 0
+
+        try:
+            return self._write(op)
+        except sqlite3.Error as e:
+            log.error(f"Database error committing reservation {reservation_id}: {e}")
+            return False
+
+    def _refund(self, cursor: sqlite3.Cursor, rows: list[tuple[int, int, str, int]], reason: str) -> None:
+        for reservation_id, user_id, kind, amount in rows:
+            apply_credit_delta(
+                cursor, user_id, CreditKind(kind), amount, reason, f"reservation:{reservation_id}:refund"
+            )
+
+    def refund_credit_reservation(self, reservation_id: int) -> bool:
+        """Return a held credit to the user. Returns False if it was already settled or expired."""
+
+        def op(cursor: sqlite3.Cursor) -> bool:
+            cursor.execute(
+                "DELETE FROM credit_reservations WHERE reservation_id = ? RETURNING reservation_id, user_id, kind, amount",
+                (reservation_id,),
+            )
+            rows = cursor.fetchall()
+            self._refund(cursor, rows, "reservation_refund")
+            return bool(rows)
+
+        try:
+            return self._write(op)
+        except sqlite3.Error as e:
+            log.error(f"Database error refunding reservation {reservation_id}: {e}")
+            return False
+
+    def expire_credit_reservations(self, now: float | None = None) -> int:
+        """Refund every reservation past its expiry. Returns the number refunded."""
+
+        def op(cursor: sqlite3.Cursor) -> int:
+            # Credits held by a video job still in flight are settled by that job
+            cursor.execute(
+                f"""
+                DELETE FROM credit_reservations
+                WHERE expires_at <= ?
+                  AND reservation_id NOT IN (
+                      SELECT reservation_id FROM video_jobs
+                      WHERE status IN ({_ACTIVE_VIDEO_JOBS_SQL}) AND reservation_id IS NOT NULL
+                  )
+                RETURNING reservation_id, user_id, kind, amount
+                """,
+                (time.time() if now is None else now,),
+            )
+            rows = cursor.fetchall()
+            self._refund(cursor, rows, "reservation_expired")
+            return len(rows)
+
+        try:
+            expired = self._write(op)
+            if expired:
+                log.info("Refunded %d expired credit reservation(s)", expired)
+            return expired
+        except sqlite3.Error as e:
+            log.error(f"Database error expiring credit reservations: {e}")
+            return 0
+
+    def save_conversations(
+        self,
+        rows: list[ConversationRow],
+        deleted: list[int],
+        wait: bool = True,
+    ) -> Future[None] | None:
+        """Upsert and delete persisted conversation state in one write.
+
+        With ``wait=False`` the write is queued and its future returned.
+        """
+
+        def op(cursor: sqlite3.Cursor) -> None:
+            if rows:
+                cursor.executemany(
                     """
-                    UPDATE users
-                    SET first_name = ?, username = ?, chat_id = ?
-                    WHERE user_id = ?
+                    INSERT INTO conversations (user_id, state, text_only, image_path, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(user_id) DO UPDATE SET
+                        state = excluded.state,
+                        text_only = excluded.text_only,
+                        image_path = excluded.image_path,
+                        updated_at = excluded.updated_at
                     """,
-                    (first_name, username, chat_id, user_id),
+                    rows,
+                )
+            if deleted:
+                cursor.executemany("DELETE FROM conversations WHERE user_id = ?", [(uid,) for uid in deleted])
+
+        return self._write_or_queue(op, wait, "saving conversation state")
+
+    def get_conversation(self, user_id: int) -> ConversationRow | None:
+        """Persisted (user_id, state, text_only, image_path, updated_at) for a user."""
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT user_id, state, text_only, image_path, updated_at FROM conversations WHERE user_id = ?",
+                    (user_id,),
                 )
-                conn.commit()
-                log.info("Updated user %s in database", user_id)
+                row = cursor.fetchone()
+                return (row[0], row[1], bool(row[2]), row[3], row[4]) if row else None
         except sqlite3.Error as e:
-            log.error(f"Database error updating user {user_id}: {e}")
-            raise
+            log.error(f"Database error loading conversation for user {user_id}: {e}")
+            return None
 
-    def update_user_aspect_ratios(self, user_id: int, image_ratio: str, video_ratio: str) -> None:
-        """Update user's aspect ratio preferences."""
+    def get_conversation_index(self) -> dict[int, float]:
+        """Map of user_id to last update for every persisted conversation."""
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
+                cursor.execute("SELECT user_id, updated_at FROM conversations")
+                return dict(cursor.fetchall())
+        except sqlite3.Error as e:
+            log.error(f"Database error listing conversations: {e}")
+            return {}
+
+    def prune_conversations(self, cutoff: float) -> list[str]:
+        """Delete conversations last updated before ``cutoff``. Returns their image paths."""
+
+        def op(cursor: sqlite3.Cursor) -> list[str]:
+            cursor.execute(
+                "DELETE FROM conversations WHERE updated_at <= ? RETURNING image_path",
+                (cutoff,),
+            )
+            return [row[0] for row in cursor.fetchall() if row[0]]
+
+        try:
+            return self._write(op)
+        except sqlite3.Error as e:
+            log.error(f"Database error pruning conversations: {e}")
+            return []
+
+    def create_video_job(
+        self,
+        user_id: int,
+        chat_id: int,
+        prompt: str,
+        language: str,
+        reservation_id: int | None,
+    ) -> VideoJob | None:
+        """Record a video job before it is submitted, in the SUBMITTING state."""
+        now = time.time()
+
+        def op(cursor: sqlite3.Cursor) -> VideoJob:
+            cursor.execute(
+                f"""
+                INSERT INTO video_jobs (user_id, chat_id, prompt, language, reservation_id, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                RETURNING {_VIDEO_JOB_COLUMNS}
+                """,
+                (user_id, chat_id, prompt, language, reservation_id, VideoJobStatus.SUBMITTING.value, now, now),
+            )
+            return _video_job(cursor.fetchone())
+
+        try:
+            return self._write(op)
+        except sqlite3.Error as e:
+            log.error(f"Database error creating video job for user {user_id}: {e}")
+            return None
+
+    def advance_video_job(
+        self,
+        job_id: int,
+        from_status: VideoJobStatus,
+        to_status: VideoJobStatus,
+        operation_name: str | None = None,
+        api_key_id: str | None = None,
+    ) -> bool:
+        """Move a job between active states if it is still in ``from_status``.
+
+        Only one caller can win a given transition, which is what keeps a job
+        from being delivered twice. Entering DELIVERING counts a delivery attempt.
+        """
+
+        def op(cursor: sqlite3.Cursor) -> bool:
+            cursor.execute(
+                """
+                UPDATE video_jobs
+                SET status = ?,
+                    operation_name = COALESCE(?, operation_name),
+                    api_key_id = COALESCE(?, api_key_id),
+                    attempts = attempts + (? = 'delivering'),
+                    updated_at = ?
+                WHERE job_id = ? AND status = ?
+                """,
+                (to_status.value, operation_name, api_key_id, to_status.value, time.time(), job_id, from_status.value),
+            )
+            return cursor.rowcount > 0
+
+        try:
+            return self._write(op)
+        except sqlite3.Error as e:
+            log.error(f"Database error moving video job {job_id} to {to_status.value}: {e}")
+            return False
+
+    def finish_video_job(self, job_id: int, delivered: bool) -> bool:
+        """Mark an active job delivered or failed, committing or refunding its credit in the same write.
+
+        Returns False if the job had already finished.
+        """
+        status = VideoJobStatus.DELIVERED if delivered else VideoJobStatus.FAILED
+
+        def op(cursor: sqlite3.Cursor) -> bool:
+            cursor.execute(
+                f"""
+                UPDATE video_jobs SET status = ?, updated_at = ?
+                WHERE job_id = ? AND status IN ({_ACTIVE_VIDEO_JOBS_SQL})
+                RETURNING reservation_id
+                """,
+                (status.value, time.time(), job_id),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return False
+            if row[0] is not None:
                 cursor.execute(
-                    "UPDATE users SET image_aspect_ratio = ?, video_aspect_ratio = ? WHERE user_id = ?",
-                    (image_ratio, video_ratio, user_id),
+                    "DELETE FROM credit_reservations WHERE reservation_id = ? RETURNING reservation_id, user_id, kind, amount",
+                    (row[0],),
                 )
-                conn.commit()
+                refunds = cursor.fetchall()
+                if not delivered:
+                    self._refund(cursor, refunds, "reservation_refund")
+            return True
+
+        try:
+            return self._write(op)
         except sqlite3.Error as e:
-            log.error(f"Database error updating aspect ratios for user {user_id}: {e}")
-            raise
+            log.error(f"Database error finishing video job {job_id}: {e}")
+            return False
 
-    def update_user_language(self, user_id: int, language: str) -> None:
-        """Update user's language preference."""
+    def get_active_video_jobs(self) -> list[VideoJob]:
+        """Every job that has not been delivered or failed, oldest first."""
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "UPDATE users SET language = ? WHERE user_id = ?",
-                    (language, user_id),
+                    f"SELECT {_VIDEO_JOB_COLUMNS} FROM video_jobs WHERE status IN ({_ACTIVE_VIDEO_JOBS_SQL}) ORDER BY job_id"
                 )
-                conn.commit()
+                return [_video_job(row) for row in cursor.fetchall()]
         except sqlite3.Error as e:
-            log.error(f"Database error updating language for user {user_id}: {e}")
-            raise
+            log.error(f"Database error listing video jobs: {e}")
+            return []
+
+    def prune_video_jobs(self, older_than_days: int) -> int:
+        """Delete finished jobs older than the cutoff. Returns rows removed."""
+
+        def op(cursor: sqlite3.Cursor) -> int:
+            cursor.execute(
+                f"DELETE FROM video_jobs WHERE status NOT IN ({_ACTIVE_VIDEO_JOBS_SQL}) AND updated_at <= ?",
+                (time.time() - older_than_days * 24 * 60 * 60,),
+            )
+            return cursor.rowcount
 
-    def get_user_credits(self, user_id: int) -> tuple[int, int]:
-        """Get user's image and video credits. Returns (image_credits, video_credits)."""
+        try:
+            return self._write(op)
+        except sqlite3.Error as e:
+            log.error(f"Database error pruning video jobs: {e}")
+            return 0
+
+    def get_cached_generation(self, cache_key: str, created_after: float) -> tuple[str, float] | None:
+        """(file_id, created_at) stored for ``cache_key``, unless older than ``created_after``."""
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
-                    "SELECT image_credits, video_credits FROM users WHERE user_id = ?",
-                    (user_id,),
+                    "SELECT file_id, created_at FROM generation_cache WHERE cache_key = ? AND created_at > ?",
+                    (cache_key, created_after),
                 )
                 row = cursor.fetchone()
-                if row:
-                    return row[0] or 0, row[1] or 0
-                return 0, 0
+                return (row[0], row[1]) if row else None
         except sqlite3.Error as e:
-            log.error(f"Database error getting credits for user {user_id}: {e}")
-            return 0, 0
+            log.error(f"Database error reading generation cache: {e}")
+            return None
+
+    def save_generation(
+        self, cache_key: str, kind: str, file_id: str, now: float | None = None, wait: bool = True
+    ) -> Future[None] | None:
+        """Store (or replace) the file_id delivered for ``cache_key``."""
+        now = time.time() if now is None else now
+
+        def op(cursor: sqlite3.Cursor) -> None:
+            cursor.execute(
+                """
+                INSERT INTO generation_cache (cache_key, kind, file_id, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    kind = excluded.kind,
+                    file_id = excluded.file_id,
+                    hits = 0,
+                    created_at = excluded.created_at,
+                    last_used_at = excluded.last_used_at
+                """,
+                (cache_key, kind, file_id, now, now),
+            )
+
+        return self._write_or_queue(op, wait, "saving generation cache entry")
+
+    def touch_generations(self, cache_keys: list[str], now: float | None = None, wait: bool = True) -> Future[None] | None:
+        """Record hits, keeping the entries out of size-based eviction."""
+        now = time.time() if now is None else now
+
+        def op(cursor: sqlite3.Cursor) -> None:
+            cursor.executemany(
+                "UPDATE generation_cache SET hits = hits + 1, last_used_at = ? WHERE cache_key = ?",
+                [(now, key) for key in cache_keys],
+            )
+
+        return self._write_or_queue(op, wait, "recording generation cache hits")
+
+    def delete_generation(self, cache_key: str, wait: bool = True) -> Future[None] | None:
+        """Drop the entry for ``cache_key``, e.g. after Telegram rejected its file_id."""
+
+        def op(cursor: sqlite3.Cursor) -> None:
+            cursor.execute("DELETE FROM generation_cache WHERE cache_key = ?", (cache_key,))
+
+        return self._write_or_queue(op, wait, "deleting generation cache entry")
+
+    def prune_generation_cache(self, created_before: float, max_entries: int) -> int:
+        """Drop expired entries, then the least recently used beyond ``max_entries``. Returns rows removed."""
+
+        def op(cursor: sqlite3.Cursor) -> int:
+            cursor.execute("DELETE FROM generation_cache WHERE created_at <= ?", (created_before,))
+            removed = cursor.rowcount
+            cursor.execute(
+                """
+                DELETE FROM generation_cache WHERE cache_key IN (
+                    SELECT cache_key FROM generation_cache
+                    ORDER BY last_used_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (max_entries,),
+            )
+            return removed + cursor.rowcount
+
+        try:
+            return self._write(op)
+        except sqlite3.Error as e:
+            log.error(f"Database error pruning generation cache: {e}")
+            return 0
+
+
+class AsyncBotDatabase:
+    """Awaitable facade over BotDatabase for use from the asyncio event loop.
+
+    Queries run on a dedicated executor sized to the connection pool, so a slow
+    fsync only delays the awaiting handler instead of every user's update, and
+    database work never competes with ``asyncio.to_thread`` calls for threads.
+    """
+
+    def __init__(self, db: BotDatabase) -> None:
+        self._db = db
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._db.pool_size,
+                thread_name_prefix="bot-db",
+            )
+        return self._executor
+
+    async def _run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        """Stop the executor; it is recreated on next use."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def initialize_database(self) -> None:
+        await self._run(self._db.initialize_database)
+
+    async def get_user_preferences(self, user_id: int) -> tuple[str, str, str] | None:
+        return await self._run(self._db.get_user_preferences, user_id)
+
+    async def create_user(self, **kwargs: Any) -> None:
+        await self._run(self._db.create_user, **kwargs)
+
+    async def update_user_basic_info(
+        self,
+        user_id: int,
+        first_name: str | None,
+        username: str | None,
+        chat_id: int,
+        wait: bool = True,
+    ) -> None:
+        if not wait:
+            # Queuing never blocks, so skip the executor hop entirely
+            self._db.update_user_basic_info(user_id, first_name, username, chat_id, wait=False)
+            return
+        await self._run(self._db.update_user_basic_info, user_id, first_name, username, chat_id)
+
+    async def update_user_aspect_ratios(self, user_id: int, image_ratio: str | None, video_ratio: str | None) -> None:
+        await self._run(self._db.update_user_aspect_ratios, user_id, image_ratio, video_ratio)
+
+    async def update_user_language(self, user_id: int, language: str) -> None:
+        await self._run(self._db.update_user_language, user_id, language)
+
+    async def get_user_credits(self, user_id: int) -> tuple[int, int]:
+        return await self._run(self._db.get_user_credits, user_id)
+
+    async def deduct_image_credit(self, user_id: int) -> bool:
+        return await self._run(self._db.deduct_image_credit, user_id)
+
+    async def deduct_video_credit(self, user_id: int) -> bool:
+        return await self._run(self._db.deduct_video_credit, user_id)
+
+    async def grant_credits(
+        self,
+        user_id: int,
+        kind: CreditKind,
+        amount: int,
+        reason: str,
+        idempotency_key: str | None = None,
+    ) -> int | None:
+        return await self._run(self._db.grant_credits, user_id, kind, amount, reason, idempotency_key)
+
+    async def get_credit_history(self, user_id: int, limit: int = 50, before_id: int | None = None) -> list[LedgerEntry]:
+        return await self._run(self._db.get_credit_history, user_id, limit, before_id)
+
+    async def compact_credit_ledger(self, older_than_days: int = 90) -> int:
+        return await self._run(self._db.compact_credit_ledger, older_than_days)
+
+    async def reserve_credit(self, user_id: int, kind: CreditKind, ttl_seconds: float | None = None) -> CreditReservation | None:
+        return await self._run(self._db.reserve_credit, user_id, kind, ttl_seconds)
+
+    async def commit_credit_reservation(self, reservation_id: int) -> bool:
+        return await self._run(self._db.commit_credit_reservation, reservation_id)
+
+    async def refund_credit_reservation(self, reservation_id: int) -> bool:
+        return await self._run(self._db.refund_credit_reservation, reservation_id)
+
+    async def expire_credit_reservations(self) -> int:
+        return await self._run(self._db.expire_credit_reservations)
+
+    def save_conversations(self, rows: list[ConversationRow], deleted: list[int]) -> Future[None] | None:
+        # Queuing never blocks, so this stays on the event loop
+        return self._db.save_conversations(rows, deleted, wait=False)
+
+    async def get_conversation(self, user_id: int) -> ConversationRow | None:
+        return await self._run(self._db.get_conversation, user_id)
+
+    async def get_conversation_index(self) -> dict[int, float]:
+        return await self._run(self._db.get_conversation_index)
+
+    async def prune_conversations(self, cutoff: float) -> list[str]:
+        return await self._run(self._db.prune_conversations, cutoff)
+
+    async def create_video_job(
+        self,
+        user_id: int,
+        chat_id: int,
+        prompt: str,
+        language: str,
+        reservation_id: int | None,
+    ) -> VideoJob | None:
+        return await self._run(self._db.create_video_job, user_id, chat_id, prompt, language, reservation_id)
+
+    async def advance_video_job(
+        self,
+        job_id: int,
+        from_status: VideoJobStatus,
+        to_status: VideoJobStatus,
+        operation_name: str | None = None,
+        api_key_id: str | None = None,
+    ) -> bool:
+        return await self._run(self._db.advance_video_job, job_id, from_status, to_status, operation_name, api_key_id)
+
+    async def finish_video_job(self, job_id: int, delivered: bool) -> bool:
+        return await self._run(self._db.finish_video_job, job_id, delivered)
+
+    async def get_active_video_jobs(self) -> list[VideoJob]:
+        return await self._run(self._db.get_active_video_jobs)
+
+    async def prune_video_jobs(self, older_than_days: int) -> int:
+        return await self._run(self._db.prune_video_jobs, older_than_days)
+
+    async def get_cached_generation(self, cache_key: str, created_after: float) -> tuple[str, float] | None:
+        return await self._run(self._db.get_cached_generation, cache_key, created_after)
+
+    def save_generation(self, cache_key: str, kind: str, file_id: str, now: float | None = None) -> Future[None] | None:
+        # Queuing never blocks, so this stays on the event loop
+        return self._db.save_generation(cache_key, kind, file_id, now, wait=False)
+
+    def touch_generations(self, cache_keys: list[str], now: float | None = None) -> Future[None] | None:
+        return self._db.touch_generations(cache_keys, now, wait=False)
+
+    def delete_generation(self, cache_key: str) -> Future[None] | None:
+        return self._db.delete_generation(cache_key, wait=False)
+
+    async def prune_generation_cache(self, created_before: float, max_entries: int) -> int:
+        return await self._run(self._db.prune_generation_cache, created_before, max_entries)
 
 
 # Global database instance
 bot_db = BotDatabase()
+async_bot_db = AsyncBotDatabase(bot_db)
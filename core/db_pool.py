@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from core.utils.config import AppConfig
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """Sizing and PRAGMA settings applied to every pooled connection."""
+
+    pool_size: int = 5
+    busy_timeout_ms: int = 5000
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 64 * 1024 * 1024
+    checkout_timeout: float = 30.0
+
+    @classmethod
+    def from_config(cls, cfg: AppConfig) -> PoolSettings:
+        return cls(
+            pool_size=cfg.db_pool_size,
+            busy_timeout_ms=cfg.db_busy_timeout_ms,
+            journal_mode=cfg.db_journal_mode,
+            synchronous=cfg.db_synchronous,
+            mmap_size=cfg.db_mmap_size,
+        )
+
+
+@dataclass(frozen=True)
+class PoolStats:
+    size: int
+    created: int
+    idle: int
+    in_use: int
+    checkouts: int
+    waits: int
+    wait_seconds: float
+    timeouts: int
+
+
+class ConnectionPool:
+    """Bounded pool of persistent SQLite connections shared across threads.
+
+    Connections are opened lazily up to ``pool_size`` and handed out LIFO so the
+    hottest connection (and its page cache) is reused first. When every
+    connection is checked out, callers block for up to ``checkout_timeout``
+    seconds; those waits are counted so pool pressure is visible via ``stats()``.
+    """
+
+    def __init__(self, db_path: str, settings: PoolSettings | None = None) -> None:
+        self.db_path = db_path
+        self.settings = settings or PoolSettings()
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._created = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._timeouts = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        s = self.settings
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=s.busy_timeout_ms / 1000,
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA journal_mode={s.journal_mode}")
+        conn.execute(f"PRAGMA synchronous={s.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(s.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA mmap_size={int(s.mmap_size)}")
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                if self._created < self.settings.pool_size:
+                    self._created += 1
+                    create = True
+                else:
+                    self._waits += 1
+                    create = False
+            if create:
+                try:
+                    conn = self._connect()
+                except sqlite3.Error:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                started = time.monotonic()
+                try:
+                    conn = self._idle.get(timeout=self.settings.checkout_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise sqlite3.OperationalError(
+                        f"Timed out waiting for a database connection ({self.settings.pool_size} in use)"
+                    ) from None
+                finally:
+                    with self._lock:
+                        self._wait_seconds += time.monotonic() - started
+        with self._lock:
+            self._checkouts += 1
+        return conn
+
+    def _checkin(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                log.warning("Discarding pooled connection that failed to roll back", exc_info=True)
+                conn.close()
+                with self._lock:
+                    self._created -= 1
+                return
+        with self._lock:
+            closed = self._closed
+            if closed:
+                self._created -= 1
+        if closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Check out a connection for the duration of the ``with`` block."""
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    def stats(self) -> PoolStats:
+        with self._lock:
+            idle = self._idle.qsize()
+            return PoolStats(
+                size=self.settings.pool_size,
+                created=self._created,
+                idle=idle,
+                in_use=self._created - idle,
+                checkouts=self._checkouts,
+                waits=self._waits,
+                wait_seconds=self._wait_seconds,
+                timeouts=self._timeouts,
+            )
+
+    def close(self) -> None:
+        """Close idle connections; connections still checked out close on return."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
@@ -0,0 +1,233 @@
+"""Ordered schema migrations keyed on ``PRAGMA user_version``.
+
+Each step runs once, in its own ``BEGIN IMMEDIATE`` transaction, and bumps
+``user_version`` in that same transaction. A database that is already current
+costs a single integer read on startup. Steps that touch every row should use
+``backfill()``, which commits in rowid-ranged chunks. Those steps must be
+idempotent, because a crash mid-backfill re-runs the step from the start.
+
+Steps are also written to be safe on databases created before versioning
+existed (``user_version`` 0 with tables already present).
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable
+
+from core.credit_ledger import ensure_ledger_schema
+
+log = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def backfill(
+    conn: sqlite3.Connection,
+    table: str,
+    assignments: str,
+    where: str = "1",
+    batch_size: int | None = None,
+) -> int:
+    """Run ``UPDATE table SET assignments WHERE where`` in committed rowid chunks.
+
+    Keeps each write transaction short so the bot and admin tools aren't locked
+    out while a large table is rewritten. Returns rows updated.
+    """
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+    updated = 0
+    last_rowid = 0
+    while True:
+        (upper,) = conn.execute(
+            f"SELECT MAX(rowid) FROM (SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+            (last_rowid, batch_size),
+        ).fetchone()
+        if upper is None:
+            return updated
+        cursor = conn.execute(
+            f"UPDATE {table} SET {assignments} WHERE rowid > ? AND rowid <= ? AND ({where})",
+            (last_rowid, upper),
+        )
+        updated += cursor.rowcount
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        last_rowid = upper
+
+
+def _create_users(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            first_name TEXT,
+            username TEXT,
+            chat_id INTEGER,
+            image_credits INTEGER DEFAULT 0,
+            video_credits INTEGER DEFAULT 0,
+            language TEXT DEFAULT 'English',
+            image_aspect_ratio TEXT DEFAULT '9:16',
+            video_aspect_ratio TEXT DEFAULT '9:16',
+            current_plan TEXT DEFAULT 'None',
+            plan_expiry_date TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    existing = _columns(conn, "users")
+    if "language" not in existing:
+        conn.execute("ALTER TABLE users ADD COLUMN language TEXT DEFAULT 'English'")
+    if "image_aspect_ratio" not in existing:
+        conn.execute("ALTER TABLE users ADD COLUMN image_aspect_ratio TEXT DEFAULT '9:16'")
+    if "video_aspect_ratio" not in existing:
+        conn.execute("ALTER TABLE users ADD COLUMN video_aspect_ratio TEXT DEFAULT '9:16'")
+
+
+def _split_aspect_ratio(conn: sqlite3.Connection) -> None:
+    """Move the legacy single ``aspect_ratio`` column into image/video columns."""
+    if "aspect_ratio" not in _columns(conn, "users"):
+        return
+    # The new columns were just added with a '9:16' default, so copy any legacy
+    # value over it; the legacy column never coexisted with user-set values.
+    backfill(
+        conn,
+        "users",
+        "image_aspect_ratio = aspect_ratio",
+        "aspect_ratio IS NOT NULL AND aspect_ratio != '' AND image_aspect_ratio IS NOT aspect_ratio",
+    )
+    backfill(
+        conn,
+        "users",
+        "image_aspect_ratio = '9:16'",
+        "image_aspect_ratio IS NULL OR image_aspect_ratio = ''",
+    )
+    backfill(
+        conn,
+        "users",
+        "video_aspect_ratio = '9:16'",
+        "video_aspect_ratio IS NULL OR video_aspect_ratio = ''",
+    )
+    conn.execute("ALTER TABLE users DROP COLUMN aspect_ratio")
+
+
+def _create_credit_reservations(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS credit_reservations (
+            reservation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            amount INTEGER NOT NULL DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at REAL NOT NULL
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_credit_reservations_expires_at ON credit_reservations (expires_at)"
+    )
+
+
+def _create_credit_ledger(conn: sqlite3.Connection) -> None:
+    ensure_ledger_schema(conn.cursor())
+
+
+def _create_conversations(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS conversations (
+            user_id INTEGER PRIMARY KEY,
+            state TEXT NOT NULL,
+            text_only INTEGER NOT NULL DEFAULT 1,
+            image_path TEXT,
+            updated_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations (updated_at)")
+
+
+def _create_video_jobs(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS video_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            prompt TEXT NOT NULL,
+            language TEXT NOT NULL,
+            reservation_id INTEGER,
+            operation_name TEXT,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_video_jobs_status ON video_jobs (status, updated_at)")
+
+
+def _create_generation_cache(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS generation_cache (
+            cache_key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_generation_cache_last_used_at ON generation_cache (last_used_at)")
+
+
+def _add_video_job_api_key(conn: sqlite3.Connection) -> None:
+    # Operations can only be polled and downloaded with the key that created them
+    if "api_key_id" not in _columns(conn, "video_jobs"):
+        conn.execute("ALTER TABLE video_jobs ADD COLUMN api_key_id TEXT")
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(1, "create users", _create_users),
+    Migration(2, "split legacy aspect_ratio column", _split_aspect_ratio),
+    Migration(3, "create credit_reservations", _create_credit_reservations),
+    Migration(4, "create credit_ledger", _create_credit_ledger),
+    Migration(5, "create conversations", _create_conversations),
+    Migration(6, "create video_jobs", _create_video_jobs),
+    Migration(7, "create generation_cache", _create_generation_cache),
+    Migration(8, "add video_jobs.api_key_id", _add_video_job_api_key),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, migrations: tuple[Migration, ...] = MIGRATIONS) -> int:
+    """Apply pending migrations in order. Returns the number applied."""
+    if schema_version(conn) >= migrations[-1].version:
+        return 0
+    applied = 0
+    for migration in migrations:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-check under the write lock in case another process migrated first
+            if schema_version(conn) >= migration.version:
+                conn.rollback()
+                continue
+            log.info("Applying database migration %d: %s", migration.version, migration.name)
+            migration.apply(conn)
+            conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied += 1
+    return applied
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """Bounded least-recently-used mapping with an idle TTL.
+
+    Entries expire ``ttl_seconds`` after they were last read or written, and
+    the least recently used entry is evicted once ``maxsize`` is reached.
+    Expired entries are dropped lazily on lookup and from the cold end on
+    insert, so there is no background sweeper. Not thread-safe; use it from
+    the event loop only.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._data: OrderedDict[K, tuple[V, float]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def _expired(self, touched_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - touched_at >= self.ttl_seconds
+
+    def get(self, key: K) -> V | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        value, touched_at = entry
+        now = self._clock()
+        if self._expired(touched_at, now):
+            del self._data[key]
+            self._expirations += 1
+            self._misses += 1
+            return None
+        self._data[key] = (value, now)
+        self._data.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        now = self._clock()
+        self._data[key] = (value, now)
+        self._data.move_to_end(key)
+        self._shed(now)
+
+    def pop(self, key: K) -> V | None:
+        entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else None
+
+    def _shed(self, now: float) -> None:
+        # The cold end is ordered by last touch, so expired entries sit there
+        while self._data:
+            key, (_, touched_at) = next(iter(self._data.items()))
+            if self._expired(touched_at, now):
+                self._expirations += 1
+            elif len(self._data) > self.maxsize:
+                self._evictions += 1
+            else:
+                break
+            del self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        entry = self._data.get(key)  # type: ignore[call-overload]
+        return entry is not None and not self._expired(entry[1], self._clock())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def resize(self, maxsize: int, ttl_seconds: float | None = None) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._shed(self._clock())
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            size=len(self._data),
+            maxsize=self.maxsize,
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            expirations=self._expirations,
+        )
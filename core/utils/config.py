@@ -1,5 +1,6 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Mapping
 from dotenv import load_dotenv
 
 
@@ -7,15 +8,88 @@ from dotenv import load_dotenv
 class AppConfig:
     telegram_bot_token: str
     gemini_api_key: str
+    # Every key requests may be spread across; gemini_api_key is the first of them
+    gemini_api_keys: tuple[str, ...] = ()
+    db_path: str = "bot_database.db"
+    db_pool_size: int = 5
+    db_busy_timeout_ms: int = 5000
+    db_journal_mode: str = "WAL"
+    db_synchronous: str = "NORMAL"
+    db_mmap_size: int = 64 * 1024 * 1024
+    db_write_batch_size: int = 64
+    db_write_max_latency_ms: int = 5
+    pref_cache_size: int = 50_000
+    pref_cache_ttl_seconds: int = 3600
+    generation_cache_ttl_seconds: int = 7 * 24 * 3600
+    generation_cache_max_entries: int = 10_000
+    # Concurrent Gemini calls per model; model_concurrency overrides it for named models
+    generation_concurrency: int = 4
+    model_concurrency: Mapping[str, int] = field(default_factory=dict)
+    # Requests per minute per model, from our Gemini quotas; unlisted models are not limited
+    model_requests_per_minute: Mapping[str, int] = field(default_factory=dict)
+    # Longer than this waiting for quota and a request is refused instead
+    rate_limit_max_wait_seconds: int = 30
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise RuntimeError(f"{name} must be an integer, got {raw!r}") from None
+
+
+def _env_model_ints(name: str) -> dict[str, int]:
+    """Parse ``model=value,model=value`` into a dict."""
+    values: dict[str, int] = {}
+    for item in os.getenv(name, "").split(","):
+        if not item.strip():
+            continue
+        model, sep, raw = item.partition("=")
+        try:
+            if not sep or not model.strip():
+                raise ValueError
+            values[model.strip()] = int(raw)
+        except ValueError:
+            raise RuntimeError(f"{name} entries must look like model=integer, got {item.strip()!r}") from None
+    return values
 
 
 def load_config() -> AppConfig:
     load_dotenv()
     telegram_bot_token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
-    gemini_api_key = os.getenv("GEMINI_API_KEY", "").strip()
+    # GEMINI_API_KEYS takes a comma-separated list; GEMINI_API_KEY alone still works
+    gemini_api_keys = tuple(
+        key.strip() for key in (os.getenv("GEMINI_API_KEYS") or os.getenv("GEMINI_API_KEY", "")).split(",") if key.strip()
+    )
     if not telegram_bot_token:
         raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
-    if not gemini_api_key:
+    if not gemini_api_keys:
         raise RuntimeError("GEMINI_API_KEY is not set")
-    return AppConfig(telegram_bot_token=telegram_bot_token, gemini_api_key=gemini_api_key)
-
+    return AppConfig(
+        telegram_bot_token=telegram_bot_token,
+        gemini_api_key=gemini_api_keys[0],
+        gemini_api_keys=gemini_api_keys,
+        db_path=os.getenv("DB_PATH", "").strip() or AppConfig.db_path,
+        db_pool_size=_env_int("DB_POOL_SIZE", AppConfig.db_pool_size),
+        db_busy_timeout_ms=_env_int("DB_BUSY_TIMEOUT_MS", AppConfig.db_busy_timeout_ms),
+        db_journal_mode=os.getenv("DB_JOURNAL_MODE", "").strip() or AppConfig.db_journal_mode,
+        db_synchronous=os.getenv("DB_SYNCHRONOUS", "").strip() or AppConfig.db_synchronous,
+        db_mmap_size=_env_int("DB_MMAP_SIZE", AppConfig.db_mmap_size),
+        db_write_batch_size=_env_int("DB_WRITE_BATCH_SIZE", AppConfig.db_write_batch_size),
+        db_write_max_latency_ms=_env_int("DB_WRITE_MAX_LATENCY_MS", AppConfig.db_write_max_latency_ms),
+        pref_cache_size=_env_int("PREF_CACHE_SIZE", AppConfig.pref_cache_size),
+        pref_cache_ttl_seconds=_env_int("PREF_CACHE_TTL_SECONDS", AppConfig.pref_cache_ttl_seconds),
+        generation_cache_ttl_seconds=_env_int(
+            "GENERATION_CACHE_TTL_SECONDS", AppConfig.generation_cache_ttl_seconds
+        ),
+        generation_cache_max_entries=_env_int(
+            "GENERATION_CACHE_MAX_ENTRIES", AppConfig.generation_cache_max_entries
+        ),
+        generation_concurrency=_env_int("GENERATION_CONCURRENCY", AppConfig.generation_concurrency),
+        model_concurrency=_env_model_ints("GEMINI_MODEL_CONCURRENCY"),
+        model_requests_per_minute=_env_model_ints("GEMINI_MODEL_RPM"),
+        rate_limit_max_wait_seconds=_env_int("RATE_LIMIT_MAX_WAIT_SECONDS", AppConfig.rate_limit_max_wait_seconds),
+    )
@@ -0,0 +1,154 @@
+"""A pool of Gemini clients, one per API key.
+
+Each call leases the healthy client with the fewest calls in flight (ties go
+to the one used least recently), so load spreads evenly across keys. A key
+that returns a quota error is ejected for ``quota_cooldown`` seconds, and one
+that fails authentication for ``auth_cooldown``, unless it is the last
+healthy key: a deployment whose keys are all rejected surfaces the auth errors
+rather than an hour of "busy". If every key is ejected, ``lease()`` raises
+``ServiceBusy`` until the first one comes back.
+
+Keys are identified by ``key_id()``, a short hash that is safe to log and
+store. Long-running operations must be polled with the key that created them.
+``lease(key_id=...)`` pins such a call to its key, even while the key is
+ejected.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Sequence
+
+from google import genai
+from google.genai import errors
+
+from services.exceptions import ServiceBusy
+
+log = logging.getLogger(__name__)
+
+QUOTA_COOLDOWN_SECONDS = 60.0
+AUTH_COOLDOWN_SECONDS = 60 * 60.0
+
+
+def key_id(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class ClientStats:
+    in_flight: int
+    requests: int
+    errors: int
+    ejections: int
+    ejected_for_seconds: float
+
+
+@dataclass(slots=True)
+class PooledClient:
+    key_id: str
+    client: Any
+    in_flight: int = 0
+    requests: int = 0
+    errors: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+    last_used: float = 0.0
+
+
+class ClientPool:
+    def __init__(
+        self,
+        api_keys: Sequence[str],
+        client_factory: Callable[..., Any] = genai.Client,
+        quota_cooldown: float = QUOTA_COOLDOWN_SECONDS,
+        auth_cooldown: float = AUTH_COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        keys = list(dict.fromkeys(key for key in api_keys if key))
+        if not keys:
+            raise RuntimeError("GEMINI_API_KEY is required")
+        self.quota_cooldown = quota_cooldown
+        self.auth_cooldown = auth_cooldown
+        self._clock = clock
+        self._clients: Dict[str, PooledClient] = {
+            key_id(key): PooledClient(key_id(key), client_factory(api_key=key)) for key in keys
+        }
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    @property
+    def primary_key_id(self) -> str:
+        """The first configured key, which single-key deployments used for everything."""
+        return next(iter(self._clients))
+
+    @property
+    def primary(self) -> Any:
+        return self._clients[self.primary_key_id].client
+
+    def client(self, key_id: str | None) -> Any | None:
+        pooled = self._clients.get(key_id) if key_id else None
+        return pooled.client if pooled else None
+
+    def _pick(self) -> PooledClient:
+        now = self._clock()
+        healthy = [pooled for pooled in self._clients.values() if pooled.ejected_until <= now]
+        if not healthy:
+            retry_after = min(pooled.ejected_until for pooled in self._clients.values()) - now
+            raise ServiceBusy("gemini", retry_after)
+        return min(healthy, key=lambda pooled: (pooled.in_flight, pooled.last_used))
+
+    @contextmanager
+    def lease(self, key_id: str | None = None) -> Iterator[PooledClient]:
+        """A client for one call. Errors raised inside the block count against its key."""
+        if key_id is None:
+            pooled = self._pick()
+        else:
+            pooled = self._clients.get(key_id)
+            if pooled is None:
+                raise LookupError(f"Gemini key {key_id} is no longer configured")
+        pooled.in_flight += 1
+        pooled.requests += 1
+        pooled.last_used = self._clock()
+        try:
+            yield pooled
+        except Exception as exc:
+            self._record_error(pooled, exc)
+            raise
+        finally:
+            pooled.in_flight -= 1
+
+    def _record_error(self, pooled: PooledClient, exc: Exception) -> None:
+        pooled.errors += 1
+        if not isinstance(exc, errors.APIError):
+            return
+        if exc.code == 429 or exc.status == "RESOURCE_EXHAUSTED":
+            cooldown = self.quota_cooldown
+        elif exc.code in (401, 403):
+            now = self._clock()
+            if not any(other.ejected_until <= now for other in self._clients.values() if other is not pooled):
+                log.warning("Gemini key %s failed authentication (%s), but it is the last healthy key", pooled.key_id, exc.code)
+                return
+            cooldown = self.auth_cooldown
+        else:
+            return
+        pooled.ejected_until = self._clock() + cooldown
+        pooled.ejections += 1
+        log.warning("Ejecting Gemini key %s for %.0fs after %s", pooled.key_id, cooldown, exc.code)
+
+    def stats(self) -> Dict[str, ClientStats]:
+        now = self._clock()
+        return {
+            pooled.key_id: ClientStats(
+                in_flight=pooled.in_flight,
+                requests=pooled.requests,
+                errors=pooled.errors,
+                ejections=pooled.ejections,
+                ejected_for_seconds=max(0.0, pooled.ejected_until - now),
+            )
+            for pooled in self._clients.values()
+        }
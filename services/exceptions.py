@@ -0,0 +1,10 @@
+from __future__ import annotations
+
+
+class ServiceBusy(RuntimeError):
+    """A Gemini model can't take the call right now; it was not attempted."""
+
+    def __init__(self, model: str, retry_after: float) -> None:
+        super().__init__(f"{model} is unavailable, retry in {retry_after:.0f}s")
+        self.model = model
+        self.retry_after = retry_after
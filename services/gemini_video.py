@@ -2,28 +2,159 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from pathlib import Path
 from typing import Optional
 from google.genai import types
 from google import genai
 
+from services.client_pool import ClientPool
+from services.resilience import SUBMIT_RETRY_POLICY, Resilience, ServiceBusy, gemini_resilience
+from services.video_poller import OperationTimeout, VideoOperationPoller
+
 log = logging.getLogger(__name__)
 
 
+# How often waiting callers get a progress update
+PROGRESS_INTERVAL_SECONDS = 60
+
+
 class GeminiVideoService:
     def __init__(
         self,
-        api_key: str,
+        api_key: str = "",
         model_name: str = "veo-3.0-fast-generate-001",
         default_aspect_ratio: str = "9:16",
+        resilience: Resilience = gemini_resilience,
+        pool: ClientPool | None = None,
     ) -> None:
-        if not api_key:
-            raise RuntimeError("GEMINI_API_KEY is required")
-        self._client = genai.Client(api_key=api_key)
+        # Submissions are spread over the pool's keys; each operation stays with its key
+        self.pool = pool or ClientPool([api_key], client_factory=genai.Client)
+        self._client = self.pool.primary
         self.model_name = model_name
         # Model for text-to-video generation
         self.text_to_video_model = "veo-3.0-fast-generate-001"
         self.default_aspect_ratio = default_aspect_ratio
+        # Shared by every generation on this client
+        self.poller = VideoOperationPoller(self._client)
+        # Submits are only retried when refused; raises ServiceBusy while the model's breaker is open
+        self.resilience = resilience
+
+    async def start_video_from_prompt(self, prompt: str):
+        """Submit a text-to-video job. Returns the pending operation and the id of the key that owns it."""
+        log.info(
+            "Starting video generation with prompt: %s",
+            prompt[:100] + "..." if len(prompt) > 100 else prompt,
+        )
+
+        video_config = types.GenerateVideosConfig(
+            aspect_ratio=self.default_aspect_ratio,
+            number_of_videos=1,  # supported values: 1 - 4
+            duration_seconds=8,  # supported values: 5 - 8
+            resolution="720p",
+            person_generation="allow_all",
+        )
+
+        return await self.resilience.call(
+            self.text_to_video_model,
+            lambda: self._submit(model=self.text_to_video_model, prompt=prompt, config=video_config),
+            policy=SUBMIT_RETRY_POLICY,
+            failover=len(self.pool) > 1,
+        )
+
+    async def start_video_from_image_and_prompt(self, image_path: str | Path, video_prompt: str):
+        """Submit an image-to-video job, like ``start_video_from_prompt``. Returns None if the image is missing."""
+        video_config = types.GenerateVideosConfig(
+            aspect_ratio=self.default_aspect_ratio,
+            resolution="720p",
+            person_generation="allow_adult",
+        )
+
+        try:
+            image_bytes = await asyncio.to_thread(Path(image_path).read_bytes)
+        except FileNotFoundError:
+            log.error("Image file does not exist: %s", image_path)
+            return None
+
+        log.info("Starting Veo 3.0 video generation with image: %s", image_path)
+
+        # Try using the image as part of a multimodal prompt for Veo 3.0
+        enhanced_prompt = f"Using this reference image to create a video: {video_prompt}"
+
+        return await self.resilience.call(
+            self.model_name,
+            lambda: self._submit(
+                model=self.model_name,
+                prompt=enhanced_prompt,
+                image=types.Image(image_bytes=image_bytes,mime_type="image/jpeg"),
+                config=video_config,
+            ),
+            policy=SUBMIT_RETRY_POLICY,
+            failover=len(self.pool) > 1,
+        )
+
+    async def _submit(self, **request) -> tuple[types.GenerateVideosOperation, str]:
+        with self.pool.lease() as leased:
+            operation = await leased.client.aio.models.generate_videos(**request)
+        return operation, leased.key_id
+
+    @staticmethod
+    def operation_from_name(name: str) -> types.GenerateVideosOperation:
+        """Handle for an operation submitted earlier (e.g. before a restart), for polling."""
+        return types.GenerateVideosOperation(name=name)
+
+    async def wait_for_operation(
+        self,
+        operation,
+        progress_callback=None,
+        label: str = "Video generation",
+        started_at: float | None = None,
+        key_id: str | None = None,
+    ):
+        """Wait on the shared poller for ``operation`` to finish.
+
+        ``key_id`` is the key that submitted it (the primary key if None).
+        Returns the finished operation, or None if it timed out.
+        """
+        client = self.pool.client(key_id or self.pool.primary_key_id)
+        if client is None:
+            raise LookupError(f"Gemini key {key_id} is no longer configured")
+        future = self.poller.watch(operation, started_at, client)
+        waiting_since = time.monotonic()
+        try:
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=PROGRESS_INTERVAL_SECONDS)
+                if done:
+                    return future.result()
+                if progress_callback:
+                    minutes = int(time.monotonic() - waiting_since) // 60
+                    await progress_callback(f"{label} in progress... ({minutes} minutes elapsed)")
+        except OperationTimeout:
+            log.error("%s timed out after %d minutes", label, self.poller.timeout_seconds // 60)
+            return None
+        finally:
+            # Stop polling for callers that gave up
+            future.cancel()
+
+    async def save_video(self, operation, output_path: str | Path, key_id: str | None = None) -> Optional[str]:
+        """Download the finished operation's video to ``output_path``, using the key that submitted it."""
+        response = getattr(operation, "response", None)
+        if response is None or not getattr(response, "generated_videos", None):
+            log.error("No video generated in response")
+            return None
+        generated_video = response.generated_videos[0]
+
+        # Download and save the video
+        out_path = Path(output_path)
+        async def download() -> None:
+            with self.pool.lease(key_id or self.pool.primary_key_id) as leased:
+                await leased.client.aio.files.download(file=generated_video.video)
+
+        await self.resilience.call(self.model_name, download, bucket=f"{self.model_name}:download")
+        await asyncio.to_thread(generated_video.video.save, str(out_path))
+
+        log.info("Video generated and saved to: %s", out_path)
+        return str(out_path)
 
     async def generate_video_from_prompt(
         self,
@@ -36,67 +167,14 @@ class GeminiVideoService:
         This is the basic implementation based on the sample code.
         """
         try:
-            log.info(
-                "Starting video generation with prompt: %s",
-                prompt[:100] + "..." if len(prompt) > 100 else prompt,
-            )
-
-            video_config = types.GenerateVideosConfig(
-                aspect_ratio=self.default_aspect_ratio,
-                number_of_videos=1,  # supported values: 1 - 4
-                duration_seconds=8,  # supported values: 5 - 8
-                resolution="720p",
-                person_generation="allow_all",
-            )
-
-            operation = self._client.models.generate_videos(
-                model=self.text_to_video_model,
-                prompt=prompt,
-                config=video_config,
-            )
-
-            # Poll the operation status until the video is ready.
-            wait_count = 0
-            max_wait_iterations = 90  # Maximum 30 minutes of waiting (90 * 20 seconds)
-            while not operation.done and wait_count < max_wait_iterations:
-                await asyncio.sleep(20)
-                wait_count += 1
-
-                if progress_callback:
-                    elapsed_seconds = wait_count * 20
-                    minutes = elapsed_seconds // 60
-                    if wait_count % 3 == 0:  # every minute
-                        await progress_callback(
-                            f"Video generation in progress... ({minutes} minutes elapsed)"
-                        )
-
-                operation = self._client.operations.get(operation)
-
-            # Check if we timed out
-            if wait_count >= max_wait_iterations:
-                log.error(
-                    "Video generation timed out after %d minutes",
-                    max_wait_iterations * 20 // 60,
-                )
-                return None
-
-            # Download the generated video.
-            if (hasattr(operation, 'response') and
-                hasattr(operation.response, 'generated_videos') and
-                operation.response.generated_videos):
-                generated_video = operation.response.generated_videos[0]
-
-                # Download and save the video
-                out_path = Path(output_path)
-                self._client.files.download(file=generated_video.video)
-                generated_video.video.save(str(out_path))
-
-                log.info("Video generated and saved to: %s", out_path)
-                return str(out_path)
-            else:
-                log.error("No video generated in response")
+            operation, key_id = await self.start_video_from_prompt(prompt)
+            operation = await self.wait_for_operation(operation, progress_callback, "Video generation", key_id=key_id)
+            if operation is None:
                 return None
+            return await self.save_video(operation, output_path, key_id)
 
+        except ServiceBusy:
+            raise
         except Exception as exc:
             log.exception("Gemini video generation failed: %s", exc)
             return None
@@ -113,72 +191,19 @@ class GeminiVideoService:
         This uses Veo 3.0's image-to-video capabilities.
         """
         try:
-            video_config = types.GenerateVideosConfig(
-                aspect_ratio=self.default_aspect_ratio,
-                resolution="720p",
-                person_generation="allow_adult",
-            )
-
-            image_file = Path(image_path)
-            if not image_file.exists():
-                log.error("Image file does not exist: %s", image_path)
+            submitted = await self.start_video_from_image_and_prompt(image_path, video_prompt)
+            if submitted is None:
                 return None
-
-            log.info("Starting Veo 3.0 video generation with image: %s", image_path)
-            
-            with open(image_file, "rb") as image_file:
-                image_bytes = image_file.read()
-
-            # Try using the image as part of a multimodal prompt for Veo 3.0
-            enhanced_prompt = f"Using this reference image to create a video: {video_prompt}"
-
-            operation = self._client.models.generate_videos(
-                model=self.model_name,
-                prompt=enhanced_prompt,
-                image=types.Image(image_bytes=image_bytes,mime_type="image/jpeg"),
-                config=video_config,
+            operation, key_id = submitted
+            operation = await self.wait_for_operation(
+                operation, progress_callback, "Image-to-video generation", key_id=key_id
             )
-
-            # Poll the operation status until the video is ready
-            wait_count = 0
-            max_wait_iterations = 90
-            while not operation.done and wait_count < max_wait_iterations:
-                await asyncio.sleep(20)
-                wait_count += 1
-
-                if progress_callback:
-                    elapsed_seconds = wait_count * 20
-                    minutes = elapsed_seconds // 60
-                    if wait_count % 3 == 0:
-                        await progress_callback(
-                            f"Image-to-video generation in progress... ({minutes} minutes elapsed)"
-                        )
-
-                operation = self._client.operations.get(operation)
-
-            # Check if we timed out
-            if wait_count >= max_wait_iterations:
-                log.error(
-                    "Image-to-video generation timed out after %d minutes",
-                    max_wait_iterations * 20 // 60,
-                )
-                return None
-
-            # Download the generated video
-            if hasattr(operation, 'response') and hasattr(operation.response, 'generated_videos'):
-                generated_video = operation.response.generated_videos[0]
-
-                # Download and save the video
-                out_path = Path(output_path)
-                self._client.files.download(file=generated_video.video)
-                generated_video.video.save(str(out_path))
-
-                log.info("Video generated from image and saved to: %s", out_path)
-                return str(out_path)
-            else:
-                log.error("No video generated in response")
+            if operation is None:
                 return None
+            return await self.save_video(operation, output_path, key_id)
 
+        except ServiceBusy:
+            raise
         except Exception as exc:
             log.exception("Veo 3.0 video generation from image failed: %s", exc)
-            return None
\ No newline at end of file
+            return None
@@ -0,0 +1,140 @@
+"""Per-model request rate limits matching our Gemini quotas.
+
+Each limited model has a token bucket that refills at its requests-per-minute
+quota and holds up to ``BURST_SECONDS`` worth of requests. A call that finds
+the bucket empty waits for its token (callers are served in arrival order),
+unless the wait would exceed ``max_wait_seconds``, in which case it is
+rejected with ``RateLimited`` before spending a request that would 429.
+Models without a configured quota are not limited.
+
+Concurrent operations are bounded separately, by ``services.scheduler``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Mapping
+
+from core import AppConfig
+from services.exceptions import ServiceBusy
+
+log = logging.getLogger(__name__)
+
+# Bucket size, as seconds of quota: short bursts pass without waiting
+BURST_SECONDS = 10
+
+
+class RateLimited(ServiceBusy):
+    """The model's request quota is used up for longer than callers may wait."""
+
+
+@dataclass(frozen=True)
+class BucketStats:
+    requests_per_minute: int
+    acquired: int
+    waited: int
+    rejected: int
+    total_wait_seconds: float
+
+    @property
+    def mean_wait_ms(self) -> float:
+        return self.total_wait_seconds / self.waited * 1e3 if self.waited else 0.0
+
+
+class TokenBucket:
+    def __init__(self, requests_per_minute: int, clock: Callable[[], float]) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self._clock = clock
+        # May go negative: each waiter has already claimed its future token
+        self.tokens = self.capacity
+        self._updated = clock()
+        self.acquired = 0
+        self.waited = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float) -> float | None:
+        """Claim the next token. Returns seconds to wait for it, or None if that exceeds ``max_wait``."""
+        self._refill()
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            self.rejected += 1
+            return None
+        self.tokens -= 1
+        self.acquired += 1
+        if wait:
+            self.waited += 1
+            self.total_wait_seconds += wait
+        return wait
+
+    def cancel(self) -> None:
+        """Return a claimed token whose caller gave up waiting."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+        self.acquired -= 1
+
+    def stats(self) -> BucketStats:
+        return BucketStats(
+            requests_per_minute=self.requests_per_minute,
+            acquired=self.acquired,
+            waited=self.waited,
+            rejected=self.rejected,
+            total_wait_seconds=self.total_wait_seconds,
+        )
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        requests_per_minute: Mapping[str, int] | None = None,
+        max_wait_seconds: float = AppConfig.rate_limit_max_wait_seconds,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.max_wait_seconds = max_wait_seconds
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.set_limits(requests_per_minute or {})
+
+    def configure(self, cfg: AppConfig) -> None:
+        self.max_wait_seconds = cfg.rate_limit_max_wait_seconds
+        self.set_limits(cfg.model_requests_per_minute)
+
+    def set_limits(self, requests_per_minute: Mapping[str, int]) -> None:
+        self._buckets = {
+            model: TokenBucket(rpm, self._clock) for model, rpm in requests_per_minute.items() if rpm > 0
+        }
+
+    async def acquire(self, model: str) -> None:
+        """Wait for the right to send one request to ``model``; raises ``RateLimited`` instead of waiting too long."""
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            return
+        wait = bucket.reserve(self.max_wait_seconds)
+        if wait is None:
+            raise RateLimited(model, (1 - bucket.tokens) / bucket.rate)
+        if not wait:
+            return
+        log.debug("Waiting %.1fs for %s request quota", wait, model)
+        try:
+            await self._sleep(wait)
+        except asyncio.CancelledError:
+            bucket.cancel()
+            raise
+
+    def stats(self) -> Dict[str, BucketStats]:
+        return {model: bucket.stats() for model, bucket in self._buckets.items()}
+
+
+# One limiter for every client; with several API keys, set each quota to their combined total
+gemini_rate_limiter = RateLimiter()
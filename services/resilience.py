@@ -0,0 +1,255 @@
+"""Retries and circuit breaking for Gemini calls.
+
+Errors are classified as transient (5xx, timeouts, dropped connections),
+rate limited (429 / RESOURCE_EXHAUSTED), auth (401 / 403: a revoked or
+misconfigured key) or permanent (any other 4xx, such as a rejected prompt).
+``Resilience.call()`` retries the first two with full-jitter exponential
+backoff, within an overall deadline. With ``failover=True`` an auth error is
+retried once straight away, which a client pool sends to another key. Calls that
+are not idempotent pass ``SUBMIT_RETRY_POLICY``, which only retries answers
+that mean the request was refused.
+
+Each model has a circuit breaker. After ``failure_threshold`` consecutive
+transient or rate-limited failures it opens, and calls fail fast with
+``ServiceBusy`` instead of reaching the API. After ``reset_timeout`` one probe
+call is let through: success closes the breaker, failure opens it again.
+
+Every attempt, retries included, first takes a token from the rate limiter,
+so retries count against the model's quota like any other request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import enum
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, TypeVar
+
+import httpx
+from google.genai import errors
+
+from services.exceptions import ServiceBusy
+from services.rate_limit import RateLimiter, gemini_rate_limiter
+from services.video_poller import OperationTimeout
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class ErrorKind(enum.Enum):
+    TRANSIENT = "transient"
+    RATE_LIMITED = "rate_limited"
+    AUTH = "auth"
+    PERMANENT = "permanent"
+
+
+def classify(exc: BaseException) -> ErrorKind:
+    if isinstance(exc, errors.APIError):
+        if exc.code == 429 or exc.status == "RESOURCE_EXHAUSTED":
+            return ErrorKind.RATE_LIMITED
+        if exc.code in RETRYABLE_STATUS_CODES:
+            return ErrorKind.TRANSIENT
+        if exc.code in (401, 403):
+            return ErrorKind.AUTH
+        return ErrorKind.PERMANENT
+    if isinstance(exc, (httpx.TransportError, asyncio.TimeoutError, ConnectionError)):
+        return ErrorKind.TRANSIENT
+    return ErrorKind.PERMANENT
+
+
+def is_timeout(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TimeoutException, OperationTimeout)):
+        return True
+    return isinstance(exc, errors.APIError) and exc.code in (408, 504)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 16.0
+    # No retry starts later than this many seconds after the first attempt
+    deadline: float = 60.0
+    # If set, only API errors with these status codes are retried
+    retry_codes: frozenset[int] | None = None
+
+    def delay(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def should_retry(self, exc: BaseException) -> bool:
+        if self.retry_codes is None:
+            return True
+        return isinstance(exc, errors.APIError) and exc.code in self.retry_codes
+
+
+# For paid submits that aren't idempotent: after a timeout or a dropped connection the
+# request may already have been accepted, so only definite rejections are retried
+SUBMIT_RETRY_POLICY = RetryPolicy(retry_codes=frozenset({429, 503}))
+
+
+class BreakerState(enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class BreakerStats:
+    state: BreakerState
+    calls: int
+    retries: int
+    failures: int
+    rejected: int
+    opened: int
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float]) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = BreakerState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def allow(self) -> bool:
+        if self.state is BreakerState.CLOSED:
+            return True
+        if self.state is BreakerState.OPEN and self.retry_after() == 0:
+            self.state = BreakerState.HALF_OPEN
+        if self.state is BreakerState.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def abandon(self) -> None:
+        """A call ended without a verdict on the service (e.g. cancelled); let another probe."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self._probing = False
+        self._consecutive_failures = 0
+        if self.state is not BreakerState.CLOSED:
+            log.info("Circuit closed after a successful probe")
+        self.state = BreakerState.CLOSED
+
+    def record_failure(self) -> None:
+        self._probing = False
+        self._consecutive_failures += 1
+        if self.state is BreakerState.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self.state is not BreakerState.OPEN:
+                self.opened += 1
+            self.state = BreakerState.OPEN
+            self._opened_at = self._clock()
+
+
+class Resilience:
+    def __init__(
+        self,
+        policy: RetryPolicy = RetryPolicy(),
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        limiter: RateLimiter | None = None,
+    ) -> None:
+        self.policy = policy
+        self.limiter = limiter
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._sleep = sleep
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(self.failure_threshold, self.reset_timeout, self._clock)
+            self._counters[model] = dict(calls=0, retries=0, failures=0, rejected=0)
+        return breaker
+
+    async def call(
+        self,
+        model: str,
+        fn: Callable[[], Awaitable[T]],
+        policy: RetryPolicy | None = None,
+        failover: bool = False,
+        bucket: str | None = None,
+    ) -> T:
+        """Await ``fn()``, retrying transient failures. Raises ``ServiceBusy`` while the breaker is open.
+
+        Pass ``failover=True`` when ``fn`` leases from a pool with more than one key.
+        The breaker, rate limit and stats are keyed by ``bucket``, which defaults
+        to ``model``; give calls that aren't generations of the model (e.g.
+        downloading its output) their own bucket so they neither spend its
+        quota nor trip its breaker.
+        """
+        policy = policy or self.policy
+        bucket = bucket or model
+        breaker = self.breaker(bucket)
+        counters = self._counters[bucket]
+        counters["calls"] += 1
+        started = self._clock()
+        retry = 0
+        failed_over = False
+        while True:
+            if not breaker.allow():
+                counters["rejected"] += 1
+                raise ServiceBusy(model, breaker.retry_after())
+            try:
+                if self.limiter is not None:
+                    await self.limiter.acquire(bucket)
+                result = await fn()
+            except (asyncio.CancelledError, ServiceBusy):
+                breaker.abandon()
+                raise
+            except Exception as exc:
+                kind = classify(exc)
+                if kind in (ErrorKind.PERMANENT, ErrorKind.AUTH):
+                    # The service answered; the request itself (or its key) was bad
+                    breaker.record_success()
+                    if kind is ErrorKind.AUTH and failover and not failed_over:
+                        # The pool has ejected the key, so the next lease goes to another one
+                        failed_over = True
+                        counters["retries"] += 1
+                        log.warning("%s call failed authentication, retrying on another key: %s", model, exc)
+                        continue
+                    raise
+                breaker.record_failure()
+                counters["failures"] += 1
+                delay = policy.delay(retry)
+                retry += 1
+                if (
+                    not policy.should_retry(exc)
+                    or retry >= policy.attempts
+                    or self._clock() + delay - started > policy.deadline
+                ):
+                    raise
+                counters["retries"] += 1
+                log.warning("%s call failed (%s), retry %d in %.1fs: %s", model, kind.value, retry, delay, exc)
+                await self._sleep(delay)
+            else:
+                breaker.record_success()
+                return result
+
+    def stats(self) -> Dict[str, BreakerStats]:
+        return {
+            model: BreakerStats(state=breaker.state, opened=breaker.opened, **self._counters[model])
+            for model, breaker in self._breakers.items()
+        }
+
+
+# Breakers are per model, so every client of a model shares one
+gemini_resilience = Resilience(limiter=gemini_rate_limiter)
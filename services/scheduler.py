@@ -0,0 +1,203 @@
+"""Bounded, fair admission of Gemini generation calls.
+
+Each model has its own limit on concurrent calls. Requests beyond the limit
+wait in a per-model queue that is served round-robin across users: a user
+with ten queued requests gets one slot, then every other waiting user gets
+one, and so on. A burst from one heavy user therefore only delays their own
+requests.
+
+Use ``slot()`` around a call, or ``acquire()``/``release()`` when the slot must
+outlive one block (a video job holds it until its operation finishes).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Mapping, Optional
+
+from core import AppConfig
+
+log = logging.getLogger(__name__)
+
+QueuedCallback = Callable[[int], Awaitable[object]]
+
+
+@dataclass(frozen=True)
+class ModelQueueStats:
+    limit: int
+    active: int
+    queued: int
+    max_queued: int
+    granted: int
+    # Of the granted, how many had to wait
+    waited: int
+    total_wait_seconds: float
+    max_wait_seconds: float
+
+    @property
+    def mean_wait_ms(self) -> float:
+        return self.total_wait_seconds / self.waited * 1e3 if self.waited else 0.0
+
+
+@dataclass(slots=True)
+class _Waiter:
+    user_id: int
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class _Lane:
+    """One model's slots and its round-robin queue."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.active = 0
+        # user_id -> that user's waiters; dict order is the rotation order
+        self.queues: Dict[int, Deque[_Waiter]] = {}
+        self.queued = 0
+        self.max_queued = 0
+        self.granted = 0
+        self.waited = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def position(self, waiter: _Waiter) -> int:
+        """1-based place in line, assuming no one else arrives."""
+        users = list(self.queues)
+        rank = users.index(waiter.user_id)
+        index = self.queues[waiter.user_id].index(waiter)
+        ahead = index
+        for other_rank, user_id in enumerate(users):
+            if user_id != waiter.user_id:
+                # Users ahead in the rotation are served once more per round
+                rounds = index + 1 if other_rank < rank else index
+                ahead += min(len(self.queues[user_id]), rounds)
+        return ahead + 1
+
+    def remove(self, waiter: _Waiter) -> None:
+        queue = self.queues.get(waiter.user_id)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self.queued -= 1
+        if not queue:
+            del self.queues[waiter.user_id]
+
+
+class GenerationScheduler:
+    def __init__(
+        self,
+        default_limit: int = AppConfig.generation_concurrency,
+        limits: Mapping[str, int] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.default_limit = default_limit
+        self.limits: Dict[str, int] = dict(limits or {})
+        self._clock = clock
+        self._lanes: Dict[str, _Lane] = {}
+
+    def configure(self, cfg: AppConfig) -> None:
+        self.default_limit = cfg.generation_concurrency
+        self.limits = dict(cfg.model_concurrency)
+        for model, lane in self._lanes.items():
+            lane.limit = self._limit(model)
+            self._dispatch(lane)
+
+    def _limit(self, model: str) -> int:
+        return max(1, self.limits.get(model, self.default_limit))
+
+    def _lane(self, model: str) -> _Lane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = self._lanes[model] = _Lane(self._limit(model))
+        return lane
+
+    async def acquire(self, model: str, user_id: int, on_queued: Optional[QueuedCallback] = None) -> None:
+        """Wait for a slot on ``model``. ``on_queued(position)`` runs if the caller has to wait."""
+        lane = self._lane(model)
+        if lane.active < lane.limit and not lane.queues:
+            lane.active += 1
+            lane.granted += 1
+            return
+
+        waiter = _Waiter(user_id, asyncio.get_running_loop().create_future(), self._clock())
+        lane.queues.setdefault(user_id, deque()).append(waiter)
+        lane.queued += 1
+        lane.max_queued = max(lane.max_queued, lane.queued)
+        try:
+            if on_queued is not None:
+                try:
+                    await on_queued(lane.position(waiter))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    log.warning("Queue position update for user %s failed: %s", user_id, exc)
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller gave up; pass the slot on
+                self.release(model)
+            else:
+                waiter.future.cancel()
+                lane.remove(waiter)
+            raise
+
+    def release(self, model: str) -> None:
+        lane = self._lanes[model]
+        lane.active -= 1
+        self._dispatch(lane)
+
+    @asynccontextmanager
+    async def slot(
+        self, model: str, user_id: int, on_queued: Optional[QueuedCallback] = None
+    ) -> AsyncIterator[None]:
+        await self.acquire(model, user_id, on_queued)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def _dispatch(self, lane: _Lane) -> None:
+        now = self._clock()
+        while lane.active < lane.limit and lane.queues:
+            user_id = next(iter(lane.queues))
+            queue = lane.queues.pop(user_id)
+            waiter = queue.popleft()
+            lane.queued -= 1
+            if queue:
+                # To the back of the rotation
+                lane.queues[user_id] = queue
+            if waiter.future.done():
+                # Cancelled before its task could dequeue itself
+                continue
+            lane.active += 1
+            lane.granted += 1
+            lane.waited += 1
+            wait = now - waiter.enqueued_at
+            lane.total_wait_seconds += wait
+            lane.max_wait_seconds = max(lane.max_wait_seconds, wait)
+            waiter.future.set_result(None)
+
+    def stats(self) -> Dict[str, ModelQueueStats]:
+        return {
+            model: ModelQueueStats(
+                limit=lane.limit,
+                active=lane.active,
+                queued=lane.queued,
+                max_queued=lane.max_queued,
+                granted=lane.granted,
+                waited=lane.waited,
+                total_wait_seconds=lane.total_wait_seconds,
+                max_wait_seconds=lane.max_wait_seconds,
+            )
+            for model, lane in self._lanes.items()
+        }
+
+
+# Shared by every generation in the process
+generation_scheduler = GenerationScheduler()
@@ -0,0 +1,73 @@
+"""Coalescing of identical concurrent calls.
+
+``SingleFlight.do(key, fn)`` runs ``fn()`` once per key at a time: callers that
+arrive while a call for the same key is in flight wait for that call and get
+its result (or its exception) instead of starting their own. The shared call
+runs as its own task, so a caller that is cancelled doesn't cancel it for the
+others.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class SingleFlightStats:
+    calls: int
+    executions: int
+    # Calls answered by another caller's execution, i.e. upstream calls saved
+    coalesced: int
+    in_flight: int
+
+
+class SingleFlight(Generic[T]):
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self._calls = 0
+        self._executions = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable | None, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Result of ``fn()``, shared with concurrent callers of the same key.
+
+        Returns ``(result, shared)``; ``shared`` is True when another caller's
+        execution produced the result. A ``None`` key is never coalesced.
+        """
+        self._calls += 1
+        if key is None:
+            self._executions += 1
+            return await fn(), False
+
+        task = self._flights.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            self._executions += 1
+            task.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self._coalesced += 1
+        return await asyncio.shield(task), shared
+
+    def _land(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Every waiter may have been cancelled; don't leave the error unretrieved
+        if not task.cancelled() and task.exception() is not None:
+            log.debug("Shared call for %r failed: %s", key, task.exception())
+
+    def stats(self) -> SingleFlightStats:
+        return SingleFlightStats(
+            calls=self._calls,
+            executions=self._executions,
+            coalesced=self._coalesced,
+            in_flight=len(self._flights),
+        )
@@ -0,0 +1,185 @@
+"""One shared poller for every pending Veo video operation.
+
+Each watched operation gets a future that resolves with the finished operation.
+A single task polls every job that is due, concurrently, through the SDK's
+async client, so no poll blocks the event loop or holds a thread.
+
+Jobs are scheduled adaptively. Veo jobs rarely finish much sooner than usual,
+so a job's first poll waits until ``lead`` times the expected completion time.
+Polls then start at ``min_interval`` and back off geometrically to
+``max_interval``. The expected completion time is a moving average of observed
+completions, so the schedule tracks what the model is actually doing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List, Tuple
+
+log = logging.getLogger(__name__)
+
+# Before any completion has been observed
+INITIAL_ESTIMATE_SECONDS = 60.0
+# Weight of each new observation in the completion-time average
+ESTIMATE_SMOOTHING = 0.2
+OPERATION_TIMEOUT_SECONDS = 30 * 60
+
+
+class OperationTimeout(TimeoutError):
+    pass
+
+
+@dataclass(frozen=True)
+class PollerStats:
+    pending: int
+    polls: int
+    poll_errors: int
+    completed: int
+    timed_out: int
+    estimated_completion_seconds: float
+
+
+@dataclass(slots=True)
+class _Job:
+    operation: Any
+    future: asyncio.Future
+    started_at: float
+    deadline: float
+    client: Any
+    polls: int = 0
+
+
+class VideoOperationPoller:
+    def __init__(
+        self,
+        client,
+        *,
+        min_interval: float = 5.0,
+        max_interval: float = 30.0,
+        backoff: float = 1.5,
+        lead: float = 0.8,
+        timeout_seconds: float = OPERATION_TIMEOUT_SECONDS,
+        initial_estimate: float = INITIAL_ESTIMATE_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.lead = lead
+        self.timeout_seconds = timeout_seconds
+        self.estimate = initial_estimate
+        self._clock = clock
+        self._queue: List[Tuple[float, int, _Job]] = []
+        self._seq = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._polls = 0
+        self._poll_errors = 0
+        self._completed = 0
+        self._timed_out = 0
+
+    def watch(self, operation: Any, started_at: float | None = None, client: Any = None) -> asyncio.Future:
+        """Track ``operation`` until it is done. Cancel the future to stop tracking.
+
+        ``started_at`` (a ``time.time()`` value) is when the operation was
+        created, for operations resumed after a restart. ``client`` is the one
+        whose key created the operation, if not the poller's own.
+        """
+        loop = asyncio.get_running_loop()
+        now = self._clock()
+        started_at = now if started_at is None else started_at
+        job = _Job(operation, loop.create_future(), started_at, started_at + self.timeout_seconds, client or self._client)
+        if getattr(operation, "done", False):
+            job.future.set_result(operation)
+            return job.future
+        self._schedule(job, now)
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        else:
+            self._wakeup.set()
+        return job.future
+
+    def _next_poll_at(self, job: _Job, now: float) -> float:
+        if job.polls == 0:
+            return max(now, job.started_at + max(self.min_interval, self.estimate * self.lead))
+        delay = min(self.max_interval, self.min_interval * self.backoff ** (job.polls - 1))
+        return now + delay
+
+    def _schedule(self, job: _Job, now: float) -> None:
+        heapq.heappush(self._queue, (min(self._next_poll_at(job, now), job.deadline), next(self._seq), job))
+
+    async def _run(self) -> None:
+        while self._queue:
+            now = self._clock()
+            due: List[_Job] = []
+            while self._queue and self._queue[0][0] <= now:
+                job = heapq.heappop(self._queue)[2]
+                if not job.future.done():
+                    due.append(job)
+            if due:
+                await asyncio.gather(*(self._poll(job) for job in due))
+                continue
+            if not self._queue:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._queue[0][0] - now)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, job: _Job) -> None:
+        try:
+            operation = await job.client.aio.operations.get(job.operation)
+        except Exception as exc:
+            self._poll_errors += 1
+            log.warning("Polling video operation %s failed: %s", getattr(job.operation, "name", "?"), exc)
+            operation = job.operation
+        else:
+            self._polls += 1
+        job.polls += 1
+        if job.future.done():
+            return
+        now = self._clock()
+        if getattr(operation, "done", False):
+            self._record_completion(now - job.started_at)
+            job.future.set_result(operation)
+        elif now >= job.deadline:
+            self._timed_out += 1
+            job.future.set_exception(OperationTimeout(f"Video operation not done after {self.timeout_seconds:.0f}s"))
+        else:
+            job.operation = operation
+            self._schedule(job, now)
+
+    def _record_completion(self, seconds: float) -> None:
+        self._completed += 1
+        self.estimate += ESTIMATE_SMOOTHING * (seconds - self.estimate)
+
+    def stats(self) -> PollerStats:
+        return PollerStats(
+            pending=sum(1 for _, _, job in self._queue if not job.future.done()),
+            polls=self._polls,
+            poll_errors=self._poll_errors,
+            completed=self._completed,
+            timed_out=self._timed_out,
+            estimated_completion_seconds=self.estimate,
+        )
+
+    async def close(self) -> None:
+        """Stop polling and cancel every pending future."""
+        for _, _, job in self._queue:
+            job.future.cancel()
+        self._queue.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
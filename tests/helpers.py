@@ -0,0 +1,11 @@
+from __future__ import annotations
+
+
+class FakeClock:
+    """Stands in for ``time.monotonic`` / ``time.time``; tests advance ``now`` by hand."""
+
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
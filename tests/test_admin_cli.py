@@ -101,3 +101,22 @@ def test_admin_cli_delete(capsys, temp_db: Path) -> None:
     users = list(db.iter_users())
     assert len(users) == 1
     assert users[0].user_id == 1
+
+
+def test_reset_credits_is_logged(temp_db: Path) -> None:
+    db = AdminDatabase(temp_db)
+    db.reset_credits([1], image=8)
+    history = db.credit_history(1)
+    # Opening balance seeded when the ledger is created, then the reset delta
+    assert [(e.delta, e.reason) for e in history] == [(3, "admin_reset"), (5, "opening_balance")]
+
+
+def test_admin_cli_grant(capsys, temp_db: Path) -> None:
+    cli = AdminCLI(temp_db)
+    cli.grant([2], image=3, video=None, reason="support")
+    captured = capsys.readouterr()
+    assert "image credits now 5" in captured.out
+
+    cli.history(2, limit=5)
+    captured = capsys.readouterr()
+    assert "support" in captured.out
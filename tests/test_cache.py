@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+
+from core.utils.cache import LRUCache
+from tg_bot.user_settings import AspectRatio, Language, UserSettings, memoize_per_update
+from tests.helpers import FakeClock
+
+
+def test_lru_evicts_least_recently_used() -> None:
+    cache: LRUCache[int, str] = LRUCache(maxsize=2)
+    cache.put(1, "a")
+    cache.put(2, "b")
+    assert cache.get(1) == "a"
+    cache.put(3, "c")
+    assert 2 not in cache
+    assert cache.get(1) == "a" and cache.get(3) == "c"
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.size == 2
+    assert stats.hits == 3 and stats.misses == 0
+
+
+def test_lru_expires_idle_entries(clock: FakeClock) -> None:
+    cache: LRUCache[int, str] = LRUCache(maxsize=10, ttl_seconds=60, clock=clock)
+    cache.put(1, "a")
+    cache.put(2, "b")
+    clock.now = 30
+    assert cache.get(1) == "a"  # refreshes the idle timer
+    clock.now = 75
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+    clock.now = 200
+    cache.put(3, "c")
+    assert len(cache) == 1
+    stats = cache.stats()
+    assert stats.expirations == 2
+    assert stats.hits == 2 and stats.misses == 1
+
+
+def test_unknown_user_lookups_are_not_cached(mocker) -> None:
+    settings = UserSettings()
+    load = mocker.patch.object(settings, "sync_from_db")
+    assert settings.get_language(42) is Language.ENGLISH
+    assert settings.is_new_user(42)
+    assert load.call_count == 2
+    assert settings.cache_stats().size == 0
+
+    settings.apply_preferences(7, ("Amharic", "1:1", "16:9"))
+    assert settings.get_language(7) is Language.AMHARIC
+    assert settings.cache_stats().size == 1
+
+
+def test_unknown_users_are_negatively_cached(mocker) -> None:
+    settings = UserSettings()
+    query = mocker.patch("tg_bot.user_settings.bot_db.get_user_preferences", return_value=None)
+    assert settings.get_language(0) is Language.ENGLISH
+    assert settings.get_ratio(0).value == "9:16"
+    assert settings.is_new_user(0)
+    assert query.call_count == 1
+
+    # Creating the user invalidates the cached miss
+    settings.forget_missing(0)
+    query.return_value = ("Amharic", "1:1", "16:9")
+    assert settings.get_language(0) is Language.AMHARIC
+    assert query.call_count == 2
+
+
+def test_update_memo_queries_each_user_once(mocker) -> None:
+    settings = UserSettings()
+    query = mocker.patch("tg_bot.user_settings.async_bot_db.get_user_preferences", mocker.AsyncMock(return_value=None))
+
+    @memoize_per_update
+    async def handler() -> None:
+        await settings.preload(5)
+        settings.forget_missing(5)  # e.g. the negative entry expired mid-update
+        await settings.preload(5)
+        settings.get_language(5)
+
+    asyncio.run(handler())
+    assert query.call_count == 1
+    asyncio.run(handler())
+    assert query.call_count == 2
+
+
+def test_changing_an_evicted_user_keeps_their_other_settings(mocker) -> None:
+    settings = UserSettings()
+    mocker.patch("tg_bot.user_settings.bot_db.get_user_preferences", return_value=("Amharic", "1:1", "16:9"))
+    write = mocker.patch("tg_bot.user_settings.bot_db.update_user_aspect_ratios")
+
+    settings.set_ratio(3, AspectRatio.RATIO_4_3)
+    write.assert_called_once_with(user_id=3, image_ratio="4:3", video_ratio=None, wait=False)
+    assert settings.get_language(3) is Language.AMHARIC
+    assert settings.get_video_ratio(3).value == "16:9"
+
+
+def test_misses_on_the_event_loop_never_block(mocker) -> None:
+    settings = UserSettings()
+    blocking = mocker.patch("tg_bot.user_settings.bot_db.get_user_preferences")
+    reload = mocker.patch(
+        "tg_bot.user_settings.async_bot_db.get_user_preferences",
+        mocker.AsyncMock(return_value=("Amharic", "1:1", "16:9")),
+    )
+    write = mocker.patch("tg_bot.user_settings.bot_db.update_user_aspect_ratios")
+
+    async def run() -> None:
+        # An evicted user reads as defaults while the row reloads in the background
+        assert settings.get_language(3) is Language.ENGLISH
+        settings.set_ratio(3, AspectRatio.RATIO_4_3)
+        await asyncio.sleep(0)
+        assert settings.get_language(3) is Language.AMHARIC
+
+    asyncio.run(run())
+    blocking.assert_not_called()
+    reload.assert_awaited_once_with(3)
+    # Only the changed ratio is written, so the stored video ratio survives
+    write.assert_called_once_with(user_id=3, image_ratio="4:3", video_ratio=None, wait=False)
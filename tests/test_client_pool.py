@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors
+
+from services.client_pool import ClientPool, key_id
+from services.exceptions import ServiceBusy
+from services.resilience import Resilience
+from tests.helpers import FakeClock
+
+
+def _pool(clock: FakeClock, keys=("key-a", "key-b")) -> ClientPool:
+    return ClientPool(keys, client_factory=lambda api_key: SimpleNamespace(api_key=api_key), clock=clock)
+
+
+def _quota_error() -> errors.ClientError:
+    return errors.ClientError(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "quota"}})
+
+
+def test_requires_a_key_and_ignores_duplicates(clock: FakeClock) -> None:
+    with pytest.raises(RuntimeError):
+        ClientPool(["", ""])
+    pool = _pool(clock, ("key-a", "key-a", "key-b"))
+    assert list(pool.stats()) == [key_id("key-a"), key_id("key-b")]
+    assert pool.primary.api_key == "key-a"
+    assert key_id("key-a") != "key-a" and len(key_id("key-a")) == 12
+
+
+def test_leases_go_to_the_least_loaded_key(clock: FakeClock) -> None:
+    pool = _pool(clock)
+    with pool.lease() as first:
+        clock.now += 1
+        with pool.lease() as second:
+            assert first.key_id != second.key_id
+        clock.now += 1
+        # The second key is idle again while the first is still busy
+        with pool.lease() as third:
+            assert third.key_id == second.key_id
+    clock.now += 1
+    # Both idle: the one used least recently
+    with pool.lease() as fourth:
+        assert fourth.key_id == first.key_id
+    assert [stats.requests for stats in pool.stats().values()] == [2, 2]
+
+
+def _auth_error() -> errors.ClientError:
+    return errors.ClientError(403, {"error": {"code": 403, "status": "PERMISSION_DENIED", "message": "bad key"}})
+
+
+def test_quota_and_auth_errors_eject_the_key(clock: FakeClock) -> None:
+    pool = _pool(clock)
+    with pytest.raises(errors.ClientError):
+        with pool.lease() as leased:
+            raise _quota_error()
+    quota_key = leased.key_id
+    for _ in range(3):
+        with pool.lease() as other:
+            assert other.key_id != quota_key
+
+    with pytest.raises(errors.ClientError):
+        with pool.lease() as other:
+            raise _quota_error()
+    with pytest.raises(ServiceBusy) as busy:
+        with pool.lease():
+            pass
+    assert busy.value.retry_after == pool.quota_cooldown
+
+    # A pinned lease still reaches an ejected key
+    with pool.lease(quota_key) as pinned:
+        assert pinned.key_id == quota_key
+    with pytest.raises(LookupError):
+        with pool.lease("unknown"):
+            pass
+
+    clock.now += pool.quota_cooldown
+    with pool.lease() as recovered:
+        assert recovered.key_id == quota_key
+    with pytest.raises(errors.ClientError):
+        with pool.lease() as revoked:
+            raise _auth_error()
+    assert revoked.key_id == other.key_id
+    stats = pool.stats()
+    assert stats[quota_key].ejections == 1
+    assert stats[other.key_id].ejected_for_seconds == pool.auth_cooldown
+
+
+def test_auth_error_never_ejects_the_last_healthy_key(clock: FakeClock) -> None:
+    pool = _pool(clock, ("key-a",))
+    for _ in range(2):
+        with pytest.raises(errors.ClientError):
+            with pool.lease():
+                raise _auth_error()
+    with pool.lease() as leased:
+        assert leased.key_id == pool.primary_key_id
+    stats = pool.stats()[pool.primary_key_id]
+    assert (stats.errors, stats.ejections) == (2, 0)
+
+
+def test_quota_error_is_retried_on_another_key(clock: FakeClock) -> None:
+    pool = _pool(clock)
+    used: list[str] = []
+
+    async def no_sleep(delay: float) -> None:
+        pass
+
+    async def generate() -> str:
+        with pool.lease() as leased:
+            used.append(leased.client.api_key)
+            if leased.client.api_key == "key-a":
+                raise _quota_error()
+            return "ok"
+
+    assert asyncio.run(Resilience(sleep=no_sleep).call("imagen", generate)) == "ok"
+    assert used == ["key-a", "key-b"]
+
+
+def test_auth_error_fails_over_once_to_another_key(clock: FakeClock) -> None:
+    used: list[str] = []
+
+    def generate_with(pool: ClientPool, revoked: set[str]):
+        async def generate() -> str:
+            with pool.lease() as leased:
+                used.append(leased.client.api_key)
+                if leased.client.api_key in revoked:
+                    raise errors.ClientError(401, {"error": {"code": 401, "status": "UNAUTHENTICATED", "message": "bad key"}})
+                return "ok"
+        return generate
+
+    generate = generate_with(_pool(clock), {"key-a"})
+    assert asyncio.run(Resilience().call("imagen", generate, failover=True)) == "ok"
+    assert used == ["key-a", "key-b"]
+
+    # One failover at most, and none unless asked for
+    for failover, attempts in ((True, 2), (False, 1)):
+        used.clear()
+        generate = generate_with(_pool(clock, ("key-a", "key-b", "key-c")), {"key-a", "key-b", "key-c"})
+        with pytest.raises(errors.ClientError):
+            asyncio.run(Resilience().call("imagen", generate, failover=failover))
+        assert len(used) == attempts
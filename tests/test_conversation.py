@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from core.database import AsyncBotDatabase, BotDatabase
+from tg_bot.conversation import ConversationState, ConversationStore, InvalidTransition
+from tests.helpers import FakeClock
+
+
+def _upload(tmp_path: Path, name: str = "upload.jpg") -> str:
+    folder = tmp_path / name.replace(".", "_")
+    folder.mkdir()
+    path = folder / name
+    path.write_bytes(b"jpeg")
+    return str(path)
+
+
+def test_flow_transitions_and_handoff(tmp_path: Path) -> None:
+    store = ConversationStore()
+    assert store.state(1) is ConversationState.IDLE
+    with pytest.raises(InvalidTransition):
+        store.transition(1, ConversationState.VIDEO_PROMPT)
+
+    store.transition(1, ConversationState.VIDEO_CHOICE)
+    store.transition(1, ConversationState.VIDEO_UPLOAD, text_only=False)
+    upload = _upload(tmp_path)
+    store.transition(1, ConversationState.VIDEO_PROMPT, image_path=upload)
+    with pytest.raises(InvalidTransition):
+        store.transition(1, ConversationState.IMAGE_PROMPT)
+
+    conversation = store.take(1)
+    assert conversation is not None
+    assert (conversation.state, conversation.text_only, conversation.image_path) == (
+        ConversationState.VIDEO_PROMPT,
+        False,
+        upload,
+    )
+    # Taking the payload hands the file to the caller and leaves the user idle
+    assert Path(upload).exists()
+    assert store.state(1) is ConversationState.IDLE and len(store) == 0
+
+
+def test_restarting_or_expiring_a_flow_deletes_its_upload(tmp_path: Path, clock: FakeClock) -> None:
+    store = ConversationStore(ttl_seconds=60, clock=clock)
+    first = _upload(tmp_path, "first.jpg")
+    store.transition(1, ConversationState.IMAGE_CHOICE)
+    store.transition(1, ConversationState.IMAGE_UPLOAD, text_only=False)
+    store.transition(1, ConversationState.IMAGE_PROMPT, image_path=first)
+    store.transition(1, ConversationState.VIDEO_CHOICE)
+    assert not Path(first).exists() and not Path(first).parent.exists()
+
+    second = _upload(tmp_path, "second.jpg")
+    store.transition(2, ConversationState.IMAGE_CHOICE)
+    store.transition(2, ConversationState.IMAGE_UPLOAD, text_only=False)
+    store.transition(2, ConversationState.IMAGE_PROMPT, image_path=second)
+    clock.now = 30
+    store.transition(1, ConversationState.VIDEO_PROMPT, text_only=True)
+    clock.now = 70
+    assert store.expire() == 1
+    assert not Path(second).exists()
+    assert store.state(1) is ConversationState.VIDEO_PROMPT
+    clock.now = 100
+    assert store.state(1) is ConversationState.IDLE
+
+
+def test_conversations_survive_restart(tmp_path: Path) -> None:
+    db = BotDatabase(str(tmp_path / "bot_database.db"))
+    db.initialize_database()
+    facade = AsyncBotDatabase(db)
+    upload = _upload(tmp_path)
+    lost = _upload(tmp_path, "lost.jpg")
+
+    async def before_restart() -> None:
+        store = ConversationStore(db=facade, persist_delay=0.01)
+        store.transition(1, ConversationState.VIDEO_CHOICE)
+        store.transition(1, ConversationState.VIDEO_UPLOAD, text_only=False)
+        store.transition(1, ConversationState.VIDEO_PROMPT, image_path=upload)
+        store.transition(2, ConversationState.IMAGE_CHOICE)
+        store.transition(2, ConversationState.IMAGE_UPLOAD, text_only=False)
+        store.transition(2, ConversationState.IMAGE_PROMPT, image_path=lost)
+        store.transition(3, ConversationState.IMAGE_CHOICE)
+        store.reset(3)
+        await asyncio.sleep(0.05)
+
+    async def after_restart() -> ConversationStore:
+        store = ConversationStore(db=facade)
+        await store.restore_index()
+        for user_id in (1, 2, 3):
+            await store.preload(user_id)
+        return store
+
+    try:
+        asyncio.run(before_restart())
+        # Three users' changes were coalesced into a single write
+        assert db.write_stats().writes == 1
+        Path(lost).unlink()
+        store = asyncio.run(after_restart())
+        restored = store.get(1)
+        assert restored is not None
+        assert (restored.state, restored.text_only, restored.image_path) == (
+            ConversationState.VIDEO_PROMPT,
+            False,
+            upload,
+        )
+        # The upload didn't survive, so the user is asked for it again
+        assert store.state(2) is ConversationState.IMAGE_UPLOAD
+        assert store.get(2).image_path is None
+        assert store.state(3) is ConversationState.IDLE
+    finally:
+        facade.shutdown()
+        db.close()
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from core.database import AsyncBotDatabase, BotDatabase, CreditKind, VideoJobStatus
+from core.db_pool import ConnectionPool, PoolSettings
+from core.migrations import LATEST_VERSION, migrate, schema_version
+
+
+@pytest.fixture()
+def db(tmp_path: Path) -> BotDatabase:
+    database = BotDatabase(str(tmp_path / "bot_database.db"))
+    database.initialize_database()
+    yield database
+    database.close()
+
+
+def _create_user(db: BotDatabase, user_id: int = 1, image: int = 2, video: int = 1) -> None:
+    db.create_user(
+        user_id=user_id,
+        first_name="Alice",
+        username="alice",
+        chat_id=1000 + user_id,
+        language="English",
+        image_ratio="9:16",
+        video_ratio="9:16",
+        initial_image_credits=image,
+        initial_video_credits=video,
+    )
+
+
+def test_pool_applies_pragmas(tmp_path: Path) -> None:
+    pool = ConnectionPool(str(tmp_path / "pool.db"), PoolSettings(busy_timeout_ms=1234))
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+    pool.close()
+
+
+def test_pool_reuses_connections(tmp_path: Path) -> None:
+    pool = ConnectionPool(str(tmp_path / "pool.db"), PoolSettings(pool_size=2))
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert stats.created == 1
+    assert stats.checkouts == 2
+    assert stats.in_use == 0
+    pool.close()
+
+
+def test_pool_counts_waits_and_timeouts(tmp_path: Path) -> None:
+    pool = ConnectionPool(str(tmp_path / "pool.db"), PoolSettings(pool_size=1, checkout_timeout=0.05))
+    with pool.connection():
+        with pytest.raises(sqlite3.OperationalError):
+            with pool.connection():
+                pass
+
+        release = threading.Event()
+        acquired = []
+
+        def worker() -> None:
+            release.wait()
+            with pool.connection() as conn:
+                acquired.append(conn)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        release.set()
+    thread.join(timeout=2)
+    stats = pool.stats()
+    assert stats.timeouts == 1
+    assert stats.waits >= 1
+    assert len(acquired) == 1
+    pool.close()
+
+
+def test_pool_rolls_back_uncommitted_work(tmp_path: Path) -> None:
+    pool = ConnectionPool(str(tmp_path / "pool.db"))
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.close()
+
+
+def test_create_and_read_user(db: BotDatabase) -> None:
+    _create_user(db)
+    assert db.get_user_preferences(1) == ("English", "9:16", "9:16")
+    assert db.get_user_credits(1) == (2, 1)
+    assert db.get_user_preferences(2) is None
+
+
+def test_deduct_credits(db: BotDatabase) -> None:
+    _create_user(db, image=1, video=0)
+    assert db.deduct_image_credit(1) is True
+    assert db.deduct_image_credit(1) is False
+    assert db.deduct_video_credit(1) is False
+    assert db.get_user_credits(1) == (0, 0)
+
+
+def test_reserve_commit_and_refund(db: BotDatabase) -> None:
+    _create_user(db, image=2, video=0)
+    first = db.reserve_credit(1, CreditKind.IMAGE)
+    second = db.reserve_credit(1, CreditKind.IMAGE)
+    assert first is not None and first.remaining == 1
+    assert second is not None and second.remaining == 0
+    assert db.reserve_credit(1, CreditKind.IMAGE) is None
+    assert db.reserve_credit(1, CreditKind.VIDEO) is None
+
+    assert db.commit_credit_reservation(first.reservation_id) is True
+    assert db.refund_credit_reservation(second.reservation_id) is True
+    # Settling twice is a no-op
+    assert db.refund_credit_reservation(second.reservation_id) is False
+    assert db.refund_credit_reservation(first.reservation_id) is False
+    assert db.get_user_credits(1) == (1, 0)
+
+
+def test_video_job_transitions_settle_credit_once(db: BotDatabase) -> None:
+    _create_user(db, image=0, video=2)
+    delivered = db.reserve_credit(1, CreditKind.VIDEO, ttl_seconds=-1)
+    failed = db.reserve_credit(1, CreditKind.VIDEO)
+    job = db.create_video_job(1, 1001, "a horse", "English", delivered.reservation_id)
+    other = db.create_video_job(1, 1001, "a river", "English", failed.reservation_id)
+    assert job.status is VideoJobStatus.SUBMITTING
+
+    # An expired hold is kept while its job is still active
+    assert db.expire_credit_reservations() == 0
+    assert db.advance_video_job(job.job_id, VideoJobStatus.SUBMITTING, VideoJobStatus.RUNNING, "operations/1")
+    assert db.advance_video_job(job.job_id, VideoJobStatus.RUNNING, VideoJobStatus.DELIVERING)
+    assert not db.advance_video_job(job.job_id, VideoJobStatus.RUNNING, VideoJobStatus.DELIVERING)
+    [active, _] = db.get_active_video_jobs()
+    assert (active.operation_name, active.status, active.attempts) == ("operations/1", VideoJobStatus.DELIVERING, 1)
+
+    assert db.finish_video_job(job.job_id, delivered=True)
+    assert not db.finish_video_job(job.job_id, delivered=False)
+    assert db.finish_video_job(other.job_id, delivered=False)
+    assert db.get_user_credits(1) == (0, 1)
+    assert db.get_active_video_jobs() == []
+    assert db.prune_video_jobs(older_than_days=0) == 2
+
+
+def test_concurrent_reservations_never_overspend(db: BotDatabase) -> None:
+    _create_user(db, image=3, video=0)
+    results = []
+
+    def worker() -> None:
+        results.append(db.reserve_credit(1, CreditKind.IMAGE))
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(r is not None for r in results) == 3
+    assert db.get_user_credits(1) == (0, 0)
+
+
+def test_expired_reservations_are_refunded(db: BotDatabase) -> None:
+    _create_user(db, image=1, video=1)
+    db.reserve_credit(1, CreditKind.IMAGE, ttl_seconds=-1)
+    kept = db.reserve_credit(1, CreditKind.VIDEO)
+    assert db.expire_credit_reservations() == 1
+    assert db.get_user_credits(1) == (1, 0)
+    assert kept is not None and db.commit_credit_reservation(kept.reservation_id)
+
+
+def test_async_facade_runs_off_loop(db: BotDatabase) -> None:
+    _create_user(db, image=1, video=0)
+    facade = AsyncBotDatabase(db)
+    loop_thread = threading.get_ident()
+    query_threads = []
+
+    original = db.get_user_credits
+
+    def recording_get_user_credits(user_id: int) -> tuple[int, int]:
+        query_threads.append(threading.get_ident())
+        return original(user_id)
+
+    db.get_user_credits = recording_get_user_credits  # type: ignore[method-assign]
+
+    async def scenario() -> tuple[tuple[int, int], bool, tuple[int, int]]:
+        before = await facade.get_user_credits(1)
+        deducted = await facade.deduct_image_credit(1)
+        after = await facade.get_user_credits(1)
+        return before, deducted, after
+
+    try:
+        assert asyncio.run(scenario()) == ((1, 0), True, (0, 0))
+    finally:
+        facade.shutdown()
+    assert query_threads and loop_thread not in query_threads
+
+
+def _ledger_balance(db: BotDatabase, user_id: int, kind: CreditKind) -> int:
+    return sum(e.delta for e in db.get_credit_history(user_id, limit=1000) if e.kind is kind)
+
+
+def test_ledger_tracks_every_balance_change(db: BotDatabase) -> None:
+    _create_user(db, image=3, video=1)
+    held = db.reserve_credit(1, CreditKind.IMAGE)
+    refunded = db.reserve_credit(1, CreditKind.IMAGE)
+    assert held is not None and refunded is not None
+    db.commit_credit_reservation(held.reservation_id)
+    db.refund_credit_reservation(refunded.reservation_id)
+    db.deduct_video_credit(1)
+    assert db.grant_credits(1, CreditKind.VIDEO, 4, "promo", idempotency_key="promo-1") == 4
+    assert db.grant_credits(1, CreditKind.VIDEO, 4, "promo", idempotency_key="promo-1") is None
+
+    image, video = db.get_user_credits(1)
+    assert (image, video) == (2, 4)
+    assert _ledger_balance(db, 1, CreditKind.IMAGE) == image
+    assert _ledger_balance(db, 1, CreditKind.VIDEO) == video
+    reasons = [e.reason for e in db.get_credit_history(1)]
+    assert reasons[0] == "promo"
+    assert reasons[-2:] == ["signup_grant", "signup_grant"]
+
+
+def test_ledger_history_pagination_and_compaction(db: BotDatabase) -> None:
+    _create_user(db, image=0, video=0)
+    for _ in range(5):
+        db.grant_credits(1, CreditKind.IMAGE, 1, "promo")
+    page = db.get_credit_history(1, limit=2)
+    older = db.get_credit_history(1, limit=10, before_id=page[-1].entry_id)
+    assert len(page) == 2 and len(older) == 3
+
+    assert db.compact_credit_ledger(older_than_days=-1) == 4
+    history = db.get_credit_history(1)
+    assert [(e.delta, e.reason) for e in history] == [(5, "compacted")]
+    assert db.get_user_credits(1) == (5, 0)
+
+
+def test_writes_are_group_committed(db: BotDatabase) -> None:
+    _create_user(db, image=20, video=0)
+    gate = threading.Event()
+
+    def blocking_op(cursor: sqlite3.Cursor) -> None:
+        gate.wait()
+
+    # Hold the writer so the following writes pile up and land in one batch
+    blocker = db.submit_write(blocking_op)
+    futures = [
+        db.submit_write(lambda cursor: cursor.execute("UPDATE users SET language = 'Amharic' WHERE user_id = 1"))
+        for _ in range(10)
+    ]
+    gate.set()
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+    stats = db.write_stats()
+    assert stats.writes == 12
+    assert stats.largest_batch >= 10
+    assert stats.batches < stats.writes
+
+
+def test_failed_write_does_not_poison_batch(db: BotDatabase) -> None:
+    _create_user(db, image=1, video=0)
+
+    def broken(cursor: sqlite3.Cursor) -> None:
+        cursor.execute("UPDATE users SET image_credits = 99 WHERE user_id = 1")
+        cursor.execute("INSERT INTO no_such_table VALUES (1)")
+
+    failing = db.submit_write(broken)
+    db.update_user_language(1, "Amharic", wait=False)
+    assert db.reserve_credit(1, CreditKind.IMAGE) is not None
+    with pytest.raises(sqlite3.OperationalError):
+        failing.result(timeout=5)
+    # Skipped reservations roll back their savepoint without failing
+    assert db.reserve_credit(1, CreditKind.IMAGE) is None
+    assert db.get_user_credits(1) == (0, 0)
+    assert db.get_user_preferences(1)[0] == "Amharic"
+    stats = db.write_stats()
+    # The user row, the language update and one reservation committed
+    assert (stats.writes, stats.rolled_back, stats.failed) == (3, 1, 1)
+
+
+def test_fresh_database_is_fully_migrated(db: BotDatabase) -> None:
+    with db._get_connection() as conn:
+        assert schema_version(conn) == LATEST_VERSION
+        assert migrate(conn) == 0
+
+
+def test_legacy_database_is_migrated_in_chunks(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE users (user_id INTEGER PRIMARY KEY, first_name TEXT, username TEXT, chat_id INTEGER,"
+            " image_credits INTEGER DEFAULT 0, video_credits INTEGER DEFAULT 0, aspect_ratio TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO users (user_id, image_credits, aspect_ratio) VALUES (?, 1, ?)",
+            [(i, "16:9" if i % 2 else None) for i in range(1, 8)],
+        )
+    monkeypatch.setattr("core.migrations.BACKFILL_BATCH_SIZE", 3)
+
+    database = BotDatabase(str(path))
+    database.initialize_database()
+    try:
+        assert database.get_user_preferences(1) == ("English", "16:9", "9:16")
+        assert database.get_user_preferences(2) == ("English", "9:16", "9:16")
+        history = database.get_credit_history(1)
+        assert [(e.delta, e.reason) for e in history] == [(1, "opening_balance")]
+        with database._get_connection() as conn:
+            assert "aspect_ratio" not in {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+            assert schema_version(conn) == LATEST_VERSION
+    finally:
+        database.close()
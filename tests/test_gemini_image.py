@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from unittest.mock import MagicMock
 from services.gemini_image import GeminiImageService
@@ -10,12 +12,12 @@ def test_init(mocker):
 
 def test_generate_image_file_success(mocker):
     service = GeminiImageService("fake_key")
-    mock_generate = mocker.patch.object(service._client.models, 'generate_images', return_value=MagicMock(
+    mock_generate = mocker.patch.object(service._client.aio.models, 'generate_images', mocker.AsyncMock(return_value=MagicMock(
         generated_images=[MagicMock(image=MagicMock(save=lambda path: None))]
-    ))
-    result = service.generate_image_file("test prompt", "output.jpg", "1:1")
+    )))
+    result = asyncio.run(service.generate_image_file_async("test prompt", "output.jpg", "1:1"))
     assert result == "output.jpg"
-    mock_generate.assert_called_once_with(
+    mock_generate.assert_awaited_once_with(
         model=service.model_name,
         prompt="test prompt",
         config=dict(
@@ -28,9 +30,11 @@ def test_generate_image_file_success(mocker):
 
 def test_generate_image_from_image_and_text_success(mocker):
     service = GeminiImageService("fake_key")
-    mock_generate_stream = mocker.patch.object(service._client.models, 'generate_content_stream', return_value=[
-        MagicMock(candidates=[MagicMock(content=MagicMock(parts=[MagicMock(inline_data=MagicMock(data=b'fake_data', mime_type="image/jpeg"))]))])
-    ])
+
+    async def stream():
+        yield MagicMock(candidates=[MagicMock(content=MagicMock(parts=[MagicMock(inline_data=MagicMock(data=b'fake_data', mime_type="image/jpeg"))]))])
+
+    mock_generate_stream = mocker.patch.object(service._client.aio.models, 'generate_content_stream', mocker.AsyncMock(return_value=stream()))
     mocker.patch('mimetypes.guess_type', return_value=("image/jpeg", None))
     mocker.patch('mimetypes.guess_extension', return_value=".jpg")
 
@@ -44,9 +48,37 @@ def test_generate_image_from_image_and_text_success(mocker):
     mocker.patch('builtins.open', mocker.mock_open(read_data=b'fake_image_data'))
 
     try:
-        result = service.generate_image_from_image_and_text(temp_input_path, "test prompt", "output.jpg")
+        result = asyncio.run(service.generate_image_from_image_and_text_async(temp_input_path, "test prompt", "output.jpg"))
         assert result == "output.jpg"
     finally:
         # Clean up the temp file
         import os
-        os.unlink(temp_input_path)
\ No newline at end of file
+        os.unlink(temp_input_path)
+
+def test_generate_image_file_async_uses_aio_client(mocker):
+    service = GeminiImageService("fake_key")
+    mock_generate = mocker.patch.object(service._client.aio.models, 'generate_images', mocker.AsyncMock(return_value=MagicMock(
+        generated_images=[MagicMock(image=MagicMock(save=lambda path: None))]
+    )))
+    sync_generate = mocker.patch.object(service._client.models, 'generate_images')
+    result = asyncio.run(service.generate_image_file_async("test prompt", "output.jpg", "1:1"))
+    assert result == "output.jpg"
+    mock_generate.assert_awaited_once()
+    assert mock_generate.call_args.kwargs["config"]["aspect_ratio"] == "1:1"
+    sync_generate.assert_not_called()
+
+
+def test_generate_image_from_image_and_text_async_streams(mocker, tmp_path):
+    service = GeminiImageService("fake_key")
+    chunk = MagicMock(candidates=[MagicMock(content=MagicMock(parts=[MagicMock(inline_data=MagicMock(data=b'fake_data', mime_type="image/png"))]))])
+
+    async def stream():
+        yield chunk
+
+    mocker.patch.object(service._client.aio.models, 'generate_content_stream', mocker.AsyncMock(return_value=stream()))
+    source = tmp_path / "input.jpg"
+    source.write_bytes(b'fake_image_data')
+
+    result = asyncio.run(service.generate_image_from_image_and_text_async(source, "test prompt", tmp_path / "output.jpg"))
+    assert result == str(tmp_path / "output.png")
+    assert (tmp_path / "output.png").read_bytes() == b'fake_data'
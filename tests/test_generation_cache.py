@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from telegram.error import BadRequest, Forbidden
+
+from core.database import AsyncBotDatabase, BotDatabase
+from services.singleflight import SingleFlight
+from tg_bot import generation_cache as generation_cache_module
+from tg_bot.generation_cache import GenerationCache, cache_key, deliver_generation, sent_file_id
+from tests.helpers import FakeClock
+
+
+@pytest.fixture()
+def facade(tmp_path: Path) -> AsyncBotDatabase:
+    database = BotDatabase(str(tmp_path / "bot_database.db"))
+    database.initialize_database()
+    facade = AsyncBotDatabase(database)
+    yield facade
+    facade.shutdown()
+    database.close()
+
+
+def _drain(facade: AsyncBotDatabase) -> None:
+    # Writes commit in order, so waiting on a no-op covers everything queued before it
+    facade._db.submit_write(lambda cursor: None).result()
+
+
+def test_cache_key_normalizes_prompt_and_hashes_image(tmp_path: Path) -> None:
+    def key(*args) -> str | None:
+        return asyncio.run(cache_key(*args))
+
+    base = key("imagen", "A  red\tfox", "9:16")
+    assert base == key("imagen", " a red FOX ", "9:16")
+    assert base != key("imagen", "a red fox", "16:9")
+    assert base != key("imagen-2", "a red fox", "9:16")
+
+    first, second = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    first.write_bytes(b"one")
+    second.write_bytes(b"two")
+    assert key("imagen", "a red fox", "9:16", first) != key("imagen", "a red fox", "9:16", second)
+    assert key("imagen", "a red fox", "9:16", tmp_path / "missing.jpg") is None
+
+
+def test_sent_file_id_prefers_largest_photo() -> None:
+    photo = SimpleNamespace(photo=[SimpleNamespace(file_id="small"), SimpleNamespace(file_id="large")], video=None)
+    assert sent_file_id(photo) == "large"
+    assert sent_file_id(SimpleNamespace(photo=(), video=SimpleNamespace(file_id="clip"))) == "clip"
+    assert sent_file_id(None) is None
+
+
+def test_hits_survive_restart_until_ttl(facade: AsyncBotDatabase, clock: FakeClock) -> None:
+    key, other = (asyncio.run(cache_key("imagen", prompt, "9:16")) for prompt in ("a red fox", "a blue fox"))
+    GenerationCache(facade, ttl_seconds=60, clock=clock).put(key, "image", "file-1")
+    _drain(facade)
+
+    # A fresh instance has an empty memory tier and reads the database
+    cache = GenerationCache(facade, ttl_seconds=60, clock=clock)
+    assert asyncio.run(cache.get(key)) == "file-1"
+    assert asyncio.run(cache.get(other)) is None
+    assert asyncio.run(cache.resend(key, AsyncMock(return_value="sent"))) == "sent"
+    clock.now += 61
+    assert asyncio.run(cache.get(key)) is None
+    stats = cache.stats()
+    # Only a delivered resend counts as a hit
+    assert (stats.hits, stats.misses) == (1, 2)
+
+
+def test_prune_evicts_expired_then_least_recently_used(facade: AsyncBotDatabase, clock: FakeClock) -> None:
+    cache = GenerationCache(facade, ttl_seconds=100, max_entries=2, clock=clock)
+    cache.put("stale", "image", "f0")
+    clock.now += 50
+    for n, key in enumerate(("a", "b", "c"), start=1):
+        cache.put(key, "image", f"f{n}")
+        clock.now += 1
+    _drain(facade)
+    asyncio.run(cache.resend("a", AsyncMock()))
+    _drain(facade)
+    clock.now += 55
+
+    assert asyncio.run(cache.prune()) == 2
+    assert asyncio.run(cache.get("a")) == "f1"
+    assert asyncio.run(cache.get("b")) is None
+    assert asyncio.run(cache.get("c")) == "f3"
+
+
+def test_resend_drops_a_rejected_file_id(facade: AsyncBotDatabase) -> None:
+    cache = GenerationCache(facade)
+    cache.put("k", "video", "gone")
+    send = AsyncMock(side_effect=BadRequest("Wrong file identifier"))
+    assert asyncio.run(cache.resend("k", send)) is None
+    send.assert_awaited_once_with("gone")
+    _drain(facade)
+    assert asyncio.run(GenerationCache(facade).get("k")) is None
+    assert asyncio.run(cache.get("k")) is None
+    assert cache.stats().hits == 0
+
+    # Errors that aren't about the file_id reach the caller, and the entry stays
+    cache.put("k", "video", "fine")
+    send = AsyncMock(side_effect=Forbidden("bot was blocked by the user"))
+    with pytest.raises(Forbidden):
+        asyncio.run(cache.resend("k", send))
+    assert asyncio.run(cache.get("k")) == "fine"
+
+    disabled = GenerationCache(facade, max_entries=0)
+    disabled.put("k2", "image", "f")
+    send = AsyncMock()
+    assert asyncio.run(disabled.resend("k2", send)) is None
+    send.assert_not_awaited()
+
+
+def test_identical_requests_share_one_generation(facade: AsyncBotDatabase, tmp_path: Path, mocker) -> None:
+    cache = GenerationCache(facade)
+    mocker.patch.object(generation_cache_module, "generation_cache", cache)
+    mocker.patch.object(generation_cache_module, "generation_flights", SingleFlight())
+    image = tmp_path / "out.jpg"
+    image.write_bytes(b"jpeg")
+    generations = 0
+
+    async def generate() -> str:
+        nonlocal generations
+        generations += 1
+        await asyncio.sleep(0.01)
+        return str(image)
+
+    sent: dict[int, object] = {}
+
+    def sender(chat_id: int):
+        async def send(photo):
+            sent[chat_id] = photo
+            return SimpleNamespace(photo=[SimpleNamespace(file_id="shared-id")], video=None)
+        return send
+
+    async def run() -> list[bool]:
+        return await asyncio.gather(
+            *(deliver_generation("k", "image", sender(chat_id), generate) for chat_id in range(3))
+        )
+
+    assert asyncio.run(run()) == [True, True, True]
+    assert generations == 1
+    # Every chat uploads the generated image itself
+    assert sent == {0: b"jpeg", 1: b"jpeg", 2: b"jpeg"}
+    # Later requests are answered from the cache
+    assert asyncio.run(deliver_generation("k", "image", sender(3), generate))
+    assert generations == 1 and sent[3] == "shared-id"
+
+
+def test_failed_shared_generation_fails_every_waiter(facade: AsyncBotDatabase, mocker) -> None:
+    mocker.patch.object(generation_cache_module, "generation_cache", GenerationCache(facade))
+    mocker.patch.object(generation_cache_module, "generation_flights", SingleFlight())
+    send = AsyncMock()
+
+    async def generate() -> None:
+        await asyncio.sleep(0.01)
+        return None
+
+    async def run() -> list[bool]:
+        return await asyncio.gather(*(deliver_generation("k", "image", send, generate) for _ in range(2)))
+
+    assert asyncio.run(run()) == [False, False]
+    send.assert_not_awaited()
+
+
+def test_one_chats_send_error_does_not_fail_the_others(facade: AsyncBotDatabase, tmp_path: Path, mocker) -> None:
+    mocker.patch.object(generation_cache_module, "generation_cache", GenerationCache(facade))
+    mocker.patch.object(generation_cache_module, "generation_flights", SingleFlight())
+    image = tmp_path / "out.jpg"
+    image.write_bytes(b"jpeg")
+
+    async def generate() -> str:
+        await asyncio.sleep(0.01)
+        return str(image)
+
+    blocked = AsyncMock(side_effect=Forbidden("bot was blocked by the user"))
+    ok = AsyncMock(return_value=SimpleNamespace(photo=[SimpleNamespace(file_id="id")], video=None))
+
+    async def run() -> list:
+        return await asyncio.gather(
+            deliver_generation("k", "image", blocked, generate),
+            deliver_generation("k", "image", ok, generate),
+            return_exceptions=True,
+        )
+
+    first, second = asyncio.run(run())
+    assert isinstance(first, Forbidden)
+    assert second is True
+    ok.assert_awaited_once_with(b"jpeg")
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from tg_bot.keyboards import (
+    BTN_SETTINGS,
+    BTN_VIDEO,
+    MAIN_BUTTONS,
+    button_for_text,
+    keyboard_cache_info,
+    main_menu_keyboard,
+    prompt_presets_keyboard,
+)
+from tg_bot.translations import compile_catalog, get_translation
+from tg_bot.user_settings import Language
+
+
+def test_button_labels_route_in_every_language() -> None:
+    for button in MAIN_BUTTONS:
+        for language in Language:
+            assert button_for_text(get_translation(button, language)) == button
+    assert button_for_text("  🎥 ቪዲዮ ፍጠር ") == BTN_VIDEO
+    assert button_for_text("⚙️ Settings") == BTN_SETTINGS
+    assert button_for_text("a sunset over Addis") is None
+
+
+def test_keyboards_are_shared_until_catalog_changes(mocker) -> None:
+    mocker.patch("tg_bot.keyboards.user_settings.get_language", return_value=Language.AMHARIC)
+    first = main_menu_keyboard(1)
+    assert main_menu_keyboard(2) is first
+    assert prompt_presets_keyboard(1, page=0) is prompt_presets_keyboard(2, page=0)
+    assert keyboard_cache_info()["_main_menu"].hits >= 1
+
+    compile_catalog()
+    rebuilt = main_menu_keyboard(1)
+    assert rebuilt is not first
+    assert rebuilt.to_dict() == first.to_dict()
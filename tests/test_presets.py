@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from tg_bot.presets import PresetRegistry, presets
+from tg_bot.user_settings import Language
+
+
+def _write(path: Path, count: int) -> Path:
+    items = [
+        {
+            "id": f"p{i}",
+            "label": {"English": f"Label {i}", "Amharic": f"መለያ {i}"},
+            "prompt": {"English": f"Prompt {i}"},
+        }
+        for i in range(count)
+    ]
+    path.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def test_registry_indexes_and_paginates(tmp_path: Path) -> None:
+    registry = PresetRegistry.from_file(_write(tmp_path / "presets.json", 12))
+    assert len(registry) == 12
+    assert registry.prompt("p7", Language.AMHARIC) == "Prompt 7"  # English fallback
+    assert registry.prompt("missing", Language.ENGLISH) is None
+
+    first = registry.page(Language.AMHARIC, 0)
+    assert first.items[0] == ("p0", "መለያ 0") and first.max_page == 2
+    last = registry.page(Language.ENGLISH, 99)
+    assert last.page == 2 and [pid for pid, _ in last.items] == ["p10", "p11"]
+    assert registry.page(Language.ENGLISH, 1, page_size=4).items[0][0] == "p4"
+
+
+def test_reload_notifies_listeners(tmp_path: Path) -> None:
+    path = _write(tmp_path / "presets.json", 3)
+    registry = PresetRegistry.from_file(path)
+    calls = []
+    registry.add_listener(lambda: calls.append(len(registry)))
+    _write(path, 8)
+    registry.reload(path)
+    assert calls == [8]
+
+
+def test_bundled_presets_load() -> None:
+    assert len(presets) > 0
+    page = presets.page(Language.AMHARIC, 0)
+    assert all(presets.get(preset_id) is not None for preset_id, _ in page.items)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from services.rate_limit import RateLimited, RateLimiter
+from services.resilience import Resilience
+from tests.helpers import FakeClock
+
+
+def _limiter(clock: FakeClock, sleeps: list[float], **kwargs) -> RateLimiter:
+    async def sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    return RateLimiter(clock=clock, sleep=sleep, **kwargs)
+
+
+def test_burst_then_paced_then_refused(clock: FakeClock) -> None:
+    sleeps: list[float] = []
+    # 6 per minute: one token every 10s, a burst of one
+    limiter = _limiter(clock, sleeps, requests_per_minute={"veo": 6}, max_wait_seconds=25)
+
+    async def run() -> None:
+        await limiter.acquire("veo")
+        await limiter.acquire("veo")
+        await limiter.acquire("veo")
+        with pytest.raises(RateLimited) as refused:
+            await limiter.acquire("veo")
+        assert refused.value.retry_after == pytest.approx(30)
+        # Unlisted models are never limited
+        for _ in range(100):
+            await limiter.acquire("imagen")
+
+    asyncio.run(run())
+    assert sleeps == [pytest.approx(10), pytest.approx(20)]
+    stats = limiter.stats()
+    assert list(stats) == ["veo"]
+    assert (stats["veo"].acquired, stats["veo"].waited, stats["veo"].rejected) == (3, 2, 1)
+
+    clock.now += 60
+    sleeps.clear()
+    asyncio.run(limiter.acquire("veo"))
+    assert sleeps == []
+
+
+def test_cancelled_waiter_returns_its_token(clock: FakeClock) -> None:
+    limiter = RateLimiter({"veo": 60}, max_wait_seconds=60, clock=clock)
+
+    async def run() -> None:
+        for _ in range(10):
+            await limiter.acquire("veo")
+        waiter = asyncio.create_task(limiter.acquire("veo"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(run())
+    assert limiter.stats()["veo"].acquired == 10
+    clock.now += 1
+    # The refunded token plus one second of refill
+    assert limiter._buckets["veo"].reserve(0) == 0
+
+
+def test_every_retry_takes_a_token(clock: FakeClock) -> None:
+    sleeps: list[float] = []
+    limiter = _limiter(clock, sleeps, requests_per_minute={"veo": 600})
+
+    async def no_sleep(delay: float) -> None:
+        pass
+
+    resilience = Resilience(clock=clock, sleep=no_sleep, limiter=limiter)
+    outcomes = [ConnectionError("reset"), "ok"]
+
+    async def flaky() -> str:
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert asyncio.run(resilience.call("veo", flaky)) == "ok"
+    assert limiter.stats()["veo"].acquired == 2
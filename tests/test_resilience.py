@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+from google.genai import errors
+
+from services.resilience import (
+    SUBMIT_RETRY_POLICY,
+    BreakerState,
+    ErrorKind,
+    Resilience,
+    RetryPolicy,
+    ServiceBusy,
+    classify,
+    is_timeout,
+)
+from services.video_poller import OperationTimeout
+from tests.helpers import FakeClock
+
+
+def _api_error(code: int, status: str) -> errors.APIError:
+    error_class = errors.ServerError if code >= 500 else errors.ClientError
+    return error_class(code, {"error": {"code": code, "status": status, "message": status.lower()}})
+
+
+def _resilience(clock: FakeClock, sleeps: list[float], **kwargs) -> Resilience:
+    async def sleep(delay: float) -> None:
+        sleeps.append(delay)
+        clock.now += delay
+
+    kwargs.setdefault("policy", RetryPolicy(attempts=3, base_delay=1, max_delay=4, deadline=30))
+    return Resilience(clock=clock, sleep=sleep, **kwargs)
+
+
+def test_classify() -> None:
+    assert classify(_api_error(429, "RESOURCE_EXHAUSTED")) is ErrorKind.RATE_LIMITED
+    assert classify(_api_error(503, "UNAVAILABLE")) is ErrorKind.TRANSIENT
+    assert classify(httpx.ConnectError("reset")) is ErrorKind.TRANSIENT
+    assert classify(_api_error(403, "PERMISSION_DENIED")) is ErrorKind.AUTH
+    assert classify(_api_error(400, "INVALID_ARGUMENT")) is ErrorKind.PERMANENT
+    assert classify(ValueError("bad")) is ErrorKind.PERMANENT
+    assert is_timeout(OperationTimeout()) and is_timeout(_api_error(504, "DEADLINE_EXCEEDED"))
+    assert not is_timeout(_api_error(503, "UNAVAILABLE"))
+
+
+def test_transient_errors_are_retried_with_backoff(clock: FakeClock) -> None:
+    sleeps: list[float] = []
+    resilience = _resilience(clock, sleeps)
+    outcomes = [_api_error(503, "UNAVAILABLE"), _api_error(429, "RESOURCE_EXHAUSTED"), "ok"]
+
+    async def flaky() -> str:
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert asyncio.run(resilience.call("imagen", flaky)) == "ok"
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+    stats = resilience.stats()["imagen"]
+    assert (stats.calls, stats.retries, stats.failures, stats.state) == (1, 2, 2, BreakerState.CLOSED)
+
+
+def test_permanent_errors_are_not_retried(clock: FakeClock) -> None:
+    sleeps: list[float] = []
+    resilience = _resilience(clock, sleeps)
+    calls = 0
+
+    async def rejected() -> None:
+        nonlocal calls
+        calls += 1
+        raise _api_error(400, "INVALID_ARGUMENT")
+
+    with pytest.raises(errors.ClientError):
+        asyncio.run(resilience.call("imagen", rejected))
+    assert calls == 1 and sleeps == []
+
+
+def test_submit_policy_retries_only_refusals(clock: FakeClock) -> None:
+    sleeps: list[float] = []
+    resilience = _resilience(clock, sleeps)
+    outcomes = [_api_error(503, "UNAVAILABLE"), httpx.ReadTimeout("timed out"), "ok"]
+
+    async def submit() -> str:
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    # The timeout may have started an operation, so it is not retried
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(resilience.call("veo", submit, policy=SUBMIT_RETRY_POLICY))
+    assert len(sleeps) == 1 and outcomes == ["ok"]
+
+
+def test_breaker_opens_fails_fast_and_closes_after_probe(clock: FakeClock) -> None:
+    sleeps: list[float] = []
+    resilience = _resilience(
+        clock, sleeps, policy=RetryPolicy(attempts=1), failure_threshold=2, reset_timeout=30
+    )
+    healthy = False
+    calls = 0
+
+    async def upstream() -> str:
+        nonlocal calls
+        calls += 1
+        if not healthy:
+            raise _api_error(503, "UNAVAILABLE")
+        return "ok"
+
+    async def run() -> None:
+        nonlocal healthy
+        for _ in range(2):
+            with pytest.raises(errors.ServerError):
+                await resilience.call("veo", upstream)
+        with pytest.raises(ServiceBusy) as busy:
+            await resilience.call("veo", upstream)
+        assert busy.value.retry_after == 30
+        assert calls == 2
+        # Another model is unaffected
+        with pytest.raises(errors.ServerError):
+            await resilience.call("imagen", upstream)
+        # ...and so is another bucket of the same model
+        with pytest.raises(errors.ServerError):
+            await resilience.call("veo", upstream, bucket="veo:download")
+
+        clock.now += 30
+        # The probe fails, so the breaker opens again
+        with pytest.raises(errors.ServerError):
+            await resilience.call("veo", upstream)
+        with pytest.raises(ServiceBusy):
+            await resilience.call("veo", upstream)
+
+        clock.now += 30
+        healthy = True
+        assert await resilience.call("veo", upstream) == "ok"
+        assert await resilience.call("veo", upstream) == "ok"
+
+    asyncio.run(run())
+    stats = resilience.stats()["veo"]
+    assert (stats.state, stats.opened, stats.rejected) == (BreakerState.CLOSED, 2, 2)
+
+
+def test_retries_stop_at_the_deadline(clock: FakeClock) -> None:
+    sleeps: list[float] = []
+    resilience = _resilience(clock, sleeps, policy=RetryPolicy(attempts=10, base_delay=8, max_delay=8, deadline=10))
+
+    async def down() -> None:
+        clock.now += 4
+        raise httpx.ReadTimeout("slow")
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(resilience.call("imagen", down))
+    assert clock.now <= 10 + 4
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+import core.app  # noqa: F401  (registers the app's routes)
+from tg_bot.keyboards import CB_PRESET_SELECT, CB_PREFIX_IMAGE_RATIO, CB_WELCOME_LANGUAGE
+from tg_bot.router import CallbackRouter, callback_router
+
+
+def test_longest_prefix_wins_and_passes_remaining_segments() -> None:
+    router = CallbackRouter()
+
+    async def short(update, context, args): ...
+    async def long(update, context, args): ...
+
+    router.add("settings", short)
+    router.add("settings:ratio:", long)
+    assert router.resolve("settings:ratio:image") == ("settings:ratio", long, ("image",))
+    assert router.resolve("settings:back") == ("settings", short, ("back",))
+    assert router.resolve("presets") is None
+    with pytest.raises(ValueError):
+        router.add("settings", short)
+
+
+def test_dispatch_counts_calls_errors_and_unmatched() -> None:
+    router = CallbackRouter()
+    seen = []
+
+    @router.route("preset:select")
+    async def select(update, context, args):
+        seen.append(args)
+        if args == ("bad",):
+            raise RuntimeError("boom")
+
+    async def run() -> None:
+        assert await router.dispatch(None, None, "preset:select:coffee")
+        with pytest.raises(RuntimeError):
+            await router.dispatch(None, None, "preset:select:bad")
+        assert not await router.dispatch(None, None, "preset:page:1")
+
+    asyncio.run(run())
+    stats = router.stats()["preset:select"]
+    assert seen == [("coffee",), ("bad",)]
+    assert (stats.calls, stats.errors, router.unmatched) == (2, 1, 1)
+    assert stats.max_seconds >= 0 and stats.mean_ms >= 0
+
+
+def test_keyboard_callbacks_are_routed() -> None:
+    for data in (
+        f"{CB_PREFIX_IMAGE_RATIO}PORTRAIT",
+        f"{CB_WELCOME_LANGUAGE}:AMHARIC",
+        f"{CB_PRESET_SELECT}:coffee_ceremony",
+        "image_choice:text",
+        "nav:presets",
+        "settings:back",
+    ):
+        assert callback_router.resolve(data) is not None, data
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from services.scheduler import GenerationScheduler
+
+
+def test_limit_is_per_model_and_queue_is_round_robin() -> None:
+    scheduler = GenerationScheduler(default_limit=1, limits={"veo": 2})
+    order: list[int] = []
+    positions: dict[int, int] = {}
+
+    async def job(user_id: int, tag: int, model: str = "imagen") -> None:
+        async def queued(position: int) -> None:
+            positions[tag] = position
+
+        async with scheduler.slot(model, user_id, on_queued=queued):
+            order.append(tag)
+            await asyncio.sleep(0.01)
+
+    async def run() -> None:
+        tasks = [asyncio.create_task(job(1, 0))]
+        await asyncio.sleep(0)
+        # User 1 floods the queue before user 2 arrives
+        tasks += [asyncio.create_task(job(1, tag)) for tag in (1, 2, 3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(job(2, tag)) for tag in (10, 11)]
+        await asyncio.sleep(0)
+        # Another model isn't held up by this one
+        assert scheduler.stats()["imagen"].queued == 5
+        await job(3, 20, "veo")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == [0, 20, 1, 10, 2, 11, 3]
+    assert positions == {1: 1, 2: 2, 3: 3, 10: 2, 11: 4}
+    stats = scheduler.stats()["imagen"]
+    assert (stats.limit, stats.granted, stats.waited, stats.max_queued, stats.active) == (1, 6, 5, 5, 0)
+    assert stats.mean_wait_ms > 0
+    assert scheduler.stats()["veo"].limit == 2
+
+
+def test_cancelled_waiter_leaves_the_queue() -> None:
+    scheduler = GenerationScheduler(default_limit=1)
+    granted: list[int] = []
+
+    async def job(user_id: int) -> None:
+        async with scheduler.slot("imagen", user_id):
+            granted.append(user_id)
+            await asyncio.sleep(0.01)
+
+    async def run() -> None:
+        first = asyncio.create_task(job(1))
+        await asyncio.sleep(0)
+        abandoned = asyncio.create_task(job(2))
+        last = asyncio.create_task(job(3))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await abandoned
+        await asyncio.gather(first, last)
+
+    asyncio.run(run())
+    assert granted == [1, 3]
+    stats = scheduler.stats()["imagen"]
+    assert (stats.active, stats.queued) == (0, 0)
+
+
+def test_release_skips_a_waiter_cancelled_in_the_same_tick() -> None:
+    scheduler = GenerationScheduler(default_limit=1)
+
+    async def run() -> None:
+        await scheduler.acquire("imagen", 1)
+        abandoned = asyncio.create_task(scheduler.acquire("imagen", 2))
+        waiting = asyncio.create_task(scheduler.acquire("imagen", 3))
+        await asyncio.sleep(0)
+        # Cancelled, then the slot is freed before the cancelled task gets to run
+        abandoned.cancel()
+        scheduler.release("imagen")
+        with pytest.raises(asyncio.CancelledError):
+            await abandoned
+        await waiting
+        scheduler.release("imagen")
+
+    asyncio.run(run())
+    stats = scheduler.stats()["imagen"]
+    assert (stats.active, stats.queued, stats.granted) == (0, 0, 2)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution() -> None:
+    flights: SingleFlight[str] = SingleFlight()
+    calls = 0
+
+    async def fetch() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run() -> list:
+        return await asyncio.gather(*(flights.do("k", fetch) for _ in range(5)), flights.do("other", fetch))
+
+    results = asyncio.run(run())
+    assert calls == 2
+    assert [shared for _, shared in results] == [False, True, True, True, True, False]
+    assert all(result == "result" for result, _ in results)
+    stats = flights.stats()
+    assert (stats.calls, stats.executions, stats.coalesced, stats.in_flight) == (6, 2, 4, 0)
+
+
+def test_errors_are_shared_and_later_calls_run_again() -> None:
+    flights: SingleFlight[str] = SingleFlight()
+
+    async def fail() -> str:
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota")
+
+    async def ok() -> str:
+        return "fresh"
+
+    async def run() -> None:
+        results = await asyncio.gather(flights.do("k", fail), flights.do("k", fail), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await flights.do("k", ok) == ("fresh", False)
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_shared_call() -> None:
+    flights: SingleFlight[str] = SingleFlight()
+
+    async def slow() -> str:
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run() -> None:
+        first = asyncio.create_task(flights.do("k", slow))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.do("k", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == ("done", True)
+
+    asyncio.run(run())
+
+
+def test_none_key_is_never_coalesced() -> None:
+    flights: SingleFlight[int] = SingleFlight()
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        return calls
+
+    async def run() -> None:
+        await asyncio.gather(flights.do(None, fetch), flights.do(None, fetch))
+
+    asyncio.run(run())
+    assert calls == 2
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import string
+
+import json
+from pathlib import Path
+
+from tg_bot import translations
+from tg_bot.translations import get_translation, load_bundle, message_id, translate
+from tg_bot.user_settings import Language
+
+
+def test_compiled_catalog_matches_str_format() -> None:
+    english = load_bundle(Language.ENGLISH)
+    for language in Language:
+        bundle = load_bundle(language)
+        for key in english:
+            template = bundle.get(key) or english[key]
+            fields = {f for _, f, _, _ in string.Formatter().parse(template) if f}
+            kwargs = {field: f"<{field}>" for field in fields}
+            expected = template.format(**kwargs)
+            assert get_translation(key, language, **kwargs) == expected
+            assert translate(message_id(key), language, **kwargs) == expected
+
+
+def test_unknown_keys_fall_back_to_the_key() -> None:
+    assert get_translation("not a key", Language.AMHARIC) == "not a key"
+    assert get_translation("Hi {name}", Language.ENGLISH, name="Abebe") == "Hi Abebe"
+
+
+def test_bundles_load_lazily_along_the_fallback_chain(tmp_path: Path, mocker) -> None:
+    (tmp_path / "en.json").write_text(json.dumps({"greet": "Hello {name}", "bye": "Bye"}), encoding="utf-8")
+    (tmp_path / "am.json").write_text(json.dumps({"greet": "ሰላም {name}"}), encoding="utf-8")
+    mocker.patch.object(translations, "LOCALES_DIR", tmp_path)
+    try:
+        translations.compile_catalog()
+        assert translations.loaded_languages() == [Language.ENGLISH]
+
+        assert get_translation("bye", Language.AMHARIC) == "Bye"
+        assert get_translation("greet", Language.AMHARIC, name="Abebe") == "ሰላም Abebe"
+        assert set(translations.loaded_languages()) == {Language.ENGLISH, Language.AMHARIC}
+    finally:
+        mocker.stopall()
+        translations.compile_catalog()
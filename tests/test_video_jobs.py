@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from core.database import AsyncBotDatabase, BotDatabase, CreditKind, VideoJobStatus
+from tg_bot import video_jobs
+
+
+@pytest.fixture()
+def db(tmp_path: Path, mocker) -> BotDatabase:
+    database = BotDatabase(str(tmp_path / "bot_database.db"))
+    database.initialize_database()
+    database.create_user(
+        user_id=1, first_name="Alice", username="alice", chat_id=1001, language="Amharic",
+        image_ratio="9:16", video_ratio="9:16", initial_image_credits=0, initial_video_credits=2,
+    )
+    facade = AsyncBotDatabase(database)
+    mocker.patch.object(video_jobs, "async_bot_db", facade)
+    yield database
+    facade.shutdown()
+    database.close()
+
+
+def _service() -> MagicMock:
+    service = MagicMock(model_name="veo-i2v", text_to_video_model="veo-t2v", default_aspect_ratio="9:16")
+    service.operation_from_name = lambda name: SimpleNamespace(name=name, done=False)
+    service.wait_for_operation = AsyncMock(side_effect=lambda op, *args, **kwargs: SimpleNamespace(name=op.name, done=True))
+
+    async def save_video(operation, output_path, key_id=None):
+        Path(output_path).write_bytes(b"video")
+        return str(output_path)
+
+    service.save_video = AsyncMock(side_effect=save_video)
+    return service
+
+
+def test_restart_resumes_running_jobs_and_delivers_once(db: BotDatabase) -> None:
+    running = db.create_video_job(1, 1001, "a horse", "Amharic", db.reserve_credit(1, CreditKind.VIDEO).reservation_id)
+    db.advance_video_job(running.job_id, VideoJobStatus.SUBMITTING, VideoJobStatus.RUNNING, "operations/7", "key-a")
+    db.create_video_job(1, 1001, "a river", "Amharic", db.reserve_credit(1, CreditKind.VIDEO).reservation_id)
+    bot = AsyncMock()
+    service = _service()
+
+    async def run() -> None:
+        assert await video_jobs.resume_video_jobs(bot, service) == 1
+        await asyncio.gather(*video_jobs._tasks.values())
+        # A second start finds nothing left to do
+        assert await video_jobs.resume_video_jobs(bot, service) == 0
+
+    asyncio.run(run())
+    assert service.wait_for_operation.call_args.args[0].name == "operations/7"
+    # Polling and download stay on the key that submitted the operation
+    assert service.wait_for_operation.call_args.kwargs["key_id"] == "key-a"
+    assert service.save_video.call_args.args[2] == "key-a"
+    bot.send_video.assert_awaited_once()
+    assert bot.send_video.call_args.kwargs["chat_id"] == 1001
+    assert db.get_active_video_jobs() == []
+    # The delivered job's credit is spent; the orphaned submission is refunded
+    assert db.get_user_credits(1) == (0, 1)
+    # One failure notice for the orphan, one credit confirmation for the delivery
+    assert bot.send_message.await_count == 2
+
+
+def test_replaced_job_is_refunded_but_shutdown_keeps_it(db: BotDatabase) -> None:
+    service = _service()
+    service.start_video_from_prompt = AsyncMock(return_value=(SimpleNamespace(name="operations/9", done=False), "key-b"))
+
+    async def never_finishes(*args, **kwargs):
+        await asyncio.sleep(3600)
+
+    service.wait_for_operation = AsyncMock(side_effect=never_finishes)
+    bot = AsyncMock()
+
+    async def start() -> None:
+        reservation = db.reserve_credit(1, CreditKind.VIDEO)
+        await video_jobs.start_video_job(bot, service, 1, 1001, "a horse", video_jobs.Language.AMHARIC, reservation.reservation_id)
+        await asyncio.sleep(0.2)
+
+    async def kept_on_shutdown() -> None:
+        await start()
+        await video_jobs.shutdown()
+
+    async def replaced() -> None:
+        await start()
+        assert await video_jobs.cancel_user_video_jobs(1)
+
+    asyncio.run(kept_on_shutdown())
+    assert [(job.status, job.api_key_id) for job in db.get_active_video_jobs()] == [(VideoJobStatus.RUNNING, "key-b")]
+    assert db.get_user_credits(1) == (0, 1)
+
+    # The replaced job is failed and refunded; the one kept at shutdown is untouched
+    asyncio.run(replaced())
+    assert [job.status for job in db.get_active_video_jobs()] == [VideoJobStatus.RUNNING]
+    assert db.get_user_credits(1) == (0, 1)
+    bot.send_message.assert_not_awaited()
+
+
+def test_job_whose_operation_cannot_be_recorded_is_refunded(db: BotDatabase, mocker) -> None:
+    service = _service()
+    service.start_video_from_prompt = AsyncMock(return_value=(SimpleNamespace(name="operations/11", done=False), "key-a"))
+    mocker.patch.object(video_jobs.async_bot_db, "advance_video_job", AsyncMock(return_value=False))
+    bot = AsyncMock()
+
+    async def run() -> None:
+        reservation = db.reserve_credit(1, CreditKind.VIDEO)
+        task = await video_jobs.start_video_job(bot, service, 1, 1001, "a horse", video_jobs.Language.AMHARIC, reservation.reservation_id)
+        await task
+
+    asyncio.run(run())
+    service.wait_for_operation.assert_not_awaited()
+    assert db.get_active_video_jobs() == []
+    assert db.get_user_credits(1) == (0, 2)
+    bot.send_message.assert_awaited_once()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.video_poller import OperationTimeout, VideoOperationPoller
+
+
+class FakeOperations:
+    """Operations finish after ``polls_needed[name]`` polls; every poll is recorded."""
+
+    def __init__(self, polls_needed: dict[str, int]) -> None:
+        self.polls_needed = polls_needed
+        self.calls: list[str] = []
+
+    async def get(self, operation):
+        self.calls.append(operation.name)
+        done = self.calls.count(operation.name) >= self.polls_needed[operation.name]
+        return SimpleNamespace(name=operation.name, done=done)
+
+
+def _poller(polls_needed: dict[str, int], **kwargs) -> tuple[VideoOperationPoller, FakeOperations]:
+    operations = FakeOperations(polls_needed)
+    client = SimpleNamespace(aio=SimpleNamespace(operations=operations))
+    kwargs.setdefault("min_interval", 0.01)
+    kwargs.setdefault("max_interval", 0.02)
+    kwargs.setdefault("initial_estimate", 0.0)
+    return VideoOperationPoller(client, **kwargs), operations
+
+
+def _op(name: str) -> SimpleNamespace:
+    return SimpleNamespace(name=name, done=False)
+
+
+def test_resolves_every_watched_operation_and_learns_completion_time() -> None:
+    poller, operations = _poller({f"op{i}": i + 1 for i in range(20)})
+
+    async def run() -> list:
+        return await asyncio.gather(*(poller.watch(_op(f"op{i}")) for i in range(20)))
+
+    results = asyncio.run(run())
+    assert [r.name for r in results] == [f"op{i}" for i in range(20)] and all(r.done for r in results)
+    stats = poller.stats()
+    assert stats.completed == 20 and stats.pending == 0
+    assert stats.polls == len(operations.calls) == sum(range(1, 21))
+    assert stats.estimated_completion_seconds > 0
+
+
+def test_first_poll_waits_for_the_expected_completion_time() -> None:
+    poller, operations = _poller({"slow": 1}, initial_estimate=0.2, lead=1.0)
+
+    async def run() -> None:
+        future = poller.watch(_op("slow"))
+        await asyncio.sleep(0.1)
+        assert operations.calls == []
+        await future
+
+    asyncio.run(run())
+    assert operations.calls == ["slow"]
+
+
+def test_timeouts_and_cancelled_watchers() -> None:
+    poller, operations = _poller({"stuck": 10**6, "abandoned": 10**6}, timeout_seconds=0.05)
+
+    async def run() -> None:
+        abandoned = poller.watch(_op("abandoned"))
+        abandoned.cancel()
+        with pytest.raises(OperationTimeout):
+            await poller.watch(_op("stuck"))
+
+    asyncio.run(run())
+    assert "abandoned" not in operations.calls
+    assert poller.stats().timed_out == 1
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from core.database import AsyncBotDatabase, ConversationRow, async_bot_db
+
+log = logging.getLogger(__name__)
+
+# Abandoned flows are dropped (and their uploads deleted) after this long idle
+CONVERSATION_TTL_SECONDS = 30 * 60
+# Changes made within this window are persisted together in one write
+PERSIST_DELAY_SECONDS = 0.5
+
+
+class ConversationState(str, Enum):
+    IDLE = "idle"
+    IMAGE_CHOICE = "image_choice"
+    IMAGE_UPLOAD = "image_upload"
+    IMAGE_PROMPT = "image_prompt"
+    VIDEO_CHOICE = "video_choice"
+    VIDEO_UPLOAD = "video_upload"
+    VIDEO_PROMPT = "video_prompt"
+
+
+# States a flow can start from, whatever the user was doing before
+ENTRY_STATES = frozenset({ConversationState.IMAGE_CHOICE, ConversationState.VIDEO_CHOICE})
+
+TRANSITIONS: Dict[ConversationState, frozenset[ConversationState]] = {
+    ConversationState.IDLE: frozenset(),
+    ConversationState.IMAGE_CHOICE: frozenset({ConversationState.IMAGE_PROMPT, ConversationState.IMAGE_UPLOAD}),
+    ConversationState.IMAGE_UPLOAD: frozenset({ConversationState.IMAGE_PROMPT}),
+    ConversationState.IMAGE_PROMPT: frozenset(),
+    ConversationState.VIDEO_CHOICE: frozenset({ConversationState.VIDEO_PROMPT, ConversationState.VIDEO_UPLOAD}),
+    ConversationState.VIDEO_UPLOAD: frozenset({ConversationState.VIDEO_PROMPT}),
+    ConversationState.VIDEO_PROMPT: frozenset(),
+}
+
+
+# Where to send a restored flow whose uploaded image didn't survive the restart
+_REUPLOAD_STATE = {
+    ConversationState.IMAGE_PROMPT: ConversationState.IMAGE_UPLOAD,
+    ConversationState.VIDEO_PROMPT: ConversationState.VIDEO_UPLOAD,
+}
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+@dataclass(slots=True)
+class Conversation:
+    state: ConversationState
+    text_only: bool = True
+    image_path: Optional[str] = None
+    updated_at: float = 0.0
+
+
+def discard_temp_file(path_str: str | None) -> None:
+    """Delete an uploaded temp file and its mkdtemp directory if now empty."""
+    if not path_str:
+        return
+    try:
+        path = Path(path_str)
+        path.unlink(missing_ok=True)
+        try:
+            path.parent.rmdir()
+        except OSError:
+            pass
+    except Exception:
+        log.debug("Failed to cleanup temp file %s", path_str, exc_info=True)
+
+
+class ConversationStore:
+    """Where each user is in a generation flow, plus that flow's payload.
+
+    Only users mid-flow have an entry; going back to IDLE removes it. Entries
+    untouched for ``ttl_seconds`` expire on the next lookup or ``expire()``
+    sweep, and any uploaded image they hold is deleted.
+
+    With a database attached, changes are snapshotted to the ``conversations``
+    table, coalesced so a burst of transitions costs one queued write. After a
+    restart only the index of persisted users is loaded; each flow is restored
+    on that user's next update via ``preload()``.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = CONVERSATION_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+        db: AsyncBotDatabase | None = None,
+        persist_delay: float = PERSIST_DELAY_SECONDS,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._db = db
+        self._persist_delay = persist_delay
+        self._sessions: Dict[int, Conversation] = {}
+        self._unrestored: Dict[int, float] = {}
+        self._dirty: set[int] = set()
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    async def restore_index(self) -> None:
+        """Forget stale persisted flows and note which users have one to restore."""
+        if self._db is None:
+            return
+        for image_path in await self._db.prune_conversations(self._clock() - self.ttl_seconds):
+            discard_temp_file(image_path)
+        self._unrestored = await self._db.get_conversation_index()
+        if self._unrestored:
+            log.info("%d conversation(s) will be restored on next use", len(self._unrestored))
+
+    async def preload(self, user_id: int) -> None:
+        """Restore a user's persisted flow, if any, without blocking the event loop."""
+        if user_id not in self._unrestored or self._db is None:
+            return
+        row = await self._db.get_conversation(user_id)
+        # A transition made while loading supersedes the persisted flow
+        if self._unrestored.pop(user_id, None) is not None and row is not None:
+            self._restore(row)
+
+    def _restore(self, row: ConversationRow) -> None:
+        user_id, state, text_only, image_path, updated_at = row
+        try:
+            conversation = Conversation(ConversationState(state), text_only, image_path, updated_at)
+        except ValueError:
+            self._mark_dirty(user_id)
+            return
+        if image_path and not Path(image_path).exists():
+            conversation.image_path = None
+            conversation.state = _REUPLOAD_STATE.get(conversation.state, conversation.state)
+            self._mark_dirty(user_id)
+        self._sessions[user_id] = conversation
+
+    def get(self, user_id: int) -> Conversation | None:
+        conversation = self._sessions.get(user_id)
+        if conversation is not None and self._clock() - conversation.updated_at >= self.ttl_seconds:
+            self._drop(user_id)
+            return None
+        return conversation
+
+    def state(self, user_id: int) -> ConversationState:
+        conversation = self.get(user_id)
+        return conversation.state if conversation else ConversationState.IDLE
+
+    def transition(
+        self,
+        user_id: int,
+        to: ConversationState,
+        *,
+        text_only: bool | None = None,
+        image_path: str | None = None,
+    ) -> Conversation | None:
+        """Move to ``to``, keeping the current payload unless a new flow starts."""
+        if to is ConversationState.IDLE:
+            self.reset(user_id)
+            return None
+        current = self.get(user_id)
+        self._unrestored.pop(user_id, None)
+        if to in ENTRY_STATES:
+            if current is not None:
+                self._drop(user_id)
+            current = Conversation(state=to)
+            self._sessions[user_id] = current
+        else:
+            state = current.state if current else ConversationState.IDLE
+            if to not in TRANSITIONS[state]:
+                raise InvalidTransition(f"Cannot go from {state.value} to {to.value}")
+            current.state = to
+        if text_only is not None:
+            current.text_only = text_only
+        if image_path is not None:
+            if current.image_path and current.image_path != image_path:
+                discard_temp_file(current.image_path)
+            current.image_path = image_path
+        current.updated_at = self._clock()
+        self._mark_dirty(user_id)
+        return current
+
+    def take(self, user_id: int) -> Conversation | None:
+        """End the flow and hand its payload (and temp-file cleanup) to the caller."""
+        conversation = self.get(user_id)
+        if conversation is not None:
+            del self._sessions[user_id]
+            self._mark_dirty(user_id)
+        return conversation
+
+    def reset(self, user_id: int) -> None:
+        """Abandon the flow and delete anything it uploaded."""
+        if user_id in self._sessions:
+            self._drop(user_id)
+        elif self._unrestored.pop(user_id, None) is not None:
+            self._mark_dirty(user_id)
+
+    def expire(self) -> int:
+        """Drop every stale flow. Returns the number removed."""
+        cutoff = self._clock() - self.ttl_seconds
+        stale = [uid for uid, c in self._sessions.items() if c.updated_at <= cutoff]
+        for user_id in stale:
+            self._drop(user_id)
+        # Persisted rows for these are removed by the periodic prune
+        unrestored = [uid for uid, updated_at in self._unrestored.items() if updated_at <= cutoff]
+        for user_id in unrestored:
+            del self._unrestored[user_id]
+        return len(stale) + len(unrestored)
+
+    async def prune_persisted(self) -> None:
+        """Delete stale persisted flows and their uploads."""
+        if self._db is None:
+            return
+        for image_path in await self._db.prune_conversations(self._clock() - self.ttl_seconds):
+            discard_temp_file(image_path)
+
+    def flush(self) -> Future[None] | None:
+        """Persist every pending change now in a single queued write."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._db is None or not self._dirty:
+            self._dirty.clear()
+            return None
+        rows: list[ConversationRow] = []
+        deleted: list[int] = []
+        for user_id in self._dirty:
+            conversation = self._sessions.get(user_id)
+            if conversation is None:
+                deleted.append(user_id)
+            else:
+                rows.append((
+                    user_id,
+                    conversation.state.value,
+                    conversation.text_only,
+                    conversation.image_path,
+                    conversation.updated_at,
+                ))
+        self._dirty.clear()
+        return self._db.save_conversations(rows, deleted)
+
+    def _mark_dirty(self, user_id: int) -> None:
+        if self._db is None:
+            return
+        self._dirty.add(user_id)
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self._persist_delay, self.flush)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _drop(self, user_id: int) -> None:
+        conversation = self._sessions.pop(user_id)
+        discard_temp_file(conversation.image_path)
+        self._mark_dirty(user_id)
+
+
+# Single instance, persisted to the bot database
+conversations = ConversationStore(db=async_bot_db)
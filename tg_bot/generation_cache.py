@@ -0,0 +1,210 @@
+"""Content-addressed cache of delivered generations.
+
+A result is keyed by a SHA-256 of the model, the normalized prompt, the aspect
+ratio and the hash of any input image. What is stored is the Telegram
+``file_id`` from the first send, so a repeat request is answered by re-sending
+that file_id: no Gemini call and no upload. Entries expire ``ttl_seconds``
+after they were created, and the least recently used are evicted beyond
+``max_entries`` by ``prune()``. Setting ``max_entries`` to 0 disables caching.
+
+Only fixed prompts (the presets) are cached: someone who sends their own
+prompt again usually wants a new variation, not the same file.
+
+``deliver_generation()`` also coalesces identical requests that arrive while
+one is still generating: they share that one Gemini call, and each uploads
+the resulting file to its own chat, so one chat's send error can't fail the
+others.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from telegram import Message
+from telegram.error import BadRequest
+
+from core import AppConfig
+from core.database import AsyncBotDatabase, async_bot_db
+from core.utils.cache import LRUCache
+from services.singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+# Hot keys (e.g. popular presets) are answered without a database read
+MEMORY_CACHE_SIZE = 1024
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split()).casefold()
+
+
+def _file_digest(path: str | Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+async def cache_key(model: str, prompt: str, aspect_ratio: str | None, image_path: str | Path | None = None) -> str | None:
+    """Stable key for a generation request, or None if its input image can't be read."""
+    image_digest = ""
+    if image_path:
+        try:
+            # Uploads can be several MB; hash them off the event loop
+            image_digest = await asyncio.to_thread(_file_digest, image_path)
+        except OSError:
+            return None
+    parts = (model, normalize_prompt(prompt), aspect_ratio or "", image_digest)
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def sent_file_id(message: Message | None) -> str | None:
+    """file_id of the photo or video in a sent message."""
+    if message is None:
+        return None
+    if message.photo:
+        return message.photo[-1].file_id
+    if message.video:
+        return message.video.file_id
+    return None
+
+
+@dataclass(frozen=True)
+class GenerationCacheStats:
+    hits: int
+    misses: int
+    stores: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class GenerationCache:
+    def __init__(
+        self,
+        db: AsyncBotDatabase,
+        ttl_seconds: float = AppConfig.generation_cache_ttl_seconds,
+        max_entries: int = AppConfig.generation_cache_max_entries,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._db = db
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        # cache_key -> (file_id, created_at)
+        self._memory: LRUCache[str, tuple[str, float]] = LRUCache(MEMORY_CACHE_SIZE)
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+
+    def configure(self, cfg: AppConfig) -> None:
+        self.ttl_seconds = cfg.generation_cache_ttl_seconds
+        self.max_entries = cfg.generation_cache_max_entries
+        self._memory.clear()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    async def get(self, key: str | None) -> str | None:
+        """Cached file_id for ``key``, or None on a miss. A hit is only counted by ``resend()``."""
+        if not self.enabled or key is None:
+            return None
+        created_after = self._clock() - self.ttl_seconds
+        entry = self._memory.get(key)
+        if entry is None or entry[1] <= created_after:
+            entry = await self._db.get_cached_generation(key, created_after)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._memory.put(key, entry)
+        return entry[0]
+
+    def put(self, key: str | None, kind: str, file_id: str | None) -> None:
+        """Remember the file_id just delivered for ``key``."""
+        if not self.enabled or key is None or not file_id:
+            return
+        now = self._clock()
+        self._memory.put(key, (file_id, now))
+        self._db.save_generation(key, kind, file_id, now)
+        self._stores += 1
+
+    def forget(self, key: str) -> None:
+        self._memory.pop(key)
+        self._db.delete_generation(key)
+
+    async def resend(self, key: str | None, send: Callable[[str], Awaitable[Message]]) -> Message | None:
+        """Deliver the cached result via ``send(file_id)``.
+
+        Returns the sent message, or None on a miss or if Telegram rejects the
+        file_id, in which case the entry is dropped and the caller generates as
+        usual. Other send errors (e.g. the user blocked the bot) propagate.
+        """
+        file_id = await self.get(key)
+        if file_id is None:
+            return None
+        try:
+            sent = await send(file_id)
+        except BadRequest as exc:
+            log.warning("Cached file_id could not be re-sent, regenerating: %s", exc)
+            self.forget(key)
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._db.touch_generations([key], self._clock())
+        return sent
+
+    async def prune(self) -> int:
+        """Evict expired and excess entries. Returns rows removed."""
+        self._memory.clear()
+        return await self._db.prune_generation_cache(self._clock() - self.ttl_seconds, max(self.max_entries, 0))
+
+    def stats(self) -> GenerationCacheStats:
+        return GenerationCacheStats(hits=self._hits, misses=self._misses, stores=self._stores)
+
+
+# Single instance backed by the bot database
+generation_cache = GenerationCache(async_bot_db)
+# In-flight generations by cache key; each resolves to the generated file's bytes
+generation_flights: SingleFlight[bytes | None] = SingleFlight()
+
+
+async def deliver_generation(
+    key: str | None,
+    kind: str,
+    send: Callable[[Any], Awaitable[Message]],
+    generate: Callable[[], Awaitable[str | None]],
+    use_cache: bool = True,
+    store: bool = True,
+) -> bool:
+    """Deliver the result for ``key`` through ``send(file)``. Returns True if it was sent.
+
+    The result comes from the cache (unless ``use_cache`` is False), from an
+    identical request already in flight, or from ``generate()``, which returns
+    the path of a new file. ``store`` controls whether a new result is cached.
+    Coalesced requests share the generated bytes and each upload them; if the
+    shared generation fails, it fails for all of them.
+    """
+    if use_cache and await generation_cache.resend(key, send) is not None:
+        return True
+
+    async def generate_bytes() -> bytes | None:
+        path = await generate()
+        if not path:
+            return None
+        # Shared as bytes: the output file belongs to the first caller, which deletes it when done
+        return await asyncio.to_thread(Path(path).read_bytes)
+
+    data, _ = await generation_flights.do(key, generate_bytes)
+    if data is None:
+        return False
+    sent = await send(data)
+    if store:
+        generation_cache.put(key, kind, sent_file_id(sent))
+    return True
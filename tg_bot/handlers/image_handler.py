@@ -3,20 +3,26 @@ from __future__ import annotations
 import logging
 import tempfile
 from pathlib import Path
-import asyncio
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from services.gemini_image import GeminiImageService
-from tg_bot.user_settings import user_settings, has_image_credits, deduct_image_credit, get_user_credits
+from services.gemini_image import IMAGE_TO_IMAGE_MODEL, GeminiImageService
+from services.resilience import ServiceBusy
+from services.scheduler import generation_scheduler
+from core.database import CreditKind
+from tg_bot.conversation import ConversationState, conversations
+from tg_bot.user_settings import user_settings, reserve_credit, commit_credit, refund_credit
 from tg_bot.translations import get_translation
+from tg_bot.generation_cache import cache_key, deliver_generation
+from tg_bot.router import callback_router
 
 
 log = logging.getLogger(__name__)
 
 IMAGE_CHOICE_TEXT = "📝 Text Only"
 IMAGE_CHOICE_IMAGE = "🖼️ With Image"
+CB_IMAGE_CHOICE = "image_choice"
 
 
 def get_image_choice_keyboard(user_id: int) -> InlineKeyboardMarkup:
@@ -26,11 +32,11 @@ def get_image_choice_keyboard(user_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([
         [InlineKeyboardButton(
             text=get_translation(IMAGE_CHOICE_TEXT, language),
-            callback_data="image_choice:text"
+            callback_data=f"{CB_IMAGE_CHOICE}:text"
         )],
         [InlineKeyboardButton(
             text=get_translation(IMAGE_CHOICE_IMAGE, language),
-            callback_data="image_choice:image"
+            callback_data=f"{CB_IMAGE_CHOICE}:image"
         )]
     ])
 
@@ -41,14 +47,15 @@ async def begin_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     language = user_settings.get_language(user_id)
 
     # Offer choice between text-only and image-based generation
-    user_settings.set_awaiting_image_choice(user_id)
+    conversations.transition(user_id, ConversationState.IMAGE_CHOICE)
     await update.effective_message.reply_text(
         get_translation("image_generation_choice", language),
         reply_markup=get_image_choice_keyboard(user_id)
     )
 
 
-async def handle_image_choice_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+@callback_router.route(CB_IMAGE_CHOICE)
+async def handle_image_choice_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
     """Handle image generation choice selection."""
     query = update.callback_query
     await query.answer()
@@ -56,25 +63,21 @@ async def handle_image_choice_callback(update: Update, context: ContextTypes.DEF
     user_id = update.effective_user.id if update.effective_user else 0
     language = user_settings.get_language(user_id)
 
-    if not user_settings.is_awaiting_image_choice(user_id):
+    if conversations.state(user_id) is not ConversationState.IMAGE_CHOICE:
         return
 
-    choice = query.data.split(":")[1] if ":" in query.data else ""
+    choice = args[0] if args else ""
 
     if choice == "text":
         # Text-only image generation
-        user_settings.clear_awaiting_image_choice(user_id)
-        user_settings.set_awaiting_prompt(user_id)
-        user_settings.set_image_mode_text_only(user_id)
+        conversations.transition(user_id, ConversationState.IMAGE_PROMPT, text_only=True)
         await query.edit_message_text(
             get_translation("image_prompt_message", language)
         )
 
     elif choice == "image":
         # Image-based image generation
-        user_settings.clear_awaiting_image_choice(user_id)
-        user_settings.set_awaiting_image_upload_for_image_gen(user_id)
-        user_settings.set_image_mode_with_image(user_id)
+        conversations.transition(user_id, ConversationState.IMAGE_UPLOAD, text_only=False)
         await query.edit_message_text(
             get_translation("image_to_image_upload_prompt", language)
         )
@@ -85,7 +88,7 @@ async def handle_image_upload_for_image_gen(update: Update, context: ContextType
     user_id = update.effective_user.id if update.effective_user else 0
     language = user_settings.get_language(user_id)
 
-    if not user_settings.is_awaiting_image_upload_for_image_gen(user_id):
+    if conversations.state(user_id) is not ConversationState.IMAGE_UPLOAD:
         return
 
     # Get the photo from the message
@@ -109,9 +112,7 @@ async def handle_image_upload_for_image_gen(update: Update, context: ContextType
         await file_obj.download_to_drive(str(image_path))
 
         # Store the image path
-        user_settings.set_uploaded_image_path(user_id, str(image_path))
-        user_settings.clear_awaiting_image_upload_for_image_gen(user_id)
-        user_settings.set_awaiting_prompt(user_id)
+        conversations.transition(user_id, ConversationState.IMAGE_PROMPT, image_path=str(image_path))
 
         await update.effective_message.reply_text(
             get_translation("image_upload_success_prompt_for_image_gen", language)
@@ -129,37 +130,29 @@ async def handle_prompt_text(update: Update, context: ContextTypes.DEFAULT_TYPE,
     user_id = update.effective_user.id if update.effective_user else 0
     language = user_settings.get_language(user_id)
     
-    if not user_settings.is_awaiting_prompt(user_id):
+    conversation = conversations.get(user_id)
+    if conversation is None or conversation.state is not ConversationState.IMAGE_PROMPT:
         return
-    
+
     text = (update.effective_message.text or "").strip()
     if not text:
         await update.effective_message.reply_text(get_translation("empty_description_message", language))
         return
 
-    # Check if user has image credits
-    if not has_image_credits(user_id):
-        await update.effective_message.reply_text(get_translation("insufficient_image_credits", language))
-        user_settings.clear_awaiting_prompt(user_id)
-        return
-
-    await update.effective_message.reply_text(get_translation("in_progress_message", language))
     ratio = user_settings.get_ratio(user_id).value
 
     # Check if this is text-only or image-based generation
-    is_text_only = user_settings.is_image_mode_text_only(user_id)
-
-    if is_text_only:
+    if conversation.text_only:
         # Text-only image generation (original functionality)
         image_path = None
     else:
         # Image-based generation - get the uploaded image path
-        image_path = user_settings.get_uploaded_image_path(user_id)
+        image_path = conversation.image_path
         if not image_path:
             await update.effective_message.reply_text(
                 get_translation("uploaded_image_not_found_message", language)
             )
-            user_settings.clear_awaiting_prompt(user_id)
+            conversations.reset(user_id)
             return
 
     # Prefer application-scoped service, fall back to constructing one
@@ -167,45 +160,69 @@ async def handle_prompt_text(update: Update, context: ContextTypes.DEFAULT_TYPE,
     if service is None:
         if not api_key:
             await update.effective_message.reply_text(get_translation("image_generation_not_configured_message", language))
-            user_settings.clear_awaiting_prompt(user_id)
+            conversations.reset(user_id)
             return
         service = GeminiImageService(api_key=api_key)
 
+    # Hold a credit for the duration of the API call
+    reservation = await reserve_credit(user_id, CreditKind.IMAGE)
+    if reservation is None:
+        await update.effective_message.reply_text(get_translation("insufficient_image_credits", language))
+        conversations.reset(user_id)
+        return
+
+    # The generation now owns the uploaded image and cleans it up below
+    conversations.take(user_id)
+
+    await update.effective_message.reply_text(get_translation("in_progress_message", language))
+
     tmp_dir = tempfile.mkdtemp(prefix="imagegen_")
     out_path = Path(tmp_dir) / "image.jpg"
+    committed = False
 
     try:
-        # Generate image based on mode
-        if image_path:
-            # Image-to-image generation
-            path = await asyncio.to_thread(
-                service.generate_image_from_image_and_text, image_path, text, str(out_path)
-            )
-        else:
-            # Text-only generation
-            path = await asyncio.to_thread(
-                service.generate_image_file, text, str(out_path), ratio
-            )
-
-        if path:
-            with open(path, "rb") as f:
-                await update.effective_message.reply_photo(photo=f)
+        model = IMAGE_TO_IMAGE_MODEL if image_path else service.model_name
+        key = await cache_key(model, text, None if image_path else ratio, image_path)
+
+        async def generate() -> str | None:
+            async with generation_scheduler.slot(model, user_id, on_queued=notify_queued):
+                # Generate image based on mode
+                if image_path:
+                    # Image-to-image generation
+                    return await service.generate_image_from_image_and_text_async(image_path, text, str(out_path))
+                # Text-only generation
+                return await service.generate_image_file_async(text, str(out_path), ratio)
+
+        def notify_queued(position: int):
+            return update.effective_message.reply_text(get_translation("queue_position_message", language, position=position))
+
+        # Free-text prompts are never answered from the cache: a resent prompt asks for a new variation
+        delivered = await deliver_generation(
+            key,
+            "image",
+            lambda photo: update.effective_message.reply_photo(photo=photo),
+            generate,
+            use_cache=False,
+            store=False,
+        )
 
-            # Deduct credit and send confirmation
-            if deduct_image_credit(user_id):
-                image_credits, _ = get_user_credits(user_id)
-                await update.effective_message.reply_text(
-                    get_translation("image_credit_deducted", language, remaining=image_credits)
-                )
+        if delivered:
+            # Settle the held credit and send confirmation
+            await commit_credit(reservation)
+            committed = True
+            await update.effective_message.reply_text(
+                get_translation("image_credit_deducted", language, remaining=reservation.remaining)
+            )
         else:
             await update.effective_message.reply_text(get_translation("image_generation_failed_message", language))
-    
+    except ServiceBusy as exc:
+        log.warning("Image generation for user %s rejected: %s", user_id, exc)
+        await update.effective_message.reply_text(get_translation("service_busy_message", language))
     finally:
-        # Clean up states and temporary files
-        user_settings.clear_awaiting_prompt(user_id)
-        user_settings.clear_uploaded_image_path(user_id)
-        user_settings.clear_image_mode(user_id)
-        
+        if not committed:
+            await refund_credit(reservation)
+
+        # Clean up temporary files
         try:
             paths_to_cleanup = []
             if image_path:
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import asyncio
 import logging
 import tempfile
 from pathlib import Path
@@ -8,8 +7,12 @@ from pathlib import Path
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from tg_bot.user_settings import user_settings, has_image_credits, deduct_image_credit, get_user_credits
-from tg_bot.translations import get_translation, get_prompt_by_id
+from core.database import CreditKind
+from tg_bot.user_settings import user_settings, reserve_credit, commit_credit, refund_credit
+from tg_bot.presets import presets
+from tg_bot.translations import get_translation
+from tg_bot.router import callback_router
+from tg_bot.generation_cache import cache_key, deliver_generation
 from tg_bot.keyboards import (
     prompt_presets_keyboard,
     followup_navigation_keyboard,
@@ -18,6 +21,8 @@ from tg_bot.keyboards import (
     CB_PRESET_RETRY,
 )
 from services.gemini_image import GeminiImageService
+from services.resilience import ServiceBusy
+from services.scheduler import generation_scheduler
 
 
 log = logging.getLogger(__name__)
@@ -36,54 +41,59 @@ async def show_presets(update: Update, context: ContextTypes.DEFAULT_TYPE, page:
         await context.bot.send_message(chat_id=user_id, text=message, reply_markup=keyboard)
 
 
-async def handle_preset_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+@callback_router.route(CB_PRESET_PAGE)
+async def handle_preset_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
     query = update.callback_query
     await query.answer()
     try:
-        parts = (query.data or "").split(":")
-        page_str = parts[-1]
-        page = int(page_str)
-    except Exception:
+        page = int(args[-1])
+    except (IndexError, ValueError):
         page = 0
     await show_presets(update, context, page=page, edit=True)
 
 
-async def handle_preset_select_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, api_key: str | None = None) -> None:
-    query = update.callback_query
-    await query.answer()
+def _api_key(context: ContextTypes.DEFAULT_TYPE) -> str | None:
+    cfg = context.application.bot_data.get("cfg") if context.application else None
+    return cfg.gemini_api_key if cfg else None
+
+
+@callback_router.route(CB_PRESET_SELECT)
+async def handle_preset_select_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+    await update.callback_query.answer()
+    await generate_from_preset(update, context, args[-1] if args else "")
+
 
+@callback_router.route(CB_PRESET_RETRY)
+async def handle_preset_retry_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, args: tuple[str, ...]) -> None:
+    # Offered after a failed generation; runs the same preset again, bypassing the result cache
+    await update.callback_query.answer()
+    await generate_from_preset(update, context, args[-1] if args else "", use_cache=False)
+
+
+async def generate_from_preset(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    prompt_id: str,
+    use_cache: bool = True,
+) -> None:
+    query = update.callback_query
     user_id = update.effective_user.id if update.effective_user else 0
     language = user_settings.get_language(user_id)
+    log.debug("Callback data: %s, Parsed prompt_id: %s", query.data, prompt_id)
 
-    # Parse prompt id
-    try:
-        parts = (query.data or "").split(":")
-        prompt_id = parts[-1]
-        log.debug("Callback data: %s, Parsed prompt_id: %s", query.data, prompt_id)
-    except Exception as e:
-        log.exception("Failed to parse prompt_id from callback data: %s", query.data)
-        prompt_id = ""
-
-    prompt_text = get_prompt_by_id(prompt_id, language)
+    prompt_text = presets.prompt(prompt_id, language)
     log.debug("Prompt ID: %s, Language: %s, Prompt text: %r", prompt_id, language, prompt_text)
     if not prompt_text:
         log.warning("No prompt found for ID: %s, language: %s", prompt_id, language)
         await query.edit_message_text(get_translation("image_generation_failed_message", language))
         return
 
-    # Check if user has image credits
-    if not has_image_credits(user_id):
-        await query.edit_message_text(get_translation("insufficient_image_credits", language))
-        return
-
-    # Indicate progress
-    await query.edit_message_text(get_translation("in_progress_message", language))
-
     ratio = user_settings.get_ratio(user_id).value
 
     # Prefer application-scoped service
     service: GeminiImageService | None = context.application.bot_data.get("gemini_service") if context.application else None
     if service is None:
+        api_key = _api_key(context)
         if not api_key:
             await context.bot.send_message(
                 chat_id=user_id,
@@ -92,22 +102,45 @@ async def handle_preset_select_callback(update: Update, context: ContextTypes.DE
             return
         service = GeminiImageService(api_key=api_key)
 
+    # Hold a credit for the duration of the API call
+    reservation = await reserve_credit(user_id, CreditKind.IMAGE)
+    if reservation is None:
+        await query.edit_message_text(get_translation("insufficient_image_credits", language))
+        return
+
+    # Indicate progress
+    await query.edit_message_text(get_translation("in_progress_message", language))
+
     tmp_dir = tempfile.mkdtemp(prefix="imagegen_preset_")
     out_path = Path(tmp_dir) / "image.jpg"
+    committed = False
 
     try:
-        path = await asyncio.to_thread(service.generate_image_file, prompt_text, str(out_path), ratio)
-        if path:
-            with open(path, "rb") as f:
-                await context.bot.send_photo(chat_id=user_id, photo=f)
-
-            # Deduct credit and send confirmation
-            if deduct_image_credit(user_id):
-                image_credits, _ = get_user_credits(user_id)
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=get_translation("image_credit_deducted", language, remaining=image_credits)
-                )
+        async def generate() -> str | None:
+            async with generation_scheduler.slot(service.model_name, user_id, on_queued=notify_queued):
+                return await service.generate_image_file_async(prompt_text, str(out_path), ratio)
+
+        def notify_queued(position: int):
+            return context.bot.send_message(
+                chat_id=user_id, text=get_translation("queue_position_message", language, position=position)
+            )
+
+        delivered = await deliver_generation(
+            await cache_key(service.model_name, prompt_text, ratio),
+            "image",
+            lambda photo: context.bot.send_photo(chat_id=user_id, photo=photo),
+            generate,
+            use_cache=use_cache,
+        )
+
+        if delivered:
+            # Settle the held credit and send confirmation
+            await commit_credit(reservation)
+            committed = True
+            await context.bot.send_message(
+                chat_id=user_id,
+                text=get_translation("image_credit_deducted", language, remaining=reservation.remaining)
+            )
 
             # Follow-up navigation
             followup_text = get_translation("image_generated_followup", language)
@@ -128,17 +161,24 @@ async def handle_preset_select_callback(update: Update, context: ContextTypes.DE
                 reply_markup=retry_kb,
             )
     except Exception as exc:
-        log.exception("Preset generation failed: %s", exc)
+        if isinstance(exc, ServiceBusy):
+            log.warning("Preset generation for user %s rejected: %s", user_id, exc)
+            message_key = "service_busy_message"
+        else:
+            log.exception("Preset generation failed: %s", exc)
+            message_key = "image_generation_failed_message"
         retry_kb = InlineKeyboardMarkup([
             [InlineKeyboardButton(text=get_translation("retry_button", language), callback_data=f"{CB_PRESET_RETRY}:{prompt_id}")],
             [InlineKeyboardButton(text=get_translation("browse_presets_button", language), callback_data=f"{CB_PRESET_PAGE}:0")],
         ])
         await context.bot.send_message(
             chat_id=user_id,
-            text=get_translation("image_generation_failed_message", language),
+            text=get_translation(message_key, language),
             reply_markup=retry_kb,
         )
     finally:
+        if not committed:
+            await refund_credit(reservation)
         try:
             if out_path.exists():
                 out_path.unlink()
@@ -149,19 +189,3 @@ async def handle_preset_select_callback(update: Update, context: ContextTypes.DE
                     pass
         except Exception:
             log.debug("Failed to cleanup preset temp files", exc_info=True)
-
-
-async def handle_preset_retry_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, api_key: str | None = None) -> None:
-    # Re-route to the select handler with same prompt id
-    query = update.callback_query
-    await query.answer()
-    # Convert retry:ID to select:ID and reuse logic
-    try:
-        parts = (query.data or "").split(":")
-        prompt_id = parts[-1]
-    except Exception:
-        prompt_id = ""
-    query.data = f"{CB_PRESET_SELECT}:{prompt_id}"
-    await handle_preset_select_callback(update, context, api_key=api_key)
-
-
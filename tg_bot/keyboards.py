@@ -1,6 +1,10 @@
+import functools
+from dataclasses import dataclass
+
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from tg_bot.user_settings import AspectRatio, VideoAspectRatio, Language, user_settings
-from tg_bot.translations import get_translation, get_prompt_presets
+from tg_bot.presets import DEFAULT_PAGE_SIZE, presets
+from tg_bot.translations import add_catalog_listener, get_translation
 
 
 BTN_IMAGE = "🖼 Create Image"
@@ -37,11 +41,71 @@ MAIN_BUTTONS = [
     BTN_TOP_UP,
 ]
 
+# Localized label in any language -> main-menu button key. Built on first use,
+# since it has to read every language's bundle.
+@functools.lru_cache(maxsize=1)
+def _button_index() -> dict[str, str]:
+    index = {}
+    for button in MAIN_BUTTONS:
+        for language in Language:
+            index[get_translation(button, language).strip()] = button
+    return index
+
+
+def button_for_text(text: str) -> str | None:
+    """Main-menu button whose label (in any language) is ``text``, if any."""
+    return _button_index().get(text.strip())
+
+
+add_catalog_listener(_button_index.cache_clear)
+
+
+_keyboard_builders: list = []
+
+
+def _cached_keyboard(builder):
+    """Memoize a keyboard builder; markups are frozen by PTB, so one instance is shared."""
+    cached = functools.lru_cache(maxsize=256)(builder)
+    _keyboard_builders.append(cached)
+    return cached
+
+
+def clear_keyboard_cache() -> None:
+    """Drop cached keyboards, e.g. after translations or presets change."""
+    for builder in _keyboard_builders:
+        builder.cache_clear()
+
+
+@dataclass(frozen=True)
+class KeyboardCacheStats:
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
+
+def keyboard_cache_info() -> dict[str, KeyboardCacheStats]:
+    """Hit/miss counts of each memoized keyboard builder, by builder name."""
+    stats = {}
+    for builder in _keyboard_builders:
+        info = builder.cache_info()
+        stats[builder.__wrapped__.__name__] = KeyboardCacheStats(
+            hits=info.hits, misses=info.misses, size=info.currsize, maxsize=info.maxsize
+        )
+    return stats
+
+
+add_catalog_listener(clear_keyboard_cache)
+presets.add_listener(clear_keyboard_cache)
+
 
 def main_menu_keyboard(user_id: int) -> ReplyKeyboardMarkup:
     """Creates the main menu keyboard with translated button texts."""
-    language = user_settings.get_language(user_id)
+    return _main_menu(user_settings.get_language(user_id))
 
+
+@_cached_keyboard
+def _main_menu(language: Language) -> ReplyKeyboardMarkup:
     buttons = [
         [KeyboardButton(get_translation(BTN_IMAGE, language)), KeyboardButton(get_translation(BTN_VIDEO, language))],
         [KeyboardButton(get_translation(BTN_BALANCE, language)), KeyboardButton(get_translation(BTN_HELP, language))],
@@ -53,7 +117,11 @@ def main_menu_keyboard(user_id: int) -> ReplyKeyboardMarkup:
 
 def image_aspect_ratio_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """Keyboard for selecting image aspect ratio with a translated back button."""
-    language = user_settings.get_language(user_id)
+    return _image_ratio_menu(user_settings.get_language(user_id))
+
+
+@_cached_keyboard
+def _image_ratio_menu(language: Language) -> InlineKeyboardMarkup:
     rows = []
     for ratio in AspectRatio:
         rows.append([
@@ -66,7 +134,11 @@ def image_aspect_ratio_keyboard(user_id: int) -> InlineKeyboardMarkup:
 
 def video_aspect_ratio_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """Keyboard for selecting video aspect ratio with a translated back button."""
-    language = user_settings.get_language(user_id)
+    return _video_ratio_menu(user_settings.get_language(user_id))
+
+
+@_cached_keyboard
+def _video_ratio_menu(language: Language) -> InlineKeyboardMarkup:
     rows = []
     for ratio in VideoAspectRatio:
         rows.append([
@@ -79,25 +151,33 @@ def video_aspect_ratio_keyboard(user_id: int) -> InlineKeyboardMarkup:
 
 def settings_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """Main settings menu with options to choose what to configure."""
-    img_ratio = user_settings.get_ratio(user_id).value
-    video_ratio = user_settings.get_video_ratio(user_id).value
-    language = user_settings.get_language(user_id)
-    current_language_display = language.value
+    return _settings_menu(
+        user_settings.get_language(user_id),
+        user_settings.get_ratio(user_id),
+        user_settings.get_video_ratio(user_id),
+    )
 
+
+@_cached_keyboard
+def _settings_menu(language: Language, img_ratio: AspectRatio, video_ratio: VideoAspectRatio) -> InlineKeyboardMarkup:
     img_ratio_text = get_translation("📐 Image Aspect Ratio", language)
     video_ratio_text = get_translation("🎞️ Video Aspect Ratio", language)
     language_text = get_translation("🌐 Language", language)
 
     return InlineKeyboardMarkup([
-        [InlineKeyboardButton(text=f"{img_ratio_text} ({img_ratio})", callback_data=CB_SETTINGS_IMAGE_RATIO)],
-        [InlineKeyboardButton(text=f"{video_ratio_text} ({video_ratio})", callback_data=CB_SETTINGS_VIDEO_RATIO)],
-        [InlineKeyboardButton(text=f"{language_text} ({current_language_display})", callback_data=CB_SETTINGS_LANGUAGE)]
+        [InlineKeyboardButton(text=f"{img_ratio_text} ({img_ratio.value})", callback_data=CB_SETTINGS_IMAGE_RATIO)],
+        [InlineKeyboardButton(text=f"{video_ratio_text} ({video_ratio.value})", callback_data=CB_SETTINGS_VIDEO_RATIO)],
+        [InlineKeyboardButton(text=f"{language_text} ({language.value})", callback_data=CB_SETTINGS_LANGUAGE)]
     ])
 
 
 def language_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """Keyboard for selecting language with a translated back button."""
-    language = user_settings.get_language(user_id)
+    return _language_menu(user_settings.get_language(user_id))
+
+
+@_cached_keyboard
+def _language_menu(language: Language) -> InlineKeyboardMarkup:
     rows = []
     for lang in Language:
         rows.append([
@@ -109,6 +189,7 @@ def language_keyboard(user_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(rows)
 
 
+@_cached_keyboard
 def welcome_language_keyboard() -> InlineKeyboardMarkup:
     """Creates the welcome language selection keyboard."""
     rows = []
@@ -119,25 +200,27 @@ def welcome_language_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(rows)
 
 
-def prompt_presets_keyboard(user_id: int, page: int = 0, page_size: int = 5) -> InlineKeyboardMarkup:
+def prompt_presets_keyboard(user_id: int, page: int = 0, page_size: int = DEFAULT_PAGE_SIZE) -> InlineKeyboardMarkup:
     """Inline keyboard for browsing/selecting image prompt presets with pagination."""
-    language = user_settings.get_language(user_id)
-    presets = get_prompt_presets(language)
-    total = len(presets)
     if page_size <= 0:
-        page_size = 5
-    max_page = (total - 1) // page_size if total else 0
-    page = max(0, min(page, max_page))
+        page_size = DEFAULT_PAGE_SIZE
+    language = user_settings.get_language(user_id)
+    # Clamp before caching so out-of-range pages share the last page's markup
+    page = presets.page(language, page, page_size).page
+    return _presets_menu(language, page, page_size)
+
 
-    start = page * page_size
-    end = min(start + page_size, total)
+@_cached_keyboard
+def _presets_menu(language: Language, page: int, page_size: int) -> InlineKeyboardMarkup:
+    preset_page = presets.page(language, page, page_size)
+    max_page = preset_page.max_page
 
     rows = []
-    for item in presets[start:end]:
+    for preset_id, label in preset_page.items:
         rows.append([
             InlineKeyboardButton(
-                text=item["label"],
-                callback_data=f"{CB_PRESET_SELECT}:{item['id']}"
+                text=label,
+                callback_data=f"{CB_PRESET_SELECT}:{preset_id}"
             )
         ])
 
@@ -157,9 +240,12 @@ def prompt_presets_keyboard(user_id: int, page: int = 0, page_size: int = 5) ->
 
 def followup_navigation_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """Inline keyboard for quick navigation after an operation completes."""
-    language = user_settings.get_language(user_id)
+    return _followup_menu(user_settings.get_language(user_id))
+
+
+@_cached_keyboard
+def _followup_menu(language: Language) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([
         [InlineKeyboardButton(text=get_translation(BTN_VIDEO, language), callback_data=CB_NAV_VIDEO)],
         [InlineKeyboardButton(text=get_translation(BTN_IMAGE, language), callback_data=CB_NAV_IMAGE)],
     ])
-
@@ -0,0 +1,123 @@
+"""Image prompt presets, loaded from ``tg_bot/data/presets.json``.
+
+The file is a list of ``{"id", "label": {language: text}, "prompt": {language: text}}``
+objects in display order; languages missing from an entry fall back to English.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from tg_bot.user_settings import Language
+
+log = logging.getLogger(__name__)
+
+PRESETS_PATH = Path(__file__).parent / "data" / "presets.json"
+DEFAULT_PAGE_SIZE = 5
+
+
+@dataclass(frozen=True, slots=True)
+class Preset:
+    id: str
+    labels: Dict[Language, str]
+    prompts: Dict[Language, str]
+
+    def label(self, language: Language) -> str:
+        return self.labels.get(language) or self.labels[Language.ENGLISH]
+
+    def prompt(self, language: Language) -> str:
+        return self.prompts.get(language) or self.prompts[Language.ENGLISH]
+
+
+@dataclass(frozen=True, slots=True)
+class PresetPage:
+    # (preset id, localized label) for each button on the page
+    items: Tuple[Tuple[str, str], ...]
+    page: int
+    max_page: int
+
+
+def _by_language(raw: dict, field: str, preset_id: str) -> Dict[Language, str]:
+    values = {Language(name): text for name, text in raw.get(field, {}).items()}
+    if Language.ENGLISH not in values:
+        raise ValueError(f"Preset {preset_id!r} has no English {field}")
+    return values
+
+
+class PresetRegistry:
+    """Presets indexed by id, with page slices precomputed per language and page size."""
+
+    def __init__(self, presets: List[Preset]) -> None:
+        self._listeners: List[Callable[[], None]] = []
+        self._set(presets)
+
+    @classmethod
+    def from_file(cls, path: Path = PRESETS_PATH) -> PresetRegistry:
+        return cls(cls._read(path))
+
+    @staticmethod
+    def _read(path: Path) -> List[Preset]:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        presets = []
+        for item in raw:
+            preset_id = item["id"]
+            presets.append(Preset(
+                id=preset_id,
+                labels=_by_language(item, "label", preset_id),
+                prompts=_by_language(item, "prompt", preset_id),
+            ))
+        return presets
+
+    def _set(self, presets: List[Preset]) -> None:
+        by_id = {preset.id: preset for preset in presets}
+        if len(by_id) != len(presets):
+            raise ValueError("Duplicate preset ids")
+        self._order = tuple(presets)
+        self._by_id = by_id
+        self._pages: Dict[Tuple[Language, int], Tuple[PresetPage, ...]] = {}
+        for language in Language:
+            self._paginate(language, DEFAULT_PAGE_SIZE)
+
+    def reload(self, path: Path = PRESETS_PATH) -> None:
+        """Re-read the data file and notify listeners (e.g. the keyboard cache)."""
+        self._set(self._read(path))
+        log.info("Loaded %d prompt presets", len(self._order))
+        for listener in self._listeners:
+            listener()
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        self._listeners.append(listener)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def get(self, preset_id: str) -> Preset | None:
+        return self._by_id.get(preset_id)
+
+    def prompt(self, preset_id: str, language: Language) -> str | None:
+        preset = self._by_id.get(preset_id)
+        return preset.prompt(language) if preset else None
+
+    def _paginate(self, language: Language, page_size: int) -> Tuple[PresetPage, ...]:
+        items = [(preset.id, preset.label(language)) for preset in self._order]
+        max_page = (len(items) - 1) // page_size if items else 0
+        pages = tuple(
+            PresetPage(tuple(items[n * page_size:(n + 1) * page_size]), n, max_page)
+            for n in range(max_page + 1)
+        )
+        self._pages[(language, page_size)] = pages
+        return pages
+
+    def page(self, language: Language, page: int, page_size: int = DEFAULT_PAGE_SIZE) -> PresetPage:
+        """One page of presets; out-of-range page numbers are clamped."""
+        pages = self._pages.get((language, page_size)) or self._paginate(language, page_size)
+        return pages[max(0, min(page, len(pages) - 1))]
+
+
+# Single shared registry
+presets = PresetRegistry.from_file()
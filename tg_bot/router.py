@@ -0,0 +1,118 @@
+"""Callback-query routing.
+
+Callback data is a ``:``-separated path such as ``preset:select:<id>``. Handlers
+register the prefix they own (``preset:select``) and receive the remaining
+segments as ``args``. Routes live in a trie keyed on whole segments, so a press
+costs one dict lookup per segment of its own prefix, however many routes exist.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+log = logging.getLogger(__name__)
+
+SEPARATOR = ":"
+
+CallbackHandler = Callable[[Update, ContextTypes.DEFAULT_TYPE, Tuple[str, ...]], Awaitable[None]]
+
+
+@dataclass(slots=True)
+class RouteStats:
+    calls: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_seconds / self.calls * 1e3 if self.calls else 0.0
+
+
+class _Node:
+    __slots__ = ("children", "prefix", "handler")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _Node] = {}
+        self.prefix: Optional[str] = None
+        self.handler: Optional[CallbackHandler] = None
+
+
+class CallbackRouter:
+    """Dispatches callback data to the handler with the longest matching prefix."""
+
+    def __init__(self) -> None:
+        self._root = _Node()
+        self._stats: Dict[str, RouteStats] = {}
+        self.unmatched = 0
+
+    def add(self, prefix: str, handler: CallbackHandler) -> None:
+        prefix = prefix.rstrip(SEPARATOR)
+        node = self._root
+        for segment in prefix.split(SEPARATOR):
+            node = node.children.setdefault(segment, _Node())
+        if node.handler is not None:
+            raise ValueError(f"Callback prefix {prefix!r} is already routed")
+        node.prefix = prefix
+        node.handler = handler
+        self._stats[prefix] = RouteStats()
+
+    def route(self, prefix: str) -> Callable[[CallbackHandler], CallbackHandler]:
+        """Decorator form of ``add``."""
+        def register(handler: CallbackHandler) -> CallbackHandler:
+            self.add(prefix, handler)
+            return handler
+        return register
+
+    def resolve(self, data: str) -> Tuple[str, CallbackHandler, Tuple[str, ...]] | None:
+        """The (prefix, handler, remaining segments) that ``data`` routes to, if any."""
+        segments = data.split(SEPARATOR)
+        node = self._root
+        match = None
+        for depth, segment in enumerate(segments):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.handler is not None:
+                match = (node.prefix, node.handler, depth + 1)
+        if match is None:
+            return None
+        prefix, handler, consumed = match
+        return prefix, handler, tuple(segments[consumed:])
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE, data: str) -> bool:
+        """Run the handler for ``data``. Returns False if no route matches."""
+        resolved = self.resolve(data)
+        if resolved is None:
+            self.unmatched += 1
+            log.debug("No route for callback data %r", data)
+            return False
+        prefix, handler, args = resolved
+        stats = self._stats[prefix]
+        start = time.perf_counter()
+        try:
+            await handler(update, context, args)
+        except BaseException:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.calls += 1
+            stats.total_seconds += elapsed
+            if elapsed > stats.max_seconds:
+                stats.max_seconds = elapsed
+        return True
+
+    def stats(self) -> Dict[str, RouteStats]:
+        """Per-prefix counters, busiest route first."""
+        return dict(sorted(self._stats.items(), key=lambda item: item[1].calls, reverse=True))
+
+
+# Routes are registered by the modules that handle them
+callback_router = CallbackRouter()
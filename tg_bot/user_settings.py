@@ -1,11 +1,52 @@
 from __future__ import annotations
 
-import sqlite3
+import asyncio
+import functools
+import logging
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, TypeVar
 
-from core.database import bot_db
+from core.database import CreditKind, CreditReservation, async_bot_db, bot_db
+from core.utils.cache import CacheStats, LRUCache
+
+if TYPE_CHECKING:
+    from core.utils.config import AppConfig
+
+log = logging.getLogger(__name__)
+
+HandlerT = TypeVar("HandlerT", bound=Callable[..., Awaitable[Any]])
+
+PreferenceRow = tuple[str, str, str]
+
+# Preference rows already fetched while handling the current update
+_update_memo: ContextVar[dict[int, PreferenceRow | None] | None] = ContextVar("_update_memo", default=None)
+
+
+def memoize_per_update(handler: HandlerT) -> HandlerT:
+    """Fetch each user's preferences from the database at most once per update."""
+
+    @functools.wraps(handler)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        memo: dict[int, PreferenceRow | None] = {}
+        token = _update_memo.set(memo)
+        try:
+            return await handler(*args, **kwargs)
+        finally:
+            _update_memo.reset(token)
+            # Background tasks spawned by the handler inherit the context
+            memo.clear()
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
 
 
 class AspectRatio(str, Enum):
@@ -44,37 +85,94 @@ def detect_language_from_telegram(language_code: str) -> Language:
     return language_map.get(language_code.lower(), language_map.get(base_code, Language.ENGLISH))
 
 
-@dataclass
+@dataclass(slots=True)
 class UserPreference:
     aspect_ratio: AspectRatio = AspectRatio.RATIO_9_16
     video_aspect_ratio: VideoAspectRatio = VideoAspectRatio.RATIO_9_16
     language: Language = Language.ENGLISH
-    uploaded_image_path: Optional[str] = None
-    video_mode_text_only: bool = False
-    image_mode_text_only: bool = True  # Default to text-only for image generation
+
+
+_DEFAULTS = UserPreference()
+
+# Idle users are dropped and reloaded from the database on their next message
+PREFERENCE_CACHE_SIZE = 50_000
+PREFERENCE_CACHE_TTL_SECONDS = 60 * 60
+# Users with no database row yet; creating the user clears the entry early
+MISSING_USER_CACHE_SIZE = 10_000
+MISSING_USER_TTL_SECONDS = 60
 
 
 @dataclass
 class UserSettings:
-    _store: Dict[int, UserPreference] = field(default_factory=dict)
-    _awaiting_prompt_users: set[int] = field(default_factory=set)
-    _awaiting_video_prompt_users: set[int] = field(default_factory=set)
-    _awaiting_image_upload_users: set[int] = field(default_factory=set)
-    _awaiting_video_choice_users: set[int] = field(default_factory=set)
-    _awaiting_image_choice_users: set[int] = field(default_factory=set)
-    _awaiting_image_upload_for_image_gen_users: set[int] = field(default_factory=set)
+    _store: LRUCache[int, UserPreference] = field(
+        default_factory=lambda: LRUCache(PREFERENCE_CACHE_SIZE, PREFERENCE_CACHE_TTL_SECONDS)
+    )
+    _missing: LRUCache[int, bool] = field(
+        default_factory=lambda: LRUCache(MISSING_USER_CACHE_SIZE, MISSING_USER_TTL_SECONDS)
+    )
+    # Background reloads of evicted users, by user_id
+    _reloads: dict[int, asyncio.Task] = field(default_factory=dict)
+
+    def configure(self, cfg: AppConfig) -> None:
+        """Apply cache sizing from application config."""
+        self._store.resize(cfg.pref_cache_size, cfg.pref_cache_ttl_seconds)
+
+    def cache_stats(self) -> CacheStats:
+        """Size, hit rate and evictions of the preference cache."""
+        return self._store.stats()
+
+    def missing_cache_stats(self) -> CacheStats:
+        """Stats of the negative cache for users without a database row."""
+        return self._missing.stats()
+
+    def forget_missing(self, user_id: int) -> None:
+        """Drop a cached "no such user" result, e.g. once the user is created."""
+        self._missing.pop(user_id)
+
+    def _known_missing(self, user_id: int) -> bool:
+        memo = _update_memo.get()
+        if memo is not None and user_id in memo:
+            self.apply_preferences(user_id, memo[user_id])
+            return True
+        return self._missing.get(user_id) is not None
+
+    def _loaded(self, user_id: int, user_data: PreferenceRow | None) -> None:
+        memo = _update_memo.get()
+        if memo is not None:
+            memo[user_id] = user_data
+        if user_data:
+            self.apply_preferences(user_id, user_data)
+        else:
+            self._missing.put(user_id, True)
 
     def sync_from_db(self, user_id: int) -> None:
         """Ensure in-memory preferences reflect the database record."""
+        if self._known_missing(user_id):
+            return
         try:
             user_data = bot_db.get_user_preferences(user_id)
-            if not user_data:
-                return
+        except Exception:
+            # Fail silently to avoid crashing the bot; defaults will be used instead.
+            return
+        self._loaded(user_id, user_data)
+
+    async def preload(self, user_id: int) -> None:
+        """Load preferences without blocking the event loop if not already cached."""
+        if user_id in self._store or self._known_missing(user_id):
+            return
+        try:
+            user_data = await async_bot_db.get_user_preferences(user_id)
+        except Exception:
+            return
+        self._loaded(user_id, user_data)
+
+    def apply_preferences(self, user_id: int, user_data: PreferenceRow | None) -> None:
+        """Apply a (language, image_ratio, video_ratio) database row to the in-memory store."""
+        if not user_data:
+            return
+        try:
             language_value, ratio_value, video_ratio_value = user_data
-            pref = self._store.get(user_id)
-            if pref is None:
-                pref = UserPreference()
-                self._store[user_id] = pref
+            pref = self._entry(user_id)
             if ratio_value:
                 pref.aspect_ratio = AspectRatio(ratio_value)
             if video_ratio_value:
@@ -82,101 +180,117 @@ class UserSettings:
             if language_value:
                 pref.language = Language(language_value)
         except Exception:
-            # Fail silently to avoid crashing the bot; defaults will be used instead.
+            # Ignore malformed rows; defaults will be used instead.
             pass
 
-    def persist_ratio(self, user_id: int) -> None:
+    def _lookup(self, user_id: int) -> UserPreference | None:
+        """Cached preferences. A miss reads the database only off the event loop."""
         pref = self._store.get(user_id)
-        if not pref:
+        if pref is None:
+            if _on_event_loop():
+                # Picks up a row already fetched during this update
+                self._known_missing(user_id)
+            else:
+                self.sync_from_db(user_id)
+            pref = self._store.get(user_id)
+        return pref
+
+    def _reload_soon(self, user_id: int) -> None:
+        if user_id in self._reloads:
             return
+        task = asyncio.get_running_loop().create_task(self.preload(user_id))
+        self._reloads[user_id] = task
+        task.add_done_callback(lambda _: self._reloads.pop(user_id, None))
+
+    def _load(self, user_id: int) -> UserPreference | None:
+        """Cached preferences.
+
+        Handlers ``preload()`` first, so a miss on the event loop is rare (an
+        eviction mid-update, or a background task): it returns None, meaning
+        defaults, and reloads the row in the background instead of blocking.
+        """
+        pref = self._lookup(user_id)
+        if pref is None and _on_event_loop() and not self._known_missing(user_id):
+            self._reload_soon(user_id)
+        return pref
+
+    def _entry(self, user_id: int) -> UserPreference:
+        """Cached preferences, creating a default entry if there is none."""
+        pref = self._store.get(user_id)
+        if pref is None:
+            pref = UserPreference()
+            self._store.put(user_id, pref)
+            self._missing.pop(user_id)
+        return pref
+
+    def _ensure(self, user_id: int) -> UserPreference:
+        """Preferences about to be changed; callers persist only the field they change.
+
+        A user evicted from the cache gets an uncached default entry on the
+        event loop, so defaults never shadow their stored row; their next
+        ``preload()`` reads it back, change included.
+        """
+        pref = self._lookup(user_id)
+        if pref is not None:
+            return pref
+        if not _on_event_loop() or self._known_missing(user_id):
+            # No row yet
+            return self._entry(user_id)
+        return UserPreference()
+
+    def persist_ratio(self, user_id: int, image_ratio: str | None = None, video_ratio: str | None = None) -> None:
+        """Queue a write of the given ratios; a ratio left as None keeps its stored value."""
         try:
             bot_db.update_user_aspect_ratios(
                 user_id=user_id,
-                image_ratio=pref.aspect_ratio.value,
-                video_ratio=pref.video_aspect_ratio.value,
+                image_ratio=image_ratio,
+                video_ratio=video_ratio,
+                wait=False,
             )
         except Exception:
             pass
 
-    def persist_language(self, user_id: int) -> None:
-        pref = self._store.get(user_id)
-        if not pref:
-            return
+    def persist_language(self, user_id: int, language: Language) -> None:
         try:
             bot_db.update_user_language(
                 user_id=user_id,
-                language=pref.language.value,
+                language=language.value,
+                wait=False,
             )
         except Exception:
             pass
 
     def get_ratio(self, user_id: int) -> AspectRatio:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self.sync_from_db(user_id)
-            pref = self._store.get(user_id)
-            if pref is None:
-                pref = UserPreference()
-                self._store[user_id] = pref
-        return pref.aspect_ratio
+        pref = self._load(user_id)
+        return pref.aspect_ratio if pref else _DEFAULTS.aspect_ratio
 
     def get_video_ratio(self, user_id: int) -> VideoAspectRatio:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self.sync_from_db(user_id)
-            pref = self._store.get(user_id)
-            if pref is None:
-                pref = UserPreference()
-                self._store[user_id] = pref
-        return pref.video_aspect_ratio
+        pref = self._load(user_id)
+        return pref.video_aspect_ratio if pref else _DEFAULTS.video_aspect_ratio
 
     def set_ratio(self, user_id: int, ratio: AspectRatio) -> None:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self._store[user_id] = UserPreference(aspect_ratio=ratio)
-        else:
-            pref.aspect_ratio = ratio
-
-        self.persist_ratio(user_id)
+        self._ensure(user_id).aspect_ratio = ratio
+        self.persist_ratio(user_id, image_ratio=ratio.value)
 
     def set_video_ratio(self, user_id: int, ratio: VideoAspectRatio) -> None:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self._store[user_id] = UserPreference(video_aspect_ratio=ratio)
-        else:
-            pref.video_aspect_ratio = ratio
-
-        self.persist_ratio(user_id)
+        self._ensure(user_id).video_aspect_ratio = ratio
+        self.persist_ratio(user_id, video_ratio=ratio.value)
 
     def has_ratio(self, user_id: int) -> bool:
         return user_id in self._store
 
     def is_new_user(self, user_id: int) -> bool:
         """Check if this is a new user who hasn't interacted with the bot before."""
-        pref = self._store.get(user_id)
-        if pref is None:
-            self.sync_from_db(user_id)
-            pref = self._store.get(user_id)
-        return pref is None
+        return self._load(user_id) is None
 
     def get_language(self, user_id: int) -> Language:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self.sync_from_db(user_id)
-            pref = self._store.get(user_id)
-            if pref is None:
-                pref = UserPreference()
-                self._store[user_id] = pref
-        return pref.language
+        # Unknown users get the default without being cached
+        pref = self._load(user_id)
+        return pref.language if pref else _DEFAULTS.language
 
     def set_language(self, user_id: int, language: Language) -> None:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self._store[user_id] = UserPreference(language=language)
-        else:
-            pref.language = language
-
-        self.persist_language(user_id)
+        self._ensure(user_id).language = language
+        self.persist_language(user_id, language)
 
     def auto_detect_and_set_language(self, user_id: int, telegram_language_code: str) -> None:
         """Auto-detect user's language from Telegram and set it if not already set."""
@@ -184,204 +298,53 @@ class UserSettings:
         if pref is None:
             # New user - detect language from Telegram
             detected_language = detect_language_from_telegram(telegram_language_code)
-            self._store[user_id] = UserPreference(language=detected_language)
+            self._store.put(user_id, UserPreference(language=detected_language))
+            self._missing.pop(user_id)
         # If user already exists, don't override their manual language choice
 
-    # Prompt awaiting state for images
-    def is_awaiting_prompt(self, user_id: int) -> bool:
-        return user_id in self._awaiting_prompt_users
-
-    def set_awaiting_prompt(self, user_id: int) -> None:
-        self._awaiting_prompt_users.add(user_id)
-
-    def clear_awaiting_prompt(self, user_id: int) -> None:
-        self._awaiting_prompt_users.discard(user_id)
-
-    # Video generation state
-    def is_awaiting_video_prompt(self, user_id: int) -> bool:
-        return user_id in self._awaiting_video_prompt_users
-
-    def set_awaiting_video_prompt(self, user_id: int) -> None:
-        self._awaiting_video_prompt_users.add(user_id)
-
-    def clear_awaiting_video_prompt(self, user_id: int) -> None:
-        self._awaiting_video_prompt_users.discard(user_id)
-
-    # Image upload state for video generation
-    def is_awaiting_image_upload(self, user_id: int) -> bool:
-        return user_id in self._awaiting_image_upload_users
-
-    def set_awaiting_image_upload(self, user_id: int) -> None:
-        self._awaiting_image_upload_users.add(user_id)
-
-    def clear_awaiting_image_upload(self, user_id: int) -> None:
-        self._awaiting_image_upload_users.discard(user_id)
-
-    # Uploaded image management
-    def set_uploaded_image_path(self, user_id: int, image_path: str) -> None:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self._store[user_id] = UserPreference(uploaded_image_path=image_path)
-        else:
-            pref.uploaded_image_path = image_path
-
-    def get_uploaded_image_path(self, user_id: int) -> Optional[str]:
-        pref = self._store.get(user_id)
-        return pref.uploaded_image_path if pref else None
-
-    def clear_uploaded_image_path(self, user_id: int) -> None:
-        pref = self._store.get(user_id)
-        if pref:
-            pref.uploaded_image_path = None
-
-    # Video choice state
-    def is_awaiting_video_choice(self, user_id: int) -> bool:
-        return user_id in self._awaiting_video_choice_users
-
-    def set_awaiting_video_choice(self, user_id: int) -> None:
-        self._awaiting_video_choice_users.add(user_id)
-
-    def clear_awaiting_video_choice(self, user_id: int) -> None:
-        self._awaiting_video_choice_users.discard(user_id)
-
-    # Video mode management
-    def set_video_mode_text_only(self, user_id: int) -> None:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self._store[user_id] = UserPreference(video_mode_text_only=True)
-        else:
-            pref.video_mode_text_only = True
-
-    def set_video_mode_with_image(self, user_id: int) -> None:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self._store[user_id] = UserPreference(video_mode_text_only=False)
-        else:
-            pref.video_mode_text_only = False
-
-    def is_video_mode_text_only(self, user_id: int) -> bool:
-        pref = self._store.get(user_id)
-        return pref.video_mode_text_only if pref else False
-
-    def clear_video_mode(self, user_id: int) -> None:
-        pref = self._store.get(user_id)
-        if pref:
-            pref.video_mode_text_only = False
-
-    # Image choice state (similar to video choice)
-    def is_awaiting_image_choice(self, user_id: int) -> bool:
-        return user_id in self._awaiting_image_choice_users
-
-    def set_awaiting_image_choice(self, user_id: int) -> None:
-        self._awaiting_image_choice_users.add(user_id)
-
-    def clear_awaiting_image_choice(self, user_id: int) -> None:
-        self._awaiting_image_choice_users.discard(user_id)
-
-    # Image upload state for image-to-image generation (separate from video)
-    def is_awaiting_image_upload_for_image_gen(self, user_id: int) -> bool:
-        return user_id in self._awaiting_image_upload_for_image_gen_users
-
-    def set_awaiting_image_upload_for_image_gen(self, user_id: int) -> None:
-        self._awaiting_image_upload_for_image_gen_users.add(user_id)
-
-    def clear_awaiting_image_upload_for_image_gen(self, user_id: int) -> None:
-        self._awaiting_image_upload_for_image_gen_users.discard(user_id)
-
-    # Image mode management
-    def set_image_mode_text_only(self, user_id: int) -> None:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self._store[user_id] = UserPreference(image_mode_text_only=True)
-        else:
-            pref.image_mode_text_only = True
-
-    def set_image_mode_with_image(self, user_id: int) -> None:
-        pref = self._store.get(user_id)
-        if pref is None:
-            self._store[user_id] = UserPreference(image_mode_text_only=False)
-        else:
-            pref.image_mode_text_only = False
-
-    def is_image_mode_text_only(self, user_id: int) -> bool:
-        pref = self._store.get(user_id)
-        return pref.image_mode_text_only if pref else True  # Default to text-only
-
-    def clear_image_mode(self, user_id: int) -> None:
-        pref = self._store.get(user_id)
-        if pref:
-            pref.image_mode_text_only = True  # Reset to default
-
 
 # Credit management functions
-def get_user_credits(user_id: int) -> tuple[int, int]:
+async def get_user_credits(user_id: int) -> tuple[int, int]:
     """Get user's image and video credits from database."""
-    return bot_db.get_user_credits(user_id)
+    return await async_bot_db.get_user_credits(user_id)
 
 
-def has_image_credits(user_id: int) -> bool:
+async def has_image_credits(user_id: int) -> bool:
     """Check if user has image credits available."""
-    image_credits, _ = get_user_credits(user_id)
+    image_credits, _ = await get_user_credits(user_id)
     return image_credits > 0
 
 
-def has_video_credits(user_id: int) -> bool:
+async def has_video_credits(user_id: int) -> bool:
     """Check if user has video credits available."""
-    _, video_credits = get_user_credits(user_id)
+    _, video_credits = await get_user_credits(user_id)
     return video_credits > 0
 
 
-def deduct_image_credit(user_id: int) -> bool:
+async def deduct_image_credit(user_id: int) -> bool:
     """Deduct 1 image credit from user. Returns True if successful."""
-    try:
-        with sqlite3.connect("bot_database.db") as conn:
-            cursor = conn.cursor()
-            # First check current credits
-            cursor.execute(
-                "SELECT image_credits FROM users WHERE user_id = ?",
-                (user_id,)
-            )
-            result = cursor.fetchone()
-            if not result or result[0] <= 0:
-                return False
-
-            # Deduct credit
-            cursor.execute(
-                "UPDATE users SET image_credits = image_credits - 1 WHERE user_id = ?",
-                (user_id,)
-            )
-            conn.commit()
-            return True
-    except sqlite3.Error as e:
-        print(f"Database error deducting image credit for user {user_id}: {e}")
-        return False
+    return await async_bot_db.deduct_image_credit(user_id)
 
 
-def deduct_video_credit(user_id: int) -> bool:
+async def deduct_video_credit(user_id: int) -> bool:
     """Deduct 1 video credit from user. Returns True if successful."""
-    try:
-        with sqlite3.connect("bot_database.db") as conn:
-            cursor = conn.cursor()
-            # First check current credits
-            cursor.execute(
-                "SELECT video_credits FROM users WHERE user_id = ?",
-                (user_id,)
-            )
-            result = cursor.fetchone()
-            if not result or result[0] <= 0:
-                return False
-
-            # Deduct credit
-            cursor.execute(
-                "UPDATE users SET video_credits = video_credits - 1 WHERE user_id = ?",
-                (user_id,)
-            )
-            conn.commit()
-            return True
-    except sqlite3.Error as e:
-        print(f"Database error deducting video credit for user {user_id}: {e}")
-        return False
+    return await async_bot_db.deduct_video_credit(user_id)
+
+
+async def reserve_credit(user_id: int, kind: CreditKind) -> CreditReservation | None:
+    """Hold one credit before calling the API. Returns None if the user has none left."""
+    return await async_bot_db.reserve_credit(user_id, kind)
+
+
+async def commit_credit(reservation: CreditReservation) -> None:
+    """Make a held credit permanent once the result has been delivered."""
+    if not await async_bot_db.commit_credit_reservation(reservation.reservation_id):
+        log.warning("Reservation %s was already settled before commit", reservation.reservation_id)
+
 
+async def refund_credit(reservation: CreditReservation) -> None:
+    """Return a held credit after a failed or cancelled generation."""
+    await async_bot_db.refund_credit_reservation(reservation.reservation_id)
 
 
 # Single in-memory instance
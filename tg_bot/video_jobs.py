@@ -0,0 +1,254 @@
+"""Durable video generation jobs.
+
+Every video request is a row in ``video_jobs`` that moves SUBMITTING ->
+RUNNING -> DELIVERING -> DELIVERED (or FAILED). The Veo operation name is
+stored as soon as it is known, so after a restart ``resume_video_jobs()``
+picks polling and delivery back up.
+
+Delivery is at-least-once. Each status change is a compare-and-set, so only
+one runner can claim a job for delivery. Finishing a job commits or refunds
+its held credit in the same write, and a job that is already finished is
+never finished or announced again. A crash after the video was sent but
+before the job was marked delivered is the one case that resends it.
+
+A fresh job holds a ``generation_scheduler`` slot for its model from
+submission until its operation finishes. Resumed jobs are already running
+upstream, so they don't queue.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+from telegram import Bot
+
+from core.database import VideoJob, VideoJobStatus, async_bot_db
+from services.gemini_video import GeminiVideoService
+from services.resilience import ErrorKind, ServiceBusy, classify, is_timeout
+from services.scheduler import generation_scheduler
+from tg_bot.conversation import discard_temp_file
+from tg_bot.translations import get_translation
+from tg_bot.user_settings import Language
+
+log = logging.getLogger(__name__)
+
+# Progress messages are sent at most this often
+PROGRESS_MESSAGE_INTERVAL_SECONDS = 120
+
+# job_id -> running task
+_tasks: Dict[int, asyncio.Task] = {}
+_jobs: Dict[int, VideoJob] = {}
+# Jobs whose owner replaced them; these are refunded rather than left to resume
+_abandoned: set[int] = set()
+
+
+async def start_video_job(
+    bot: Bot,
+    video_service: GeminiVideoService,
+    user_id: int,
+    chat_id: int,
+    prompt: str,
+    language: Language,
+    reservation_id: int | None,
+    image_path: str | None = None,
+) -> asyncio.Task | None:
+    """Persist a new job and run it in the background. Takes ownership of ``image_path``."""
+    job = await async_bot_db.create_video_job(user_id, chat_id, prompt, language.value, reservation_id)
+    if job is None:
+        discard_temp_file(image_path)
+        return None
+    return _spawn(bot, video_service, job, image_path)
+
+
+async def resume_video_jobs(bot: Bot, video_service: GeminiVideoService) -> int:
+    """Restart every job left unfinished by a previous run. Returns the number resumed."""
+    resumed = 0
+    for job in await async_bot_db.get_active_video_jobs():
+        if job.job_id in _tasks:
+            continue
+        if job.status is VideoJobStatus.SUBMITTING:
+            # The submit call was cut short, so there is no operation to follow
+            await _fail(bot, job, "video_generation_error_message")
+            continue
+        _spawn(bot, video_service, job)
+        resumed += 1
+    if resumed:
+        log.info("Resumed %d video job(s)", resumed)
+    return resumed
+
+
+async def cancel_user_video_jobs(user_id: int) -> bool:
+    """Abandon (and refund) the user's running jobs. Returns True if any were running."""
+    tasks = []
+    for job_id, task in list(_tasks.items()):
+        if _jobs[job_id].user_id == user_id and not task.done():
+            _abandoned.add(job_id)
+            task.cancel()
+            tasks.append(task)
+    if tasks:
+        # Let the tasks settle (and refund their held credit) before a new one starts
+        await asyncio.wait(tasks, timeout=5)
+    return bool(tasks)
+
+
+async def shutdown() -> None:
+    """Stop running jobs without failing them, so the next start resumes them."""
+    tasks = [task for task in _tasks.values() if not task.done()]
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.wait(tasks, timeout=5)
+
+
+def _spawn(bot: Bot, video_service: GeminiVideoService, job: VideoJob, image_path: str | None = None) -> asyncio.Task:
+    task = asyncio.create_task(_run(bot, video_service, job, image_path))
+    _tasks[job.job_id] = task
+    _jobs[job.job_id] = job
+
+    def forget(_: asyncio.Task) -> None:
+        _tasks.pop(job.job_id, None)
+        _jobs.pop(job.job_id, None)
+        _abandoned.discard(job.job_id)
+
+    task.add_done_callback(forget)
+    return task
+
+
+async def _fail(bot: Bot, job: VideoJob, message_key: str | None) -> None:
+    """Fail the job and refund its credit; the user is told only the first time."""
+    if await async_bot_db.finish_video_job(job.job_id, delivered=False) and message_key:
+        try:
+            await bot.send_message(chat_id=job.chat_id, text=get_translation(message_key, Language(job.language)))
+        except Exception as exc:
+            log.error("Failed to send error message to user %s: %s", job.user_id, exc)
+
+
+async def _finish_delivered(bot: Bot, job: VideoJob, language: Language) -> None:
+    """Mark the job delivered and spend its credit; the confirmation is sent only once."""
+    if await async_bot_db.finish_video_job(job.job_id, delivered=True):
+        _, remaining = await async_bot_db.get_user_credits(job.user_id)
+        await bot.send_message(
+            chat_id=job.chat_id,
+            text=get_translation("video_credit_deducted", language, remaining=remaining),
+        )
+
+
+def _error_message_key(exc: Exception) -> str:
+    if isinstance(exc, ServiceBusy):
+        return "service_busy_message"
+    if is_timeout(exc):
+        return "video_generation_timeout_message"
+    if classify(exc) is ErrorKind.RATE_LIMITED:
+        return "video_generation_quota_message"
+    return "video_generation_error_message"
+
+
+async def _run(bot: Bot, video_service: GeminiVideoService, job: VideoJob, image_path: str | None) -> None:
+    language = Language(job.language)
+    output_path: Path | None = None
+    last_progress_time = 0.0
+
+    async def send_progress(message: str) -> None:
+        nonlocal last_progress_time
+        current_time = time.time()
+        if current_time - last_progress_time < PROGRESS_MESSAGE_INTERVAL_SECONDS:
+            return
+        last_progress_time = current_time
+        try:
+            await bot.send_message(chat_id=job.chat_id, text=get_translation("video_progress", language, progress=message))
+        except Exception as e:
+            log.warning("Failed to send progress update for video job %s: %s", job.job_id, e)
+
+    caption_text = get_translation(
+        "video_ready_caption", language, prompt=f"{job.prompt[:100]}{'...' if len(job.prompt) > 100 else ''}"
+    )
+    # Model whose scheduler slot this job holds while its operation runs
+    slot_model: str | None = None
+
+    def notify_queued(position: int):
+        return bot.send_message(
+            chat_id=job.chat_id, text=get_translation("queue_position_message", language, position=position)
+        )
+
+    try:
+        status = job.status
+        if status is VideoJobStatus.SUBMITTING:
+            model = video_service.model_name if image_path else video_service.text_to_video_model
+            try:
+                await generation_scheduler.acquire(model, job.user_id, on_queued=notify_queued)
+                slot_model = model
+                if image_path:
+                    submitted = await video_service.start_video_from_image_and_prompt(image_path, job.prompt)
+                else:
+                    submitted = await video_service.start_video_from_prompt(job.prompt)
+            finally:
+                # Only the submit call needs the uploaded image
+                discard_temp_file(image_path)
+            if submitted is None:
+                await _fail(bot, job, "video_generation_failed_message")
+                return
+            operation, key_id = submitted
+            if not await async_bot_db.advance_video_job(
+                job.job_id, VideoJobStatus.SUBMITTING, VideoJobStatus.RUNNING, operation.name, key_id
+            ):
+                # The operation can't be recorded, so nothing could resume it; settle like a cut-off submit
+                log.error("Video job %s could not record operation %s", job.job_id, operation.name)
+                await _fail(bot, job, "video_generation_error_message")
+                return
+            status = VideoJobStatus.RUNNING
+        else:
+            operation = video_service.operation_from_name(job.operation_name)
+            # Jobs from before key pooling have none recorded; they used the primary key
+            key_id = job.api_key_id
+
+        label = "Image-to-video generation" if image_path else "Video generation"
+        operation = await video_service.wait_for_operation(
+            operation,
+            send_progress if status is VideoJobStatus.RUNNING else None,
+            label,
+            started_at=job.created_at,
+            key_id=key_id,
+        )
+        if slot_model is not None:
+            generation_scheduler.release(slot_model)
+            slot_model = None
+        if operation is None:
+            await _fail(bot, job, "video_generation_timeout_message")
+            return
+
+        if status is VideoJobStatus.RUNNING and not await async_bot_db.advance_video_job(
+            job.job_id, VideoJobStatus.RUNNING, VideoJobStatus.DELIVERING
+        ):
+            # Another runner claimed delivery
+            return
+
+        tmp_dir = tempfile.mkdtemp(prefix="videogen_output_")
+        output_path = Path(tmp_dir) / f"video_{job.user_id}.mp4"
+        video_path = await video_service.save_video(operation, output_path, key_id)
+        if not video_path or not Path(video_path).exists():
+            await _fail(bot, job, "video_generation_failed_message")
+            return
+
+        with open(video_path, "rb") as f:
+            await bot.send_video(chat_id=job.chat_id, video=f, caption=caption_text)
+        await _finish_delivered(bot, job, language)
+
+    except asyncio.CancelledError:
+        if job.job_id in _abandoned:
+            log.info("Video job %s was replaced by a newer request from user %s", job.job_id, job.user_id)
+            # Don't send a message for cancelled jobs as the user started a new request
+            await _fail(bot, job, None)
+        raise
+    except Exception as exc:
+        log.exception("Video job %s failed: %s", job.job_id, exc)
+        await _fail(bot, job, _error_message_key(exc))
+    finally:
+        if slot_model is not None:
+            generation_scheduler.release(slot_model)
+        if output_path is not None:
+            discard_temp_file(str(output_path))